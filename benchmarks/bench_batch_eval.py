@@ -0,0 +1,68 @@
+"""Compares ttt_batch against evaluating one grid at a time with TTTState, the way
+TTTGame.check_if_game_over does it.
+
+    python benchmarks/bench_batch_eval.py [n_boards]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ttt_batch import ONGOING, evaluate_bitboards, evaluate_grids
+from ttt_core import O_WON, TIE, WIN_LINES, X_WON, TTTState
+
+
+def scalar_evaluate(grids):
+    """Per board path, one TTTState and two winning_line() calls per grid"""
+    results = []
+    state = TTTState()
+    for grid in grids.tolist():
+        state.x_board = sum(1 << i for i, tile in enumerate(grid) if tile == 1)
+        state.o_board = sum(1 << i for i, tile in enumerate(grid) if tile == 2)
+        if (line := state.winning_line("x")) is not None:
+            results.append((X_WON, WIN_LINES[line]))
+        elif (line := state.winning_line("o")) is not None:
+            results.append((O_WON, WIN_LINES[line]))
+        elif state.is_full():
+            results.append((TIE, None))
+        else:
+            results.append((ONGOING, None))
+    return results
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    n_boards = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    n_scalar = min(n_boards, 200_000)
+    rng = np.random.default_rng(0)
+    grids = rng.integers(0, 3, size=(n_boards, 9), dtype=np.int8)
+    weights = 1 << np.arange(9)
+    x_boards = ((grids == 1) * weights).sum(axis=1).astype(np.uint16)
+    o_boards = ((grids == 2) * weights).sum(axis=1).astype(np.uint16)
+
+    (winners, _, centers, directions), grid_time = timed(evaluate_grids, grids)
+    _, bitboard_time = timed(evaluate_bitboards, x_boards, o_boards)
+    scalar, scalar_time = timed(scalar_evaluate, grids[:n_scalar])
+
+    # both paths have to agree before their speed means anything
+    for i, (winner, win_info) in enumerate(scalar):
+        assert winners[i] == winner, i
+        if win_info is not None:
+            assert (centers[i], directions[i]) == win_info, i
+
+    print(f"scalar TTTState:        {n_scalar / scalar_time:>14,.0f} boards/s")
+    print(f"evaluate_grids:         {n_boards / grid_time:>14,.0f} boards/s")
+    print(f"evaluate_bitboards:     {n_boards / bitboard_time:>14,.0f} boards/s")
+    print(f"speedup over scalar:    {(n_boards / grid_time) / (n_scalar / scalar_time):>14.1f}x (grids), "
+          f"{(n_boards / bitboard_time) / (n_scalar / scalar_time):.1f}x (bitboards)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Playouts per second of MCTSPlayer from 1 worker up to every core.
+
+    python benchmarks/bench_mcts.py [--size 15] [--k 5] [--seconds 2]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ttt_ai import MCTSPlayer
+from ttt_core import TTTState
+
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to max_workers, always ending with max_workers"""
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=15)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time budget of every search")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # search from a position with one move in the middle, like a real game
+    state = TTTState(args.size, args.k)
+    state.play(state.n_tiles // 2, "x")
+
+    print(f"{args.size}x{args.size}, k={args.k}, {args.seconds}s per search")
+    base_rate = None
+    for workers in worker_counts(args.max_workers):
+        player = MCTSPlayer(time_budget=args.seconds, workers=workers)
+        if workers > 1:
+            # first search also starts the processes, which shouldn't be timed
+            player.search(state, "o", random.Random(0))
+        player.search(state, "o", random.Random(1))
+        player.close()
+        rate = player.last_playouts / args.seconds
+        base_rate = base_rate or rate
+        print(f"{workers:>3} workers: {rate:>12,.0f} playouts/s  ({rate / base_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
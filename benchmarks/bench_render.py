@@ -0,0 +1,138 @@
+"""Per-call latency of the TTTVisual draw methods, without a display.
+
+    python benchmarks/bench_render.py [--calls 500] [--save-baseline] [--check] [--threshold 0.25]
+
+Runs with SDL's dummy video driver, so it works on machines without a screen. --save-baseline
+writes the results to the baseline file and --check compares the median of every draw method
+against it, exiting with status 1 when one got slower by more than the threshold. Baselines
+only mean something on the machine they were made on, so save a new one when that changes
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import pygame
+
+import tic_tac_toe
+from ttt_core import GameRecord, GameRecords
+from ttt_stats import GameStats
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render_baseline.json")
+PERCENTILES = (50, 90, 99)
+# a game won by x along the top row, and the history shown on the history screen
+MOVES = (0, 4, 1, 8, 2)
+RECORD = GameRecord(MOVES, "x", "x")
+HISTORY = [RECORD, GameRecord((4, 0, 8, 2, 1, 7, 6, 3, 5), "x", "tie"), GameRecord((0, 4, 1, 2, 3, 6), "x", "o")] * 3
+
+
+def create_visual():
+    pygame.display.init()
+    pygame.font.init()
+    win = pygame.display.set_mode(tic_tac_toe.WIN_SIZE)
+    return tic_tac_toe.TTTVisual(win, tic_tac_toe.create_texts())
+
+
+def draw_calls(visual):
+    """Returns {name: function that does one draw} for every draw method that is benchmarked"""
+    win_info = (1, 1)  # middle of the top row, horizontal line
+    history = GameRecords()
+    for record in HISTORY:
+        history.append(record)
+    stats = GameStats.for_history(history)
+    return {
+        "draw_start_screen": visual.draw_start_screen,
+        "draw_game_screen": lambda: visual.draw_game_screen("x", 5),
+        "draw_grid": lambda: visual.draw_grid(RECORD),
+        "update_tile": lambda: visual.update_tile(4, "o"),
+        "draw_line": lambda: visual.draw_line(win_info, "x"),
+        "draw_additional_options_screen": visual.draw_additional_options_screen,
+        "draw_game_history_screen": lambda: visual.draw_game_history_screen(HISTORY, -1),
+        "draw_past_game_screen": lambda: visual.draw_past_game_screen(RECORD),
+        "draw_stats_screen": lambda: visual.draw_stats_screen(stats),
+    }
+
+
+def percentile(sorted_times, p):
+    """Nearest rank percentile of an already sorted list"""
+    index = max(0, -(-len(sorted_times) * p // 100) - 1)
+    return sorted_times[index]
+
+
+def run(visual, calls, warm_up=20):
+    """Times every draw method calls times. Returns {name: {"p50": ms, ..., "max": ms, "draws_per_sec": n}}"""
+    results = {}
+    for name, draw in draw_calls(visual).items():
+        times = []
+        for i in range(warm_up + calls):
+            start = time.perf_counter()
+            draw()
+            elapsed = time.perf_counter() - start
+            # the display update isn't part of the draw, but dirty rects shouldn't pile up either
+            visual.compositor.present()
+            if i >= warm_up:
+                times.append(elapsed)
+        times.sort()
+        result = {f"p{p}": percentile(times, p) * 1000 for p in PERCENTILES}
+        result["max"] = times[-1] * 1000
+        result["draws_per_sec"] = len(times) / sum(times)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Returns the names of the draw methods whose median got more than threshold slower. The
+    fastest draws take microseconds, so they also have to get at least min_delta ms slower"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["p50"]
+        if result["p50"] > base * (1 + threshold) and result["p50"] - base > min_delta:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500, help="timed calls of every draw method")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="how much slower than the baseline the median can get, 0.25 = 25%%")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="smallest slowdown in ms that counts as a regression")
+    args = parser.parse_args()
+
+    # the images are looked up relative to the repo
+    os.chdir(ROOT)
+    results = run(create_visual(), args.calls)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+
+    print(f"{'':<32}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'draws/s':>11}{'vs base':>9}")
+    for name, result in results.items():
+        change = f"{result['p50'] / baseline[name]['p50'] - 1:+.0%}" if name in baseline else ""
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<32}{result['p50']:>9.3f}{result['p90']:>9.3f}{result['p99']:>9.3f}"
+              f"{result['max']:>9.3f}{result['draws_per_sec']:>11,.0f}{change:>9}{flag}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved baseline to {args.baseline}")
+    if args.check and regressions:
+        print(f"{len(regressions)} draw methods are more than {args.threshold:.0%} slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Load test of ttt_server: many simultaneous games of random moves over loopback.
+
+    python benchmarks/bench_server.py [--games 10000] [--seconds 10] [--port PORT]
+
+Without --port a server is started in a subprocess. Every game is two connections, so the
+open file limit (ulimit -n) has to be above 2 * games in both processes. Once every player is
+connected, they all join at the same time and keep playing new games, so there are always
+about --games games going on. Reports moves/s and the latency of a move, from sending MOVE
+to getting its MOVED back, and how much CPU a server started here used.
+
+By default players move as soon as it's their turn, which measures the most moves/s the server
+(and this client, on the same box) can do, and latency is mostly time spent queued. --think
+makes players wait before every move like people do, for the latency of a server that keeps up
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from ttt_core import TTTState
+from ttt_server import DEFAULT_HOST
+
+# connections being opened at the same time, so the server's listen backlog doesn't overflow
+CONNECT_CONCURRENCY = 500
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.connected = 0
+        self.all_connected = asyncio.Event()
+        # moves are only timed and games only counted while measuring
+        self.measuring = False
+        # players stop after the game they're in once this passes
+        self.deadline = float("inf")
+        self.latencies = []
+        self.games = 0
+        self.connect_slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def player(self, rng):
+        """Joins games and plays random moves until the deadline"""
+        args = self.args
+        async with self.connect_slots:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+        self.connected += 1
+        if self.connected == 2 * args.games:
+            self.all_connected.set()
+        await self.all_connected.wait()
+
+        join = f"JOIN {args.size} {args.k}\n".encode()
+        state = side = turn = sent = None
+        writer.write(join)
+        while line := await reader.readline():
+            parts = line.split()
+            if parts[0] == b"START":
+                side, turn = parts[1].decode(), parts[2].decode()
+                state = TTTState(args.size, args.k)
+            elif parts[0] == b"MOVED":
+                if sent is not None and self.measuring:
+                    self.latencies.append(time.perf_counter() - sent)
+                sent = None
+                state.play(int(parts[1]), turn)
+                if state.last_move_win(turn) is not None or state.is_full():
+                    state = None  # OVER comes next
+                turn = "o" if turn == "x" else "x"
+            elif parts[0] == b"OVER":
+                # both players see it, only count it once
+                if self.measuring and side == "x":
+                    self.games += 1
+                state = side = None
+                if time.perf_counter() >= self.deadline:
+                    break
+                writer.write(join)
+            elif parts[0] == b"ERROR":
+                raise RuntimeError(line.decode().strip())
+
+            if state is not None and turn == side and sent is None:
+                if args.think:
+                    await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think)
+                sent = time.perf_counter()
+                writer.write(f"MOVE {rng.choice(state.empty_tiles())}\n".encode())
+        writer.close()
+
+    async def run(self, server_pid=None):
+        rng = random.Random(self.args.seed)
+        players = [asyncio.ensure_future(self.player(random.Random(rng.getrandbits(64))))
+                   for _ in range(2 * self.args.games)]
+        start = time.perf_counter()
+        await self.all_connected.wait()
+        print(f"{2 * self.args.games} players connected in {time.perf_counter() - start:.1f}s")
+        # the first moves of the first games are all at once, give it a moment to settle
+        await asyncio.sleep(1)
+        self.measuring = True
+        start = time.perf_counter()
+        cpu_start = server_cpu_seconds(server_pid)
+        await asyncio.sleep(self.args.seconds)
+        self.measuring = False
+        seconds = time.perf_counter() - start
+        cpu = server_cpu_seconds(server_pid) - cpu_start if server_pid is not None else None
+        self.deadline = time.perf_counter()
+        await asyncio.gather(*players)
+        return seconds, cpu
+
+
+def server_cpu_seconds(pid):
+    """User + system CPU time of a process, only on Linux. None when it can't be read"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, TypeError):
+        return None
+    # utime and stime are the 14th and 15th fields, the split starts at the 3rd
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(0, -(-len(sorted_values) * p // 100) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((DEFAULT_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10000, help="simultaneous games")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to measure for")
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, help="port of a running server, one is started otherwise")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="average seconds a player waits before moving, 0 to move right away")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    if args.port is None:
+        args.port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "ttt_server.py"), "--port", str(args.port)],
+                                  stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()  # "serving on ..." once it's listening
+    try:
+        test = LoadTest(args)
+        seconds, cpu = asyncio.run(test.run(server.pid if server is not None else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies = sorted(test.latencies)
+    print(f"{args.games} simultaneous {args.size}x{args.size} k={args.k} games for {seconds:.1f}s")
+    print(f"  {len(latencies) / seconds:,.0f} moves/s, {test.games / seconds:,.0f} games/s")
+    if cpu is not None and latencies:
+        print(f"  server used {cpu / seconds:.0%} of a core, {cpu / len(latencies) * 1e6:.0f} us of CPU per move")
+    if latencies:
+        print(f"  move latency p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Search depth and nodes per second of UltimatePlayer, and how it does against weaker players.
+
+    python benchmarks/bench_ultimate.py [--budget 0.1] [--positions 20] [--games 10]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ttt_core import TTTGame
+from ttt_ultimate import UltimatePlayer, UltimateState, ultimate_random_policy
+
+
+def random_positions(n, rng):
+    """Positions after 0 to 30 random moves, like the middle of real games"""
+    positions = []
+    rules = TTTGame(rng, state=UltimateState())
+    while len(positions) < n:
+        rules.start()
+        for _ in range(rng.randrange(31)):
+            rules.play(ultimate_random_policy(rules.state, rules.turn, rng))
+            if not rules.game_ongoing:
+                break
+        else:
+            positions.append((rules.state.copy(), rules.turn))
+    return positions
+
+
+def play_match(x_player, o_player, games, rng):
+    """Returns the number of games won by 'x', 'o' and 'tie'"""
+    players = {"x": x_player, "o": o_player}
+    results = {"x": 0, "o": 0, "tie": 0}
+    rules = TTTGame(rng, state=UltimateState())
+    for _ in range(games):
+        rules.start()
+        while rules.game_ongoing:
+            rules.play(players[rules.turn](rules.state, rules.turn, rng))
+        results[rules.game_history[-1].winner] += 1
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=0.1, help="seconds per move")
+    parser.add_argument("--positions", type=int, default=20, help="positions to time the search on")
+    parser.add_argument("--games", type=int, default=10, help="games against every weaker player")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    player = UltimatePlayer(time_budget=args.budget)
+    depths, rates = [], []
+    for state, turn in random_positions(args.positions, rng):
+        player.choose_move(state, turn, rng)
+        depths.append(player.last_depth)
+        rates.append(player.last_nodes / args.budget)
+    print(f"{args.budget * 1000:.0f} ms per move: depth {min(depths)}-{max(depths)} "
+          f"(median {statistics.median(depths)}), {statistics.mean(rates):,.0f} nodes/s")
+
+    opponents = {"random": ultimate_random_policy, "depth 1": UltimatePlayer(max_depth=1)}
+    for name, opponent in opponents.items():
+        results = play_match(player, opponent, args.games, rng)
+        print(f"vs {name:<8} as x: {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Brute force 3x3 solver for checking the AI players. It knows nothing about bitboards,
+the grid is a tuple of 'x', 'o' and None"""
+from functools import lru_cache
+
+LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+
+
+def winner(grid):
+    for a, b, c in LINES:
+        if grid[a] is not None and grid[a] == grid[b] == grid[c]:
+            return grid[a]
+    return None
+
+
+def other(turn):
+    return "o" if turn == "x" else "x"
+
+
+@lru_cache(maxsize=None)
+def score(grid, turn):
+    """Minimax score for turn to move, scored like MinimaxPlayer: a win is worth 10 minus the
+    tiles filled when it happens"""
+    filled = sum(tile is not None for tile in grid)
+    if winner(grid) is not None:
+        return filled - 10
+    if filled == 9:
+        return 0
+    return max(-score(grid[:i] + (turn,) + grid[i + 1:], other(turn)) for i in range(9) if grid[i] is None)
+
+
+def move_scores(grid, turn):
+    """Tile index -> score of playing there for turn"""
+    return {i: -score(grid[:i] + (turn,) + grid[i + 1:], other(turn)) for i in range(9) if grid[i] is None}
+
+
+def reachable_positions():
+    """Every (grid, turn) that can come up in a game that isn't over, with either side going first"""
+    positions = set()
+    stack = [((None,) * 9, "x"), ((None,) * 9, "o")]
+    while stack:
+        grid, turn = stack.pop()
+        if (grid, turn) in positions or winner(grid) is not None or None not in grid:
+            continue
+        positions.add((grid, turn))
+        for i in range(9):
+            if grid[i] is None:
+                stack.append((grid[:i] + (turn,) + grid[i + 1:], other(turn)))
+    return positions
+
+
+def to_state(grid):
+    from ttt_core import TTTState
+    state = TTTState()
+    for i, tile in enumerate(grid):
+        if tile is not None:
+            state.play(i, tile)
+    return state
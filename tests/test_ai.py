@@ -0,0 +1,71 @@
+import random
+import threading
+import time
+
+from ttt_ai import MCTSPlayer, MinimaxPlayer, canonical_key
+from ttt_core import TTTState, simulate, tally
+
+from tests.solver import move_scores, reachable_positions, to_state
+
+
+def test_minimax_scores_match_brute_force():
+    player = MinimaxPlayer()
+    player.warm_up()
+    for grid, turn in reachable_positions():
+        state = to_state(grid)
+        expected = move_scores(grid, turn)
+        assert player.scores(state, turn) == expected
+        best = max(expected.values())
+        assert sorted(player.best_moves(state, turn)) == sorted(i for i, s in expected.items() if s == best)
+
+
+def test_canonical_key_is_the_same_for_symmetric_positions():
+    # x in a corner and o next to it, then the same thing mirrored and rotated
+    assert canonical_key(1 << 0, 1 << 1) == canonical_key(1 << 2, 1 << 1) == canonical_key(1 << 8, 1 << 5)
+    assert canonical_key(1 << 0, 1 << 1) != canonical_key(1 << 0, 1 << 4)
+
+
+def test_minimax_never_loses():
+    player = MinimaxPlayer()
+    results = tally(simulate(200, player, lambda state, turn, rng: rng.choice(state.empty_tiles()), seed=1))
+    assert results["o"] == 0
+    results = tally(simulate(50, player, player, seed=2))
+    assert results["tie"] == 50
+
+
+def almost_won_state():
+    """x to play on 5x5, 4 to win. Both players have three in a row, so x has to win now"""
+    state = TTTState(5, 4)
+    for x_index, o_index in zip((0, 1, 2), (9, 14, 19)):
+        state.play(x_index, "x")
+        state.play(o_index, "o")
+    return state
+
+
+def test_mcts_takes_the_win():
+    player = MCTSPlayer(playouts=2000)
+    assert player.choose_move(almost_won_state(), "x", random.Random(0)) == 3
+
+
+def test_mcts_pool_merges_the_workers():
+    player = MCTSPlayer(playouts=400, workers=2)
+    try:
+        assert player.choose_move(almost_won_state(), "x", random.Random(0)) == 3
+        assert player.last_playouts == 400
+    finally:
+        player.close()
+
+
+def test_mcts_cancel_does_not_wait_for_the_pool():
+    player = MCTSPlayer(time_budget=2, workers=2)
+    try:
+        # start the processes first, so the timing below doesn't include spawning them
+        player.time_budget = 0.01
+        player.search(almost_won_state(), "x")
+        player.time_budget = 2
+        threading.Timer(0.2, player.cancel).start()
+        start = time.perf_counter()
+        player.search(almost_won_state(), "x")
+        assert time.perf_counter() - start < 1.5
+    finally:
+        player.close()
@@ -0,0 +1,54 @@
+"""The NumPy evaluators have to give the same answers as the scalar rules in ttt_core"""
+import numpy as np
+
+from ttt_batch import EMPTY, ONGOING, O_TILE, X_TILE, evaluate_bitboards, evaluate_grids, grids_from_history
+from ttt_core import FULL_BOARD, LINE_OF_BOARD, O_WON, TIE, WIN_LINES, X_WON, GameRecord
+
+
+def scalar_evaluate(x_board, o_board):
+    """(winner, line, center, direction) the way ttt_core sees a pair of bitboards"""
+    for board, winner in ((x_board, X_WON), (o_board, O_WON)):
+        line = LINE_OF_BOARD[board]
+        if line >= 0:
+            return (winner, line) + WIN_LINES[line]
+    if x_board | o_board == FULL_BOARD:
+        return TIE, -1, -1, -1
+    return ONGOING, -1, -1, -1
+
+
+def all_boards():
+    """Every pair of bitboards that don't overlap"""
+    x_boards, o_boards = [], []
+    for x_board in range(FULL_BOARD + 1):
+        free = FULL_BOARD ^ x_board
+        # every subset of the free tiles
+        o_board = free
+        while True:
+            x_boards.append(x_board)
+            o_boards.append(o_board)
+            if o_board == 0:
+                break
+            o_board = (o_board - 1) & free
+    return np.array(x_boards), np.array(o_boards)
+
+
+def test_evaluate_bitboards_matches_the_scalar_rules():
+    x_boards, o_boards = all_boards()
+    assert len(x_boards) == 3 ** 9
+    winners, lines, centers, directions = evaluate_bitboards(x_boards, o_boards)
+    for i in range(len(x_boards)):
+        assert (winners[i], lines[i], centers[i], directions[i]) == scalar_evaluate(int(x_boards[i]), int(o_boards[i]))
+
+
+def test_evaluate_grids_matches_evaluate_bitboards():
+    x_boards, o_boards = all_boards()
+    tiles = np.arange(9)
+    grids = np.where(x_boards[:, None] >> tiles & 1, X_TILE, np.where(o_boards[:, None] >> tiles & 1, O_TILE, EMPTY))
+    for got, expected in zip(evaluate_grids(grids), evaluate_bitboards(x_boards, o_boards)):
+        assert np.array_equal(got, expected)
+
+
+def test_grids_from_history():
+    history = [GameRecord((4, 0, 8), "x", "x"), GameRecord((), "o", "tie")]
+    assert grids_from_history(history).tolist() == [[O_TILE, 0, 0, 0, X_TILE, 0, 0, 0, X_TILE], [0] * 9]
+    assert grids_from_history([]).shape == (0, 9)
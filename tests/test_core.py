@@ -0,0 +1,174 @@
+"""Rules of ttt_core, checked against brute force"""
+import itertools
+import random
+
+import pytest
+
+from ttt_core import (DIRECTIONS, EMPTY_TILES, FULL_BOARD, LINE_OF_BOARD, O_WON, TIE, WIN_LINES, WIN_MASKS, X_WON,
+                      GameRecord, TTTGame, TTTState, line_ends, simulate, tally, unpack_result)
+
+
+def brute_force_three_in_a_row(board):
+    """Looks at every row, column and diagonal of a 3x3 bitboard"""
+    grid = [[board >> (row * 3 + col) & 1 for col in range(3)] for row in range(3)]
+    lines = [row for row in grid]
+    lines += [[grid[row][col] for row in range(3)] for col in range(3)]
+    lines.append([grid[i][i] for i in range(3)])
+    lines.append([grid[i][2 - i] for i in range(3)])
+    return any(all(line) for line in lines)
+
+
+def test_line_table_matches_brute_force():
+    for board in range(FULL_BOARD + 1):
+        line = LINE_OF_BOARD[board]
+        assert (line >= 0) == brute_force_three_in_a_row(board)
+        if line >= 0:
+            assert board & WIN_MASKS[line] == WIN_MASKS[line]
+
+
+def test_win_lines_are_the_middle_of_their_mask():
+    for mask, (center, _) in zip(WIN_MASKS, WIN_LINES):
+        tiles = [i for i in range(9) if mask >> i & 1]
+        assert tiles[1] == center
+
+
+def test_empty_tiles():
+    for occupied in range(FULL_BOARD + 1):
+        assert EMPTY_TILES[occupied] == tuple(i for i in range(9) if not occupied & 1 << i)
+
+
+def test_winning_line_of_every_game():
+    # every order of moves until someone has three in a row
+    for moves in itertools.permutations(range(9), 5):
+        state = TTTState()
+        for i, index in enumerate(moves):
+            turn = "x" if i % 2 == 0 else "o"
+            state.play(index, turn)
+            board = state.x_board if turn == "x" else state.o_board
+            assert (state.winning_line(turn) is not None) == brute_force_three_in_a_row(board)
+
+
+def test_play_undo_and_grid():
+    state = TTTState()
+    for i, index in enumerate((4, 0, 8)):
+        state.play(index, "xo"[i % 2])
+    assert state.to_grid() == ["o", None, None, None, "x", None, None, None, "x"]
+    assert state.empty_tiles() == (1, 2, 3, 5, 6, 7)
+    assert state.undo() == 8
+    assert state.get(8) is None and state.turn_count == 2
+
+
+class Observer:
+    def __init__(self):
+        self.events = []
+
+    def game_started(self, turn, turn_count):
+        self.events.append(("started", turn, turn_count))
+
+    def tile_played(self, index, turn):
+        self.events.append(("played", index, turn))
+
+    def turn_changed(self, turn, turn_count):
+        self.events.append(("turn", turn, turn_count))
+
+    def game_ended(self, win_info, turn):
+        self.events.append(("ended", win_info, turn))
+
+
+def test_game_notifies_and_records():
+    game = TTTGame()
+    observer = Observer()
+    game.add_observer(observer)
+    game.start("x")
+    for index in (0, 3, 1, 4):
+        assert game.play(index) is False
+    assert game.turn_count == 5
+    assert game.play(2) == (1, 1)
+    assert not game.game_ongoing and game.turn_count == 1
+    assert observer.events[:3] == [("started", "x", 1), ("played", 0, "x"), ("turn", "o", 2)]
+    assert observer.events[-1] == ("ended", (1, 1), "x")
+    assert list(game.game_history) == [GameRecord((0, 3, 1, 4, 2), "x", "x")]
+
+
+def test_turn_count_follows_the_state():
+    game = TTTGame()
+    game.start("o")
+    game.play(4)
+    game.state.undo()
+    assert game.turn_count == game.state.turn_count + 1 == 1
+
+
+def test_tie_and_is_legal():
+    game = TTTGame()
+    game.start("x")
+    for index in (0, 1, 2, 4, 3, 5, 7, 6):
+        game.play(index)
+    assert not game.is_legal(0) and game.is_legal(8) and not game.is_legal(9)
+    assert game.play(8) == "tie"
+    assert game.game_history[-1].winner == "tie"
+
+
+def test_simulate_is_deterministic_and_tallies():
+    results = simulate(500, seed=3)
+    assert results == simulate(500, seed=3)
+    totals = tally(results)
+    assert totals["x"] + totals["o"] + totals["tie"] == 500
+    assert 5 <= totals["mean_turn_count"] <= 9
+    for result in results:
+        outcome, turns = unpack_result(result)
+        assert outcome in (TIE, X_WON, O_WON)
+        assert outcome != TIE or turns == 9
+
+
+def brute_force_k_in_a_row(board, size, k):
+    """Looks for k in a row anywhere on the board"""
+    for row in range(size):
+        for col in range(size):
+            for row_step, col_step in DIRECTIONS:
+                end_row, end_col = row + row_step * (k - 1), col + col_step * (k - 1)
+                if not (0 <= end_row < size and 0 <= end_col < size):
+                    continue
+                if all(board >> ((row + row_step * i) * size + col + col_step * i) & 1 for i in range(k)):
+                    return True
+    return False
+
+
+@pytest.mark.parametrize("size, k", [(3, 3), (4, 3), (4, 4), (5, 4), (6, 3), (7, 4), (7, 5), (9, 5), (8, 6)])
+def test_last_move_win_matches_brute_force(size, k):
+    rng = random.Random(size * 100 + k)
+    for _ in range(60):
+        state = TTTState(size, k)
+        tiles = list(range(size * size))
+        rng.shuffle(tiles)
+        for i, index in enumerate(tiles):
+            turn = "xo"[i % 2]
+            state.play(index, turn)
+            board = state.x_board if turn == "x" else state.o_board
+            win_info = state.last_move_win(turn)
+            # the game stops at the first k in a row, so it always goes through the last move
+            assert (win_info is not None) == brute_force_k_in_a_row(board, size, k)
+            if win_info is None:
+                continue
+            center, direction = win_info
+            row_step, col_step = DIRECTIONS[direction]
+            first, last = line_ends(center, direction, size, k)
+            line = [first + (row_step * size + col_step) * i for i in range(k)]
+            assert line[-1] == last
+            # the ends are on the board and the line doesn't wrap around its edges
+            first_row, first_col = divmod(first, size)
+            last_row, last_col = divmod(last, size)
+            assert (last_row - first_row, last_col - first_col) == (row_step * (k - 1), col_step * (k - 1))
+            assert 0 <= first < size * size and 0 <= last < size * size
+            assert all(board >> tile & 1 for tile in line)
+            assert index in line and center in line
+            break
+
+
+def test_line_ends_of_an_even_k():
+    # 7x7 with 4 in a row on tiles 0 to 3, the middle tile is 1 but the line goes from 0 to 3
+    state = TTTState(7, 4)
+    for i, index in enumerate((0, 7, 1, 8, 2, 9, 3)):
+        state.play(index, "xo"[i % 2])
+    assert state.last_move_win("x") == (1, 1)
+    assert line_ends(1, 1, 7, 4) == (0, 3)
+    assert line_ends(*WIN_LINES[0]) == (0, 2)
@@ -0,0 +1,63 @@
+"""HistoryStore, the on-disk game history"""
+import pytest
+
+from ttt_core import GameRecord, RecordFormat
+from ttt_history import HEADER, MAGIC, VERSION, HistoryStore
+
+RECORDS = [GameRecord((0, 3, 1, 4, 2), "x", "x"),
+           GameRecord((4, 0, 8, 2, 1, 7, 6, 3, 5), "o", "tie"),
+           GameRecord((0, 4, 1, 2, 3, 6), "o", "o")]
+
+
+def test_append_and_reopen(tmp_path):
+    path = tmp_path / "3x3_k3.tttlog"
+    history = HistoryStore(path)
+    assert len(history) == 0 and history.packed() == b""
+    for record in RECORDS[:2]:
+        history.append(record)
+    assert history[-1] == RECORDS[1]
+    # appending after the file was mapped maps it again
+    history.append(RECORDS[2])
+    assert list(history) == RECORDS
+    history.close()
+
+    history = HistoryStore(path)
+    assert list(history) == RECORDS
+    assert history.packed(1, 3) == b"".join(RecordFormat().pack(record) for record in RECORDS[1:])
+    assert history.packed(2, 2) == b""
+    with pytest.raises(IndexError):
+        history[3]
+    history.close()
+
+
+def test_torn_record_is_dropped(tmp_path):
+    path = tmp_path / "3x3_k3.tttlog"
+    history = HistoryStore(path)
+    for record in RECORDS:
+        history.append(record)
+    history.close()
+    # a crash in the middle of writing the last record
+    with open(path, "r+b") as file:
+        file.truncate(HEADER.size + 2 * RecordFormat().size + 3)
+
+    history = HistoryStore(path)
+    assert list(history) == RECORDS[:2]
+    history.append(RECORDS[2])
+    assert list(history) == RECORDS
+    history.close()
+    assert path.stat().st_size == HEADER.size + 3 * RecordFormat().size
+
+
+@pytest.mark.parametrize("header", [
+    HEADER.pack(MAGIC, VERSION, 4, 3, RecordFormat(4).size),
+    HEADER.pack(MAGIC, VERSION, 3, 2, RecordFormat(3).size),
+    HEADER.pack(MAGIC, VERSION - 1, 3, 3, RecordFormat(3).size),
+    HEADER.pack(b"NOPE", VERSION, 3, 3, RecordFormat(3).size),
+])
+def test_mismatched_header_is_rejected(tmp_path, header):
+    path = tmp_path / "history.tttlog"
+    path.write_bytes(header)
+    with pytest.raises(ValueError):
+        HistoryStore(path)
+    # and the log is left alone
+    assert path.read_bytes() == header
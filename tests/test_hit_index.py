@@ -0,0 +1,115 @@
+"""HitIndex against the collidepoint scans the click handlers used to do, on every screen"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import pytest
+
+import tic_tac_toe
+from tic_tac_toe import (ADDITIONAL_OPTIONS_SCREEN, GAME_HISTORY_SCREEN, GAME_SCREEN, PAST_GAME_SCREEN,
+                         START_SCREEN, STATS_SCREEN, TTTVisual)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module", params=[
+    ((800, 600), 3, 3, False), ((1037, 811), 3, 3, False), ((800, 600), 7, 5, False),
+    ((800, 600), 19, 5, False), ((800, 600), 3, 3, True), ((1037, 811), 3, 3, True),
+], ids=lambda params: f"{params[0][0]}x{params[0][1]} {'ultimate' if params[3] else f'{params[1]}x{params[1]}'}")
+def visual(request):
+    window_size, size, k, ultimate = request.param
+    cwd = os.getcwd()
+    # the images are loaded relative to the repository
+    os.chdir(ROOT)
+    pygame.display.init()
+    pygame.font.init()
+    try:
+        win = pygame.display.set_mode(window_size)
+        yield TTTVisual(win, tic_tac_toe.create_texts(), size, k, ultimate)
+    finally:
+        pygame.display.quit()
+        os.chdir(cwd)
+
+
+def scan(visual, screen, pos):
+    """What the old click handlers found at pos, as (widget, index)"""
+    layouts = visual.layouts
+    if screen == START_SCREEN:
+        return ("play", None) if visual.play_button_rect.collidepoint(pos) else (None, None)
+    if screen == GAME_SCREEN:
+        for i, (tile, _) in enumerate(layouts.grid_tile_rects):
+            if tile.collidepoint(pos):
+                return "tile", i
+        return ("more", None) if visual.more_button_rect.collidepoint(pos) else (None, None)
+    if screen == ADDITIONAL_OPTIONS_SCREEN:
+        if not layouts.additional_options_container.collidepoint(pos):
+            return None, None
+        for i, (_, rect) in enumerate(layouts.additional_options):
+            if rect.collidepoint(pos):
+                return "option", i
+        return "container", None
+    if screen == GAME_HISTORY_SCREEN:
+        if not layouts.game_history_container.collidepoint(pos):
+            return None, None
+        # the arrows were checked before the slots, they win where they overlap
+        if layouts.game_history_down_arrow_rect.collidepoint(pos):
+            return "down", None
+        if layouts.game_history_up_arrow_rect.collidepoint(pos):
+            return "up", None
+        for i, slot in enumerate(layouts.game_history_slots):
+            if slot.collidepoint(pos):
+                return "slot", i
+        return "container", None
+    if screen == PAST_GAME_SCREEN:
+        for name, rect in (("back", layouts.past_game_slots[0]), ("prev", layouts.replay_prev_rect),
+                           ("next", layouts.replay_next_rect)):
+            if rect.collidepoint(pos):
+                return name, None
+        return None, None
+    if screen == STATS_SCREEN:
+        return ("container", None) if layouts.stats_container.collidepoint(pos) else (None, None)
+
+
+def widget_rects(visual):
+    layouts = visual.layouts
+    rects = [visual.play_button_rect, visual.more_button_rect, layouts.additional_options_container,
+             layouts.game_history_container, layouts.game_history_down_arrow_rect, layouts.game_history_up_arrow_rect,
+             layouts.past_game_slots[0], layouts.replay_prev_rect, layouts.replay_next_rect, layouts.stats_container]
+    rects += [tile for tile, _ in layouts.grid_tile_rects]
+    rects += [rect for _, rect in layouts.additional_options]
+    rects += layouts.game_history_slots
+    return rects
+
+
+def points(visual):
+    """Every edge of every widget, where an off by one would show, plus a coarse grid over the window"""
+    width, height = visual.win_rect.size
+    found = {(x, y) for x in range(0, width, 7) for y in range(0, height, 7)}
+    for rect in widget_rects(visual):
+        for x in range(rect.left - 1, rect.right + 1):
+            found.update(((x, rect.top - 1), (x, rect.top), (x, rect.bottom - 1), (x, rect.bottom)))
+        for y in range(rect.top - 1, rect.bottom + 1):
+            found.update(((rect.left - 1, y), (rect.left, y), (rect.right - 1, y), (rect.right, y)))
+    return [(x, y) for x, y in found if 0 <= x < width and 0 <= y < height]
+
+
+@pytest.mark.parametrize("screen", [START_SCREEN, GAME_SCREEN, ADDITIONAL_OPTIONS_SCREEN, GAME_HISTORY_SCREEN,
+                                    PAST_GAME_SCREEN, STATS_SCREEN])
+def test_hit_index_matches_scan(visual, screen):
+    index = visual.hit_indexes[screen]
+    for pos in points(visual):
+        assert index.find(pos) == scan(visual, screen, pos), pos
+
+
+def test_history_arrows_overlap_the_slots(visual):
+    # otherwise the arrow checks above wouldn't be testing anything
+    layouts = visual.layouts
+    arrows = layouts.game_history_down_arrow_rect.union(layouts.game_history_up_arrow_rect)
+    assert arrows.collidelist(layouts.game_history_slots) >= 0
+
+
+def test_options_index_follows_the_texts(visual):
+    visual.update_additional_option(1, visual.texts["aieasy"])
+    index = visual.hit_indexes[ADDITIONAL_OPTIONS_SCREEN]
+    for pos in points(visual):
+        assert index.find(pos) == scan(visual, ADDITIONAL_OPTIONS_SCREEN, pos), pos
@@ -0,0 +1,65 @@
+"""GameRecord, RecordFormat and GameRecords"""
+import random
+
+import pytest
+
+from ttt_core import GameRecord, GameRecords, RecordFormat
+
+
+def random_records(size, n, seed=0):
+    """Games of random length with random moves, not necessarily legal ones"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n):
+        tiles = list(range(size * size))
+        rng.shuffle(tiles)
+        moves = tiles[:rng.randint(0, size * size)]
+        records.append(GameRecord(moves, rng.choice("xo"), rng.choice(("x", "o", "tie")), size))
+    return records
+
+
+@pytest.mark.parametrize("size, record_size, count_bytes", [(1, 3, 1), (3, 7, 1), (4, 10, 1), (7, 39, 1),
+                                                            (15, 227, 1), (16, 259, 2)])
+def test_record_size(size, record_size, count_bytes):
+    record_format = RecordFormat(size)
+    assert record_format.size == record_size
+    assert record_format.count_bytes == count_bytes
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 7, 15, 16, 19])
+def test_pack_unpack_round_trip(size):
+    record_format = RecordFormat(size)
+    records = random_records(size, 50, seed=size)
+    # and the extremes, no moves and a full board
+    records.append(GameRecord((), "o", "tie", size))
+    records.append(GameRecord(range(size * size - 1, -1, -1), "x", "x", size))
+    for record in records:
+        packed = record_format.pack(record)
+        assert len(packed) == record_format.size
+        assert record_format.unpack(packed) == record
+        assert record_format.unpack(b"junk" + packed, 4) == record
+
+
+def test_game_records_index_and_pack():
+    records = random_records(4, 20)
+    history = GameRecords(4)
+    for record in records:
+        history.append(record)
+    assert len(history) == 20
+    assert list(history) == records
+    assert history[-1] == records[-1] and history[-20] == records[0]
+    for index in (20, -21):
+        with pytest.raises(IndexError):
+            history[index]
+    record_format = RecordFormat(4)
+    assert history.packed(5, 8) == b"".join(record_format.pack(record) for record in records[5:8])
+    assert history.packed(8, 8) == b""
+
+
+def test_grid_at_replays_the_moves():
+    record = GameRecord((4, 0, 8, 2, 6), "o", "o")
+    assert record.grid_at(0) == [None] * 9
+    assert record.grid_at(2) == ["x", None, None, None, "o", None, None, None, None]
+    assert record.grid == ["x", None, "x", None, "o", None, "o", None, "o"]
+    grid, winner, turn_count = record
+    assert (grid, winner, turn_count) == (record.grid, "o", 5)
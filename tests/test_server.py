@@ -0,0 +1,63 @@
+"""ttt_server, with two clients over real sockets"""
+import asyncio
+import random
+
+from ttt_server import TTTServer
+
+
+async def connect(port):
+    return await asyncio.open_connection("127.0.0.1", port)
+
+
+async def send(writer, line):
+    writer.write(line.encode() + b"\n")
+    await writer.drain()
+
+
+async def receive(reader):
+    return (await asyncio.wait_for(reader.readline(), 5)).decode().strip()
+
+
+async def start_match(x, o):
+    """Both (reader, writer) connections join, x first. Returns who moves first"""
+    await send(x[1], "JOIN 3 3")
+    assert await receive(x[0]) == "WAIT"
+    await send(o[1], "JOIN 3 3")
+    _, side, first = (await receive(x[0])).split()
+    assert side == "x"
+    assert await receive(o[0]) == f"START o {first}"
+    return first
+
+
+async def play_a_game():
+    server = TTTServer(random.Random(0))
+    listener = await server.start("127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        x, o = await connect(port), await connect(port)
+        first = await start_match(x, o)
+        players = {"x": x, "o": o}
+        second = "o" if first == "x" else "x"
+        await send(players[second][1], "MOVE 4")
+        assert await receive(players[second][0]) == "ERROR not your turn"
+
+        # first takes the top row, second plays below it
+        for index, side in zip((0, 3, 1, 4, 2), (first, second) * 3):
+            await send(players[side][1], f"MOVE {index}")
+            for reader, _ in players.values():
+                assert await receive(reader) == f"MOVED {index}"
+        for reader, _ in players.values():
+            assert await receive(reader) == f"OVER {first}"
+        assert (server.games_played, server.moves_played, server.matches) == (1, 5, 0)
+
+        # the same connections can play again, and leaving ends the game
+        first = await start_match(x, o)
+        await send(players[first][1], "MOVE 9")
+        assert await receive(players[first][0]) == "ERROR illegal move"
+        x[1].close()
+        assert await receive(o[0]) == "OVER left"
+        o[1].close()
+
+
+def test_join_move_over():
+    asyncio.run(play_a_game())
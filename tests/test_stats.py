@@ -0,0 +1,91 @@
+"""GameStats and the NumPy record decoding behind it, against the scalar code"""
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from ttt_batch import decode_records
+from ttt_core import WINNER_CODES, GameRecords, TTTGame, random_policy
+from ttt_history import HistoryStore
+from ttt_stats import GameStats, stats_path
+
+BOARDS = [(3, 3), (4, 3), (5, 4), (7, 5), (16, 5)]
+
+
+def play_games(size, k, n, history=None, observer=None, seed=0):
+    rules = TTTGame(random.Random(seed), size, k, history)
+    if observer is not None:
+        rules.add_observer(observer)
+    for _ in range(n):
+        rules.start()
+        while rules.game_ongoing:
+            rules.play(random_policy(rules.state, rules.turn, rules.rng))
+    return rules.game_history
+
+
+def assert_same_counts(stats, expected):
+    assert stats.games == expected.games
+    assert stats.results == expected.results
+    assert stats.turns == expected.turns
+    assert stats.lines == expected.lines
+    assert stats.openings == expected.openings
+
+
+@pytest.mark.parametrize("size, k", BOARDS)
+def test_decode_records_matches_unpack(size, k):
+    history = play_games(size, k, 200 if size < 16 else 20)
+    assert isinstance(history, GameRecords)
+    winners, o_first, turn_counts, moves = decode_records(history.packed(), size)
+    assert len(winners) == len(history)
+    for i, record in enumerate(history):
+        assert winners[i] == WINNER_CODES[record.winner]
+        assert o_first[i] == (record.first == "o")
+        assert turn_counts[i] == record.turn_count
+        assert tuple(moves[i, :record.turn_count]) == record.moves
+        assert not moves[i, record.turn_count:].any()
+
+
+@pytest.mark.parametrize("size, k", BOARDS)
+def test_counting_a_history_matches_counting_every_game(size, k):
+    live = GameStats(size, k)
+    history = play_games(size, k, 300 if size < 16 else 30, observer=live)
+    assert_same_counts(GameStats.for_history(history, size, k), live)
+
+
+def test_counts_are_saved_and_caught_up(tmp_path):
+    path = tmp_path / "3x3_k3.tttlog"
+    history = HistoryStore(path)
+    live = GameStats()
+    play_games(3, 3, 100, history, live)
+    GameStats.for_history(history).save(stats_path(path), history)
+    play_games(3, 3, 50, history, live, seed=1)
+
+    # starts from the saved 100 games and counts the other 50
+    loaded = GameStats.load(stats_path(path), history)
+    assert loaded.games == 100
+    assert_same_counts(GameStats.for_history(history, path=stats_path(path)), live)
+    # counts of another board or another log aren't used
+    assert GameStats.load(stats_path(path), history, 4, 3) is None
+    history.close()
+    path.unlink()
+    history = HistoryStore(path)
+    play_games(3, 3, 100, history, seed=2)
+    assert GameStats.load(stats_path(path), history) is None
+    history.close()
+
+
+def test_empty_history():
+    stats = GameStats.for_history(GameRecords())
+    assert stats.games == 0 and stats.win_rates() == (0, 0, 0) and stats.mean_turn_count() == 0
+    assert np.array(stats.openings).sum() == 0
+
+
+def test_normal_stats_dont_import_ultimate():
+    code = ("import sys, ttt_stats, ttt_core; ttt_stats.GameStats.for_history(ttt_core.GameRecords()); "
+            "print('ttt_ultimate' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout == "False\n"
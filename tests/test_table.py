@@ -0,0 +1,44 @@
+import pytest
+
+from ttt_core import TTTState
+from ttt_table import HEADER, SolutionTable, build_table
+
+from tests.solver import move_scores, reachable_positions, to_state
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = tmp_path_factory.mktemp("table") / "solutions.bin"
+    build_table(str(path))
+    table = SolutionTable(str(path), build_if_missing=False)
+    yield table
+    table.close()
+
+
+def test_table_matches_brute_force(table):
+    for grid, turn in reachable_positions():
+        state = to_state(grid)
+        scores = move_scores(grid, turn)
+        best = max(scores.values())
+        value, distance, _ = table.lookup(state, turn)
+        assert value == (best > 0) - (best < 0)
+        filled = state.turn_count
+        # see MinimaxPlayer for how the scores are built
+        assert distance == (10 - abs(best) - filled if best else 9 - filled)
+        assert sorted(table.best_moves(state, turn)) == sorted(i for i, s in scores.items() if s == best)
+
+
+def test_unreachable_position(table):
+    state = TTTState()
+    # x has three more tiles than o
+    for index in (0, 1, 5):
+        state.play(index, "x")
+    with pytest.raises(KeyError):
+        table.lookup(state, "o")
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(HEADER.pack(b"NOPE", 1, 4) + bytes(16))
+    with pytest.raises(ValueError):
+        SolutionTable(str(path), build_if_missing=False)
@@ -0,0 +1,150 @@
+"""Parts of the pygame front end that work without a window"""
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import pytest
+
+import tic_tac_toe
+from tic_tac_toe import Compositor, Scheduler, parse_args
+
+
+def test_connect_address():
+    assert parse_args(["--connect", "example.com"]).connect == ("example.com", None)
+    assert parse_args(["--connect", "127.0.0.1:9000"]).connect == ("127.0.0.1", 9000)
+    assert parse_args([]).connect is None
+
+
+@pytest.mark.parametrize("address", ["localhost:abc", ":8765", "localhost:0", "localhost:70000", "localhost:-1"])
+def test_bad_connect_address(address, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(["--connect", address])
+    assert "--connect takes HOST or HOST:PORT" in capsys.readouterr().err
+
+
+class Display:
+    """Stands in for pygame.display, remembering what the compositor showed"""
+
+    def __init__(self, monkeypatch):
+        self.calls = []
+        monkeypatch.setattr(pygame.display, "flip", lambda: self.calls.append("flip"))
+        monkeypatch.setattr(pygame.display, "update", lambda rects: self.calls.append(sorted(map(tuple, rects))))
+
+
+def test_compositor_merges_overlapping_rects():
+    rects = [pygame.Rect(0, 0, 10, 10), pygame.Rect(50, 50, 10, 10), pygame.Rect(5, 5, 10, 10),
+             pygame.Rect(14, 14, 40, 40), pygame.Rect(100, 0, 5, 5)]
+    # the third rect joins the first, and that union then touches the fourth, which reaches the second
+    assert sorted(map(tuple, Compositor.merge(rects))) == [(0, 0, 60, 60), (100, 0, 5, 5)]
+    # rects that only share an edge don't overlap
+    assert len(Compositor.merge([pygame.Rect(0, 0, 10, 10), pygame.Rect(10, 0, 10, 10)])) == 2
+    # and the rects that were passed in aren't changed
+    assert rects[0] == pygame.Rect(0, 0, 10, 10)
+
+
+def test_compositor_updates_once_per_frame(monkeypatch):
+    display = Display(monkeypatch)
+    compositor = Compositor(pygame.Rect(0, 0, 800, 600))
+    compositor.present()
+    assert display.calls == [] and compositor.presents == 0
+
+    compositor.add(pygame.Rect(0, 0, 10, 10), pygame.Rect(5, 5, 10, 10))
+    compositor.add(pygame.Rect(790, 590, 50, 50), pygame.Rect(900, 0, 10, 10))
+    compositor.present()
+    # clipped to the window, and whatever is outside of it is dropped
+    assert display.calls == [[(0, 0, 15, 15), (790, 590, 10, 10)]]
+    compositor.present()
+    assert len(display.calls) == 1 and compositor.presents == 1
+
+
+def test_compositor_flips_when_most_of_the_window_changed(monkeypatch):
+    display = Display(monkeypatch)
+    compositor = Compositor(pygame.Rect(0, 0, 100, 100), full_update_ratio=0.5)
+    compositor.add(pygame.Rect(0, 0, 100, 49))
+    compositor.present()
+    # overlapping rects count once, 100 x 50 is half the window
+    compositor.add(pygame.Rect(0, 0, 100, 30), pygame.Rect(0, 20, 100, 30))
+    compositor.present()
+    compositor.add(pygame.Rect(0, 0, 1, 1))
+    compositor.add_all()
+    compositor.present()
+    assert display.calls == [[(0, 0, 100, 49)], "flip", "flip"]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The scheduler's ticks(), moved forward by the test"""
+    now = [1000]
+    monkeypatch.setattr(tic_tac_toe, "ticks", lambda: now[0])
+    return now
+
+
+def test_timers_run_in_order(clock):
+    scheduler = Scheduler()
+    calls = []
+    scheduler.call_later(30, lambda: calls.append("c"))
+    scheduler.call_later(10, lambda: calls.append("a"))
+    # due at the same time as the one before, added later so it runs later
+    scheduler.call_later(10, lambda: calls.append("b"))
+    scheduler.run_due()
+    assert calls == []
+    clock[0] += 10
+    scheduler.run_due()
+    assert calls == ["a", "b"]
+    clock[0] += 100
+    scheduler.run_due()
+    assert calls == ["a", "b", "c"] and not scheduler.timers
+
+
+def test_repeating_timers_and_cancel(clock):
+    scheduler = Scheduler()
+    calls = []
+    every = scheduler.call_every(10, lambda: calls.append("every"))
+    later = scheduler.call_later(15, lambda: calls.append("later"))
+    scheduler.cancel(later)
+    for _ in range(3):
+        clock[0] += 10
+        scheduler.run_due()
+    assert calls == ["every"] * 3
+    # a late frame catches up on the runs it missed, and the timer stays on its 10 ms beat
+    clock[0] += 25
+    scheduler.run_due()
+    assert calls == ["every"] * 5 and every[0] == clock[0] + 5
+    scheduler.cancel(every)
+    clock[0] += 100
+    scheduler.run_due()
+    assert calls == ["every"] * 5 and not scheduler.timers
+
+
+def test_a_timer_can_cancel_itself(clock):
+    scheduler = Scheduler()
+    calls = []
+    timer = scheduler.call_every(10, lambda: (calls.append(clock[0]), scheduler.cancel(timer)))
+    clock[0] += 50
+    scheduler.run_due()
+    clock[0] += 50
+    scheduler.run_due()
+    assert calls == [1050]
+
+
+@pytest.mark.parametrize("interval", [0, -5])
+def test_call_every_needs_a_positive_interval(interval):
+    with pytest.raises(ValueError):
+        Scheduler().call_every(interval, print)
+
+
+def test_next_events_waits_for_the_next_timer():
+    pygame.display.init()
+    try:
+        pygame.event.clear()
+        scheduler = Scheduler()
+        scheduler.call_later(50, print)
+        start = time.perf_counter()
+        assert scheduler.next_events() == []
+        assert time.perf_counter() - start >= 0.04
+        # an event that's already there is returned without waiting
+        pygame.event.post(pygame.event.Event(pygame.USEREVENT))
+        assert [event.type for event in scheduler.next_events()] == [pygame.USEREVENT]
+    finally:
+        pygame.display.quit()
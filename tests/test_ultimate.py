@@ -0,0 +1,99 @@
+"""UltimateState against a naive implementation of the rules that works on an 81 tile grid"""
+import random
+
+from ttt_core import TTTGame
+from ttt_ultimate import UltimatePlayer, UltimateState, board_winners, ultimate_random_policy, win_info_of
+
+LINES = ((0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6))
+
+
+def naive_winner(tiles):
+    for a, b, c in LINES:
+        if tiles[a] is not None and tiles[a] == tiles[b] == tiles[c]:
+            return tiles[a]
+    return None
+
+
+def naive_rules(grid, last_move):
+    """Returns (winner of every board, closed boards, tiles the next move can go on)"""
+    boards = [grid[board * 9:board * 9 + 9] for board in range(9)]
+    winners = [naive_winner(tiles) for tiles in boards]
+    closed = [winner is not None or None not in tiles for winner, tiles in zip(winners, boards)]
+    if last_move is not None and not closed[last_move % 9]:
+        playable = [last_move % 9]
+    else:
+        playable = [board for board in range(9) if not closed[board]]
+    legal = [board * 9 + cell for board in playable for cell in range(9) if boards[board][cell] is None]
+    return winners, closed, legal
+
+
+def snapshot(state):
+    return (state.x_boards.copy(), state.o_boards.copy(), state.meta_x, state.meta_o, state.closed,
+            state.forced, state.moves.copy())
+
+
+def test_play_and_undo_follow_the_rules():
+    rng = random.Random(0)
+    for _ in range(100):
+        state = UltimateState()
+        grid = [None] * 81
+        snapshots = []
+        turn = rng.choice("xo")
+        last_move = None
+        while True:
+            winners, closed, legal = naive_rules(grid, last_move)
+            assert state.to_grid() == grid
+            assert sorted(state.empty_tiles()) == legal
+            assert all(state.is_legal(index) == (index in legal) for index in range(-1, 82))
+            assert board_winners(grid) == winners
+            assert [state.closed >> board & 1 == 1 for board in range(9)] == closed
+            meta_winner = naive_winner(winners)
+            if meta_winner is not None:
+                assert state.last_move_win(meta_winner) is not None
+                break
+            assert state.last_move_win("x") is None and state.last_move_win("o") is None
+            assert state.is_full() == all(closed)
+            if state.is_full():
+                break
+            snapshots.append(snapshot(state))
+            index = rng.choice(legal)
+            state.play(index, turn)
+            grid[index] = turn
+            last_move = index
+            turn = "o" if turn == "x" else "x"
+
+        copy = state.copy()
+        final = snapshot(state)
+        for expected in reversed(snapshots):
+            state.undo()
+            assert snapshot(state) == expected
+        # undoing didn't touch the copy
+        assert snapshot(copy) == final
+        state.reset()
+        assert snapshot(state) == snapshot(UltimateState())
+
+
+def test_win_info_of_replays_the_record():
+    rules = TTTGame(random.Random(1), state=UltimateState())
+    for _ in range(50):
+        rules.start()
+        while rules.game_ongoing:
+            win_info = rules.play(ultimate_random_policy(rules.state, rules.turn, rules.rng))
+        assert win_info_of(rules.game_history[-1]) == win_info
+
+
+def test_player_only_plays_legal_moves_and_beats_random():
+    player = UltimatePlayer(max_depth=2)
+    rules = TTTGame(random.Random(2), state=UltimateState())
+    wins = 0
+    for _ in range(10):
+        rules.start()
+        while rules.game_ongoing:
+            if rules.turn == "x":
+                move = player(rules.state.copy(), "x")
+                assert rules.state.is_legal(move)
+            else:
+                move = ultimate_random_policy(rules.state, "o", rules.rng)
+            rules.play(move)
+        wins += rules.game_history[-1].winner == "x"
+    assert wins >= 8
@@ -1,22 +1,83 @@
+import time
+# taken before anything else is imported so --profile-startup can include the imports
+STARTUP_TIME = time.perf_counter()
+
+import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import heapq
+import itertools
+import json
 from math import floor
 import os
+import random
+import socket
+import struct
+import threading
 import pygame
 from pygame.locals import *
-from random import choice
+
+# the AI, ultimate and network modules are imported where they're first needed, most games
+# never use all of them and they'd only slow down startup
+from ttt_core import TTTGame, line_ends, random_policy
+from ttt_history import HistoryStore
+from ttt_stats import GameStats, stats_path
 
 # Game constants
 WIN_SIZE = WIN_WIDTH, WIN_HEIGHT = 800, 600
+# the window can't be resized smaller than this, the text doesn't fit anymore
+MIN_WIN_SIZE = 640, 480
+# how many window sizes keep their layouts and scaled images around
+SIZE_CACHE_SIZE = 8
+# side of the cells of HitIndex's spatial hash in pixels
+HIT_CELL_SIZE = 64
 BLACK = 0, 0, 0
 WHITE = 255, 255, 255
 RED = 255, 0, 0
 BLUE = 0, 0, 255
 GREY = 192, 192, 192
+# boards the next move can go on in ultimate tic-tac-toe
+HIGHLIGHT = 255, 244, 200
+# the options screen darkens the game by multiplying it with tiles of this color, which looks the
+# same as images/darkbackground.png (black at alpha 150) but is a lot cheaper than alpha blending
+DARKEN = 105, 105, 105
+DARK_TILE_SIZE = 256
+# lines of text on the stats screen, and how many winning lines and openings it lists
+STATS_ROWS = 11
+STATS_TOP = 3
 
 START_SCREEN = "start screen"
 GAME_SCREEN = "game screen"
 ADDITIONAL_OPTIONS_SCREEN = "additional options screen"
 GAME_HISTORY_SCREEN = "game history screen"
 PAST_GAME_SCREEN = "past game screen"
+STATS_SCREEN = "stats screen"
+
+# symbol the computer plays with when AI mode is on
+AI_TURN = "o"
+# difficulties the "VS AI" option cycles through, None means AI mode is off
+AI_LEVELS = (None, "easy", "mcts", "hard", "perfect")
+# seconds the MCTS opponent thinks about each move, spread over every core
+MCTS_TIME_BUDGET = 0.5
+# derived assets and resolved font paths are kept here between runs
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asset_cache")
+FONT_CACHE_PATH = os.path.join(CACHE_DIR, "fonts.json")
+
+# how often the computer's turn tile blinks while it's thinking, in ms
+THINKING_BLINK_INTERVAL = 250
+# posted by AIWorker when an AI move or a hint has been computed
+AI_RESULT = pygame.USEREVENT + 1
+# posted by NetworkClient for every message from the server
+NET_MESSAGE = pygame.USEREVENT + 2
+# seconds --connect waits for the server before giving up
+CONNECT_TIMEOUT = 5
+# version of the files written by --record
+RECORDING_VERSION = 1
+# the profiler's latency histograms have power of two buckets in microseconds, up to about 16s
+HISTOGRAM_BUCKETS = 25
+# how many timed calls are kept for the Chrome trace, older ones are dropped
+TRACE_LIMIT = 200_000
 
 # Game functions
 class NoneSound:
@@ -30,6 +91,12 @@ class NoneFont:
     def render(self, t=None, a=None, c=None, b=None): pass
 
 
+def ticks():
+    """Milliseconds since startup. pygame.time.get_ticks() stays 0 without pygame.init(), which
+    main() doesn't call"""
+    return int((time.perf_counter() - STARTUP_TIME) * 1000)
+
+
 def load_sound(file):
     """loads a sound file, prepares it for play"""
     if not pygame.mixer:
@@ -44,11 +111,32 @@ def load_sound(file):
     
     return sound
 
+def find_font(name):
+    """Returns the path of a system font, or None for pygame's default font. Looking a font up
+    can take a lot longer than the rest of startup, so the answer is kept in FONT_CACHE_PATH"""
+    try:
+        with open(FONT_CACHE_PATH) as f:
+            paths = json.load(f)
+    except (OSError, ValueError):
+        paths = {}
+    if name in paths and (paths[name] is None or os.path.exists(paths[name])):
+        return paths[name]
+
+    paths[name] = pygame.font.match_font(name)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(FONT_CACHE_PATH, "w") as f:
+            json.dump(paths, f)
+    except OSError:
+        pass
+    return paths[name]
+
+
 def load_font(name, size):
     """Loads a system font by name"""
     if not pygame.font:
         return NoneFont()
-    font = pygame.font.SysFont(name, size)
+    font = pygame.font.Font(find_font(name), size)
     return font
 
 
@@ -81,100 +169,469 @@ def rotozoom(surface: pygame.Surface, angle, scale):
     return new_surface
 
 
+class AssetCache:
+    """On-disk cache of images after they were scaled and rotated for a window size. Surfaces are
+    stored as raw pixels, which load a lot faster than decoding the PNG and transforming it again.
+    An entry is rebuilt when the source image changes (its mtime or size)"""
+    # magic, width, height, per pixel alpha, has colorkey, colorkey rgba, has alpha, alpha, source mtime, source size
+    HEADER = struct.Struct("<4sHHBB4BBBqq")
+    MAGIC = b"TTTA"
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+        # when False, new entries are only built and not written, see TTTVisual.resize()
+        self.writable = True
+
+    def get(self, file, transform, build, colorkey=None):
+        """Returns build(load_image(file, colorkey)), from the cache when possible. transform has to
+        describe everything build does (including sizes), since it's part of the cache key"""
+        source = os.path.join("images", file)
+        try:
+            stat = os.stat(source)
+            source_id = stat.st_mtime_ns, stat.st_size
+        except OSError:
+            source_id = 0, 0
+        key = hashlib.sha1(f"{file}|{colorkey}|{transform}".encode()).hexdigest()
+        path = os.path.join(self.directory, f"{key}.raw")
+
+        surface = self.load(path, source_id)
+        if surface is None:
+            surface = build(load_image(file, colorkey))
+            self.save(path, surface, source_id)
+        return surface
+
+    def load(self, path, source_id):
+        """Returns the cached Surface at path, or None if it's missing or stale"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < self.HEADER.size:
+            return None
+        (magic, width, height, per_pixel_alpha, has_colorkey, r, g, b, a,
+         has_alpha, alpha, mtime, size) = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or (mtime, size) != source_id:
+            return None
+        pixel_format = "RGBA" if per_pixel_alpha else "RGB"
+        try:
+            surface = pygame.image.frombytes(data[self.HEADER.size:], (width, height), pixel_format)
+        except (ValueError, pygame.error):
+            return None
+        surface = surface.convert_alpha() if per_pixel_alpha else surface.convert()
+        if has_colorkey:
+            surface.set_colorkey((r, g, b, a), RLEACCEL)
+        if has_alpha:
+            surface.set_alpha(alpha)
+        return surface
+
+    def save(self, path, surface, source_id):
+        if not self.writable:
+            return
+        # a surface wide alpha sets the SRCALPHA flag too, only an alpha mask means per pixel alpha
+        per_pixel_alpha = surface.get_masks()[3] != 0
+        colorkey = surface.get_colorkey()
+        alpha = surface.get_alpha()
+        header = self.HEADER.pack(self.MAGIC, *surface.get_size(), per_pixel_alpha,
+                                  colorkey is not None, *(colorkey or (0, 0, 0, 0)),
+                                  alpha is not None, alpha or 0, *source_id)
+        pixels = pygame.image.tobytes(surface, "RGBA" if per_pixel_alpha else "RGB")
+        # the cache only makes startup faster, the game works fine if it can't be written
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(header + pixels)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+
+class TextCache:
+    """LRU cache of rendered text Surfaces. Rendering text is the slowest part of most redraws,
+    and the same few strings ("x won", "tie game", ...) get rendered over and over"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, antialias, color, background=None):
+        """Same arguments as pygame.font.Font.render, but only renders each text once"""
+        key = (font, text, antialias, color, background)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, antialias, color, background)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+class DigitAtlas:
+    """The ten digits rendered once, so counters are put together out of blits instead of
+    rendering a new string every time the number changes"""
+
+    def __init__(self, font, color, background=None):
+        self.digits = [font.render(str(digit), True, color, background) for digit in range(10)]
+        self.background = background
+        self.height = max(digit.get_height() for digit in self.digits)
+
+    def render(self, number):
+        """Returns a Surface with number on it, like font.render(str(number)) would"""
+        glyphs = [self.digits[int(char)] for char in str(number)]
+        surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), self.height))
+        if self.background is not None:
+            surface.fill(self.background)
+        else:
+            surface = surface.convert_alpha()
+            surface.fill((0, 0, 0, 0))
+        x = 0
+        for glyph in glyphs:
+            surface.blit(glyph, (x, 0))
+            x += glyph.get_width()
+        return surface
+
+
+class Compositor:
+    """Collects the parts of the window that changed during a frame, so the display is only
+    updated once per frame. Drawing code calls add() and the event loop calls present()"""
+
+    def __init__(self, win_rect, full_update_ratio=0.5):
+        self.win_rect = win_rect
+        # when this much of the window is dirty, a flip() is cheaper than updating every rect
+        self.full_update_ratio = full_update_ratio
+        self.dirty = []
+        self.full = False
+        # how many times the display was updated, for profiling
+        self.presents = 0
+
+    def add(self, *rects):
+        """Marks rects as changed"""
+        for rect in rects:
+            rect = self.win_rect.clip(rect)
+            if rect.width and rect.height:
+                self.dirty.append(rect)
+
+    def add_all(self):
+        """Marks the whole window as changed"""
+        self.full = True
+
+    @staticmethod
+    def merge(rects):
+        """Unions rects that overlap until none of them do"""
+        merged = []
+        for rect in rects:
+            rect = rect.copy()
+            # keep swallowing rects that touch this one, since the union may now touch earlier ones
+            while (index := rect.collidelist(merged)) != -1:
+                rect.union_ip(merged.pop(index))
+            merged.append(rect)
+        return merged
+
+    def present(self):
+        """Shows everything that changed since the last present() with a single display update"""
+        if not self.full and not self.dirty:
+            return
+        rects = self.merge(self.dirty) if not self.full else []
+        area = sum(rect.width * rect.height for rect in rects)
+        if self.full or area >= self.full_update_ratio * self.win_rect.width * self.win_rect.height:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.presents += 1
+        self.dirty.clear()
+        self.full = False
+
+
+class Scheduler:
+    """Drives the event loop. It blocks in pygame.event.wait until an event comes in or the next
+    timer is due, so an idle window uses no CPU. Also runs the timers"""
+
+    def __init__(self):
+        # heap of [due time in ms, sequence number, callback, repeat interval or None]
+        self.timers = []
+        self.sequence = itertools.count()
+
+    def call_later(self, delay, callback):
+        """Calls callback after delay milliseconds. Returns a handle for cancel()"""
+        timer = [ticks() + delay, next(self.sequence), callback, None]
+        heapq.heappush(self.timers, timer)
+        return timer
+
+    def call_every(self, interval, callback):
+        """Calls callback every interval milliseconds until cancelled"""
+        # run_due() would keep finding the timer due and never return
+        if interval <= 0:
+            raise ValueError(f"interval has to be positive, not {interval}")
+        timer = self.call_later(interval, callback)
+        timer[3] = interval
+        return timer
+
+    def cancel(self, timer):
+        # the timer stays in the heap, it's just skipped when it comes up
+        timer[2] = None
+
+    def next_events(self):
+        """Returns the events of the next frame, blocking while there is nothing to do"""
+        if self.timers:
+            timeout = self.timers[0][0] - ticks()
+            if timeout <= 0:
+                return pygame.event.get()
+            event = pygame.event.wait(timeout)
+        else:
+            event = pygame.event.wait()
+        if event.type == NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
+    def run_due(self):
+        """Runs every timer that is due"""
+        now = ticks()
+        while self.timers and self.timers[0][0] <= now:
+            timer = heapq.heappop(self.timers)
+            callback, interval = timer[2], timer[3]
+            if callback is None:
+                continue
+            if interval is not None:
+                timer[0] += interval
+                heapq.heappush(self.timers, timer)
+            callback()
+
+
 class TTTVisual:
     """handles the visual aspects of the game"""
     # TODO: MOVE ALL RECTS TO LAYOUTS CLASS
-
-    def __init__(self, win: pygame.Surface, texts):
+    # everything that depends on the window size. resize() keeps them per size
+    SIZE_DEPENDENT = ("layouts", "grid", "x_grid_tile", "o_grid_tile", "x_hint_tile",
+                      "o_hint_tile", "x_turn_tile", "o_turn_tile", "x_board_tile", "o_board_tile",
+                      "more_button", "more_button_rect", "x_lines", "o_lines", "play_button_rect", "hit_indexes")
+
+    def __init__(self, win: pygame.Surface, texts, size=3, k=3, ultimate=False):
+        # everything drawn is shown by the compositor, once per frame
+        self.compositor = Compositor(win.get_rect())
+        # the grid has size x size tiles and k in a row wins
+        self.size, self.k = size, k
+        # ultimate tic-tac-toe, the grid is 3x3 boards of 3x3 tiles
+        self.ultimate = ultimate
+        self.texts = texts
+        # every text that isn't pre-rendered in create_texts() goes through these
+        self.text_cache = TextCache()
+        self.turn_count_digits = DigitAtlas(texts["majorfont"], BLACK, WHITE)
+        # game images, already scaled for the window when they are in the cache
+        self.assets = AssetCache()
+        # window size -> {name in SIZE_DEPENDENT: value}, least recently used first
+        self.size_cache = OrderedDict()
+        self.layouts = None
+        # one small tile for every window size instead of a window sized surface
+        self.dark_tile = pygame.Surface((DARK_TILE_SIZE, DARK_TILE_SIZE)).convert()
+        self.dark_tile.fill(DARKEN)
+        self.resize(win)
+
+    def resize(self, win: pygame.Surface):
+        """Switches everything over to the current size of win. Sizes that were seen recently
+        are taken from self.size_cache, so dragging the window back and forth doesn't scale any
+        image twice. Nothing is drawn, TTTFunc.redraw() does that"""
+        old_layouts = self.layouts
         self.win, self.win_rect = win, win.get_rect()
-        self.layouts = Layouts(self.win, texts)  # object with all Rects that will be used in the game
-        ### load in all game images
-        self.grid = load_image("grid.png", WHITE, 
-                               size=(floor(self.win_rect.width*0.5), floor((self.win_rect.height*0.8)*0.8)))
-        self.x_tile_og = load_image("X_tile.png", WHITE)
-        self.o_tile_og = load_image("O_tile.png", WHITE)
-        self.x_line_og = load_image("X_line.png", WHITE)
-        self.o_line_og = load_image("O_line.png", WHITE)
-        self.more_button_og = load_image("more_button.png", WHITE)
-        self.dark_background = load_image("darkbackground.png", size=self.win_rect.size, alpha=150)
-
-        self.layouts.create_grid_layout(self.grid)
+        self.compositor.win_rect = self.win_rect
+
+        assets = self.size_cache.pop(self.win_rect.size, None)
+        if assets is None:
+            # a live resize goes through lots of sizes that are never seen again, so only the
+            # default one is worth writing to the disk cache
+            self.assets.writable = self.win_rect.size == WIN_SIZE
+            self.create_sized_assets()
+            assets = {name: getattr(self, name) for name in self.SIZE_DEPENDENT}
+        else:
+            for name, value in assets.items():
+                setattr(self, name, value)
+        self.size_cache[self.win_rect.size] = assets
+        if len(self.size_cache) > SIZE_CACHE_SIZE:
+            self.size_cache.popitem(last=False)
+
+        # the options keep their texts (like the AI level) in their new spots
+        if old_layouts is not None:
+            self.layouts.additional_options = [
+                (text, text.get_rect(center=rect.center))
+                for (text, _), (_, rect) in zip(old_layouts.additional_options, self.layouts.additional_options)]
+            self.create_additional_options_hit_index()
+
+    @property
+    def surface(self):
+        """The window, for pygame.draw. win is a CountingSurface while the Profiler counts blits"""
+        return getattr(self.win, "surface", self.win)
+
+    def create_sized_assets(self):
+        """Creates the layouts and scales the images for the current window size"""
+        self.layouts = Layouts(self.win, self.texts)  # object with all Rects that will be used in the game
+        size = self.size
+        grid_size = floor(self.win_rect.width*0.5), floor((self.win_rect.height*0.8)*0.8)
+        if self.ultimate:
+            self.grid = self.create_ultimate_grid_image(grid_size)
+        else:
+            if size == 3:
+                self.grid = self.assets.get("grid.png", f"scale {grid_size}",
+                                            lambda image: pygame.transform.scale(image, grid_size), WHITE)
+            else:
+                self.grid = self.create_grid_image(grid_size)
+            self.layouts.create_grid_layout(self.grid, size)
         self.create_XO_tiles()
         self.layouts.create_game_info_layout(self.x_turn_tile, self.o_turn_tile)
 
         self.create_more_button()
         self.create_XO_lines()
-
-        self.texts = texts
-
-        self.screens = {
-        # Copy of these surfaces will be added when switching from one screen to the other.
-        # Eg. When switching from 'game screen' to 'additional options screen', copy of 'game screen' will
-        # be made and entered into self.screens['game screen']
-            GAME_SCREEN: None,
-            ADDITIONAL_OPTIONS_SCREEN: None,
-            GAME_HISTORY_SCREEN: None
+        x, y = floor(self.win_rect.width*(7/10)), floor(self.win_rect.height*(8/10))
+        self.play_button_rect = self.win_rect.inflate(-x, -y)
+        self.create_hit_indexes()
+
+    def create_hit_indexes(self):
+        """Creates the HitIndex of every screen. Widgets that overlap are added most specific first"""
+        layouts = self.layouts
+        start = HitIndex(self.win_rect)
+        start.add("play", self.play_button_rect)
+
+        game = HitIndex(self.win_rect)
+        if self.ultimate:
+            # the small grids have gaps between them, so their tiles aren't one uniform grid
+            for i, (tile, _) in enumerate(layouts.grid_tile_rects):
+                game.add("tile", tile, i)
+        else:
+            tile_width, tile_height = layouts.grid_tile_rects[0][0].size
+            game.add_grid("tile", pygame.Rect(layouts.grid_rect.topleft, (tile_width * self.size, tile_height * self.size)),
+                          self.size, self.size)
+        game.add("more", self.more_button_rect)
+
+        history = HitIndex(self.win_rect)
+        history.add("down", layouts.game_history_down_arrow_rect)
+        history.add("up", layouts.game_history_up_arrow_rect)
+        for i, slot in enumerate(layouts.game_history_slots):
+            history.add("slot", slot, i)
+        history.add("container", layouts.game_history_container)
+
+        past_game = HitIndex(self.win_rect)
+        past_game.add("back", layouts.past_game_slots[0])
+        past_game.add("prev", layouts.replay_prev_rect)
+        past_game.add("next", layouts.replay_next_rect)
+
+        stats = HitIndex(self.win_rect)
+        stats.add("container", layouts.stats_container)
+
+        self.hit_indexes = {
+            START_SCREEN: start,
+            GAME_SCREEN: game,
+            ADDITIONAL_OPTIONS_SCREEN: None,  # depends on the texts of the options, see below
+            GAME_HISTORY_SCREEN: history,
+            PAST_GAME_SCREEN: past_game,
+            STATS_SCREEN: stats,
         }
+        self.create_additional_options_hit_index()
+
+    def create_additional_options_hit_index(self):
+        """The options are hit by their text, so this is made again whenever one of them changes"""
+        options = HitIndex(self.win_rect)
+        for i, (_, rect) in enumerate(self.layouts.additional_options):
+            options.add("option", rect, i)
+        options.add("container", self.layouts.additional_options_container)
+        self.hit_indexes[ADDITIONAL_OPTIONS_SCREEN] = options
+
+    def create_grid_image(self, grid_size):
+        """grid.png only has 3x3 tiles, so bigger grids are drawn with lines instead"""
+        grid = pygame.Surface(grid_size)
+        grid.fill(WHITE)
+        grid.set_colorkey(WHITE, RLEACCEL)
+        width, height = grid_size
+        thickness = max(1, 12 // self.size)
+        for i in range(1, self.size):
+            x, y = width * i // self.size, height * i // self.size
+            pygame.draw.line(grid, BLACK, (x, 0), (x, height), thickness)
+            pygame.draw.line(grid, BLACK, (0, y), (width, y), thickness)
+        return grid
+
+    def create_ultimate_grid_image(self, grid_size):
+        """Thick lines between the boards and a thin 3x3 grid on each one. Also lays out the grid,
+        the small grids are drawn where the layout puts the boards"""
+        grid = pygame.Surface(grid_size)
+        grid.fill(WHITE)
+        grid.set_colorkey(WHITE, RLEACCEL)
+        self.layouts.create_grid_layout(grid, 3, levels=2)
+        width, height = grid_size
+        for i in (1, 2):
+            pygame.draw.line(grid, BLACK, (width * i // 3, 0), (width * i // 3, height), 6)
+            pygame.draw.line(grid, BLACK, (0, height * i // 3), (width, height * i // 3), 6)
+        for board in self.layouts.board_rects:
+            board = board.move(-self.layouts.grid_rect.left, -self.layouts.grid_rect.top)
+            for i in (1, 2):
+                x, y = board.left + board.width * i // 3, board.top + board.height * i // 3
+                pygame.draw.line(grid, BLACK, (x, board.top), (x, board.bottom), 2)
+                pygame.draw.line(grid, BLACK, (board.left, y), (board.right, y), 2)
+        return grid
+
+    def scaled(self, file, size):
+        """Loads an image with a white colorkey scaled to size, through the asset cache"""
+        return self.assets.get(file, f"scale {size}", lambda image: pygame.transform.scale(image, size), WHITE)
 
     def create_XO_tiles(self):
         """Create X and O tiles that will be placed on the grid and the X and O tiles that will
         indicate whose turn it is"""
         grid_tile_size = self.layouts.grid_tile_rects[0][1].size
         # scale X and O tiles to be same size as each tile
-        self.x_grid_tile = pygame.transform.scale(self.x_tile_og, grid_tile_size)
-        self.o_grid_tile = pygame.transform.scale(self.o_tile_og, grid_tile_size)
+        self.x_grid_tile = self.scaled("X_tile.png", grid_tile_size)
+        self.o_grid_tile = self.scaled("O_tile.png", grid_tile_size)
+
+        # faded tiles to show the best moves when a hint is asked for
+        self.x_hint_tile = self.x_grid_tile.copy()
+        self.x_hint_tile.set_alpha(80)
+        self.o_hint_tile = self.o_grid_tile.copy()
+        self.o_hint_tile.set_alpha(80)
 
         ## Tiles to indicate turn status
-        self.x_turn_tile = pygame.transform.scale(self.x_tile_og, (50, 50))
-        self.o_turn_tile = pygame.transform.scale(self.o_tile_og, (50, 50))
+        self.x_turn_tile = self.scaled("X_tile.png", (50, 50))
+        self.o_turn_tile = self.scaled("O_tile.png", (50, 50))
+
+        # big X and O over the boards won in ultimate tic-tac-toe
+        self.x_board_tile = self.o_board_tile = None
+        if self.ultimate:
+            board_size = scale(self.layouts.board_rects[0], -0.2).size
+            self.x_board_tile = self.scaled("X_tile.png", board_size)
+            self.o_board_tile = self.scaled("O_tile.png", board_size)
 
     def create_XO_lines(self):
         """Creates red and blue lines that will be used to cross across a winning grid
         red = X winner and blue = O winner"""
-        # straight lines for row and column wins
-        size = self.o_line_og.get_rect().width, self.layouts.grid_rect.height
-        x_line = pygame.transform.scale(self.x_line_og, size)
-        o_line = pygame.transform.scale(self.o_line_og, size)
-        self.x_lines = (x_line, pygame.transform.rotate(x_line, 90),
-                        rotozoom(x_line, -47, 1.2), rotozoom(x_line, 47, 1.2))
-        self.o_lines = (o_line, pygame.transform.rotate(o_line, 90),
-                        rotozoom(o_line, -47, 1.2), rotozoom(o_line, 47, 1.2))
+        # straight lines for row and column wins, long enough to cross k tiles
+        line_width = self.assets.get("O_line.png", "original", lambda image: image, WHITE).get_width()
+        # ultimate tic-tac-toe is won with a line of boards, like the normal 3x3 game
+        grid_size, k = (3, 3) if self.ultimate else (self.size, self.k)
+        size = (max(2, line_width * 3 // grid_size),
+                self.layouts.grid_rect.height * k // grid_size)
+        # the line in each direction, see ttt_core.DIRECTIONS
+        transforms = (
+            ("", lambda line: line),
+            ("rotate 90", lambda line: pygame.transform.rotate(line, 90)),
+            ("rotozoom -47 1.2", lambda line: rotozoom(line, -47, 1.2)),
+            ("rotozoom 47 1.2", lambda line: rotozoom(line, 47, 1.2)),
+        )
+        self.x_lines, self.o_lines = (
+            tuple(self.assets.get(file, f"scale {size} {name}",
+                                  lambda image, transform=transform: transform(pygame.transform.scale(image, size)), WHITE)
+                  for name, transform in transforms)
+            for file in ("X_line.png", "O_line.png"))
 
     def create_more_button(self):
         """Scales 'more' button to proper size and gets its Rect in the layout"""
         section = pygame.Rect(floor(self.win_rect.width*(2/3)), floor(self.win_rect.height*(8/10)),
                               floor(self.win_rect.width*(1/3)), floor(self.win_rect.height*(2/10)))
-        self.more_button = pygame.transform.scale(self.more_button_og, (floor(section.width*(4/10)), floor(section.height*(8/10))))
+        self.more_button = self.scaled("more_button.png", (floor(section.width*(4/10)), floor(section.height*(8/10))))
         self.more_button_rect = self.more_button.get_rect(center=section.center)
 
-    def create_additional_options(self) -> list:
-        """Places layout of additional options in a list for blitting"""
-        options = []
-        option_texts = [self.texts["history"], pygame.Surface((50,50)), pygame.Surface((50,50))]
-        # Rect for white rectangular container surrounding the additional options
-        x, y = -floor(self.win_rect.width*(1/2)), -floor(self.win_rect.height*(1/2))
-        container_rect = self.win_rect.inflate(x, y)
-        # splits the rectangular container into three horizontal Rects
-        height = floor(container_rect.height*(1/3))
-        for i in range(3):
-            new_rect = container_rect.copy()
-            new_rect.height = height
-            if i != 0:
-                new_rect.top += floor(container_rect.height*(i/3))
-            else:
-                pass
-            options.append((option_texts[i], option_texts[i].get_rect(center=new_rect.center)))
-        options.append(container_rect)
-        return options
-     
     def draw_start_screen(self):
         """Draws start screen of game. Just a white screen with big play button"""
         self.win.fill(WHITE)
-        x, y = floor(self.win_rect.width*(7/10)), floor(self.win_rect.height*(8/10))
-        self.play_button_rect = self.win_rect.inflate(-x, -y)
-        pygame.draw.rect(self.win, GREY, self.play_button_rect)
+        pygame.draw.rect(self.surface, GREY, self.play_button_rect)
         self.win.blit(self.texts["play"], self.texts["play"].get_rect(center=self.play_button_rect.center))
-        pygame.display.flip()
+        self.compositor.add_all()
 
     def draw_game_screen(self, turn, turn_count):
         """Draws the game screen on the window. Includes grid and all the other stuff."""
@@ -186,11 +643,16 @@ class TTTVisual:
         self.update_turn_tiles(turn)
         self.update_turn_count(turn_count, set_game_screen=True)
         self.draw_more_button()
-        pygame.display.flip()
+        self.compositor.add_all()
 
-    def draw_grid(self, game_data):
-        """Algorithm to draw grid with list representing grid"""
+    def draw_grid(self, game_data, playable=()):
+        """Algorithm to draw grid with list representing grid. In ultimate tic-tac-toe the boards in
+        playable are highlighted and the boards that were won get a big X or O"""
         grid, _, _ = game_data
+        if self.ultimate:
+            self.win.fill(WHITE, self.layouts.grid_rect)
+            for board in playable:
+                self.win.fill(HIGHLIGHT, self.layouts.board_rects[board])
         self.win.blit(self.grid, self.layouts.grid_rect)
         grid_to_blit = []
         for index in range(len(grid)):
@@ -203,16 +665,43 @@ class TTTVisual:
             else:
                 grid_to_blit.append((self.o_grid_tile, tile))
         self.win.blits(grid_to_blit)
+        if self.ultimate:
+            self.draw_won_boards(grid)
+            self.compositor.add(self.layouts.grid_rect)
+
+    def draw_won_boards(self, grid):
+        """Covers every board that was won with a big X or O"""
+        from ttt_ultimate import board_winners
+        for board, winner in zip(self.layouts.board_rects, board_winners(grid)):
+            if winner is not None:
+                # the thin lines are a bit wider than the board
+                self.win.fill(WHITE, board.inflate(4, 4))
+                tile = self.x_board_tile if winner == "x" else self.o_board_tile
+                self.win.blit(tile, tile.get_rect(center=board.center))
 
     def draw_past_game_screen(self, game_data):
-        """Draws a past game selected from the game history screen"""
-        self.screens[GAME_HISTORY_SCREEN] = self.win.copy()
-
+        """Draws a past game selected from the game history screen, at its final move"""
         self.win.fill(WHITE)
         self.draw_grid(game_data)
-        pygame.draw.polygon(self.win, GREY, self.layouts.past_game_back_arrow)
-
-        pygame.display.flip()
+        pygame.draw.polygon(self.surface, GREY, self.layouts.past_game_back_arrow)
+        pygame.draw.polygon(self.surface, GREY, self.layouts.replay_prev_arrow)
+        pygame.draw.polygon(self.surface, GREY, self.layouts.replay_next_arrow)
+        self.draw_replay_counter(game_data.turn_count, game_data.turn_count)
+
+        self.compositor.add_all()
+
+    def draw_replay_step(self, record, step):
+        """Shows a past game as it was after the first step moves"""
+        self.win.fill(WHITE, self.layouts.grid_rect)
+        self.draw_grid((record.grid_at(step), record.winner, step))
+        self.draw_replay_counter(step, record.turn_count)
+        self.compositor.add(self.layouts.grid_rect, self.layouts.replay_text_rect)
+
+    def draw_replay_counter(self, step, turn_count):
+        """Blits "move step/turn_count" between the replay arrows"""
+        self.win.fill(WHITE, self.layouts.replay_text_rect)
+        text = self.text_cache.render(self.texts["majorfont"], f"move {step}/{turn_count}", True, BLACK)
+        self.win.blit(text, text.get_rect(center=self.layouts.replay_text_rect.center))
 
     def update_tile(self, index, turn):
         """Draws either X or O on tile when tile is clicked"""
@@ -221,8 +710,22 @@ class TTTVisual:
             self.win.blit(self.x_grid_tile, tile)
         elif turn == "o":
             self.win.blit(self.o_grid_tile, tile)
-        pygame.display.update(tile)
+        self.compositor.add(tile)
     
+    def draw_hint(self, indexes, turn):
+        """Draws a faded X or O on every tile in indexes"""
+        hint_tile = self.x_hint_tile if turn == "x" else self.o_hint_tile
+        tiles = [self.layouts.grid_tile_rects[index][1] for index in indexes]
+        self.win.blits([(hint_tile, tile) for tile in tiles])
+        self.compositor.add(*tiles)
+
+    def clear_hint(self, indexes):
+        """Removes hint tiles drawn by draw_hint()"""
+        tiles = [self.layouts.grid_tile_rects[index][1] for index in indexes]
+        for tile in tiles:
+            self.win.fill(WHITE, tile)
+        self.compositor.add(*tiles)
+
     def update_turn_tiles(self, turn):
         """Changes the transparency of the two turn tiles to indicate whose turn it is"""
         self.win.fill(WHITE, self.layouts.x_turn_tile_rect)
@@ -239,8 +742,7 @@ class TTTVisual:
         
         self.win.blit(self.x_turn_tile, self.layouts.x_turn_tile_rect)
         self.win.blit(self.o_turn_tile, self.layouts.o_turn_tile_rect)
-        pygame.display.update(self.layouts.x_turn_tile_rect)
-        pygame.display.update(self.layouts.o_turn_tile_rect)
+        self.compositor.add(self.layouts.x_turn_tile_rect, self.layouts.o_turn_tile_rect)
 
     def update_turn_count(self, turn_count, *, set_game_screen=False, game_over=False, tie=False):
         """Update the turn counter. If being called from set_game_screen(), it will also blit "Current turn:" on top of the
@@ -252,21 +754,24 @@ class TTTVisual:
             self.win.fill(WHITE, self.layouts.turn_count_text_rect)
             self.win.blit(self.texts["gamewonin?turns"], 
                           self.texts["gamewonin?turns"].get_rect(center=self.layouts.turn_count_text_rect.center))
-            pygame.display.update(self.layouts.turn_count_text_rect)
+            self.compositor.add(self.layouts.turn_count_text_rect)
         elif tie:
             self.win.fill(WHITE, self.layouts.turn_count_text_rect)
             self.win.fill(WHITE, self.layouts.turn_count_rect)
             # the rect is a union of the two rects that make up the turn count section, so it centers perfectly
             self.win.blit(self.texts["tiegame"],
                           self.texts["tiegame"].get_rect(center=self.layouts.turn_count_rect.union(self.layouts.turn_count_text_rect).center))
-            pygame.display.update(self.layouts.turn_count_text_rect)
-            pygame.display.update(self.layouts.turn_count_rect)
+            self.compositor.add(self.layouts.turn_count_text_rect, self.layouts.turn_count_rect)
 
         if turn_count is not None:
-            turn_count_surface = self.texts["majorfont"].render(str(turn_count), True, BLACK, WHITE)
+            turn_count_surface = self.turn_count_digits.render(turn_count)
             rect = turn_count_surface.get_rect(center=self.layouts.turn_count_rect.center)
             self.win.blit(turn_count_surface, rect)
-            pygame.display.update(self.layouts.turn_count_rect)
+            self.compositor.add(self.layouts.turn_count_rect)
+
+    def set_status(self, text):
+        """Shows text in the window title"""
+        pygame.display.set_caption(f"TIC-TAC-TOE - {text}")
 
     def draw_more_button(self):
         """Adds the 'more' button to the game screen layout"""
@@ -276,7 +781,13 @@ class TTTVisual:
         """When there is a winner, draws line to cross over winning tiles. Doesn't do anything if it's a tie"""
         if win_info == "tie":
             return
-        center = self.layouts.grid_tile_rects[win_info[0]][0].center
+        if self.ultimate:
+            center = self.layouts.board_rects[win_info[0]].center
+        else:
+            # halfway between the first and last tile, with an even k that's between two tiles
+            first, last = (self.layouts.grid_tile_rects[index][0].center
+                           for index in line_ends(*win_info, self.size, self.k))
+            center = (first[0] + last[0]) // 2, (first[1] + last[1]) // 2
         dir = win_info[1]
 
         if turn == "x":
@@ -286,32 +797,32 @@ class TTTVisual:
             line = self.o_lines[dir]
             self.win.blit(line, line.get_rect(center=center))
 
-        pygame.display.update(self.layouts.grid_rect)
+        self.compositor.add(self.layouts.grid_rect)
 
     def draw_additional_options_screen(self):
         """Darkens game and shows additional settings layout"""
-        # Keep copy of "game screen" Surface for when we want to go back
-        self.screens[GAME_SCREEN] = self.win.copy()
-
         # darkens the background
-        self.win.blit(self.dark_background, self.win_rect)
+        self.win.blits([(self.dark_tile, (x, y), None, BLEND_RGB_MULT)
+                        for x in range(0, self.win_rect.width, DARK_TILE_SIZE)
+                        for y in range(0, self.win_rect.height, DARK_TILE_SIZE)])
         # create Rect for additional options square then draw it
-        pygame.draw.rect(self.win, WHITE, self.layouts.additional_options_container)
+        pygame.draw.rect(self.surface, WHITE, self.layouts.additional_options_container)
         self.win.blits(self.layouts.additional_options)
-        pygame.display.flip()
-
-    def go_back_to_prev_screen(self, screen):
-        """Exits the modal screen and reblits the previous surface"""
-        self.win.fill(WHITE)
-        self.win.blit(self.screens[screen], self.win_rect)
-        pygame.display.flip()
+        self.compositor.add_all()
+
+    def update_additional_option(self, index, text):
+        """Replaces the text of one of the additional options while the options screen is shown"""
+        _, old_rect = self.layouts.additional_options[index]
+        new_rect = text.get_rect(center=old_rect.center)
+        self.layouts.additional_options[index] = (text, new_rect)
+        self.create_additional_options_hit_index()
+        self.win.fill(WHITE, old_rect)
+        self.win.blit(text, new_rect)
+        self.compositor.add(old_rect.union(new_rect))
 
     def draw_game_history_screen(self, game_history, index):
         """Shows screen with all previous games you have played"""
-        if self.screens[ADDITIONAL_OPTIONS_SCREEN] is None:
-            self.screens[ADDITIONAL_OPTIONS_SCREEN] = self.win.copy()
-
-        pygame.draw.rect(self.win, WHITE, self.layouts.game_history_container)
+        pygame.draw.rect(self.surface, WHITE, self.layouts.game_history_container)
 
         visible_history = []
         blit_sequence = []
@@ -324,23 +835,50 @@ class TTTVisual:
             except IndexError:
                 break
             if winner != "tie":
-                text = self.texts["majorfont"].render(f"{winner} won", True, BLACK)
+                text = self.text_cache.render(self.texts["majorfont"], f"{winner} won", True, BLACK)
             else:
-                text = self.texts["majorfont"].render("tie game", True, BLACK)
+                text = self.text_cache.render(self.texts["majorfont"], "tie game", True, BLACK)
             blit_sequence.append((text, text.get_rect(center=slot.center)))
             game_index -= 1
 
         # draws lines to seperate each slot and blits the contents
         for slot in self.layouts.game_history_slots[1:5]:
-            pygame.draw.line(self.win, BLACK, (slot.left+20, slot.top), (slot.right-20, slot.top))
+            pygame.draw.line(self.surface, BLACK, (slot.left+20, slot.top), (slot.right-20, slot.top))
         # blit the sequence and arrows
         self.win.blits(blit_sequence)
-        up_arrow = pygame.draw.polygon(self.win, GREY, self.layouts.game_history_up_arrow)
-        down_arrow = pygame.draw.polygon(self.win, GREY, self.layouts.game_history_down_arrow)
-        pygame.display.update(self.layouts.game_history_container)
+        up_arrow = pygame.draw.polygon(self.surface, GREY, self.layouts.game_history_up_arrow)
+        down_arrow = pygame.draw.polygon(self.surface, GREY, self.layouts.game_history_down_arrow)
+        self.compositor.add(self.layouts.game_history_container)
 
         return visible_history
-        
+
+    def draw_stats_screen(self, stats):
+        """Shows the win rates, average game length, most common winning lines and the openings the
+        first player did best with. stats already has everything counted, so this takes the same
+        time no matter how many games were played"""
+        pygame.draw.rect(self.surface, WHITE, self.layouts.stats_container)
+        if stats.games:
+            x_rate, o_rate, tie_rate = stats.win_rates()
+            lines = [
+                ("majorfont", f"{stats.games:,} games"),
+                ("minorfont", f"x won {x_rate:.0%}   o won {o_rate:.0%}   tie {tie_rate:.0%}"),
+                ("minorfont", f"{stats.mean_turn_count():.1f} turns on average"),
+                ("minorfont", "most common wins"),
+            ]
+            lines += [("minorfont", f"{name}: {count:,} games") for name, count in stats.top_lines(STATS_TOP)]
+            lines.append(("minorfont", "best openings"))
+            lines += [("minorfont", f"{name}: {won:.0%} won, {tie:.0%} tie in {games:,}")
+                      for name, won, tie, games in stats.top_openings(STATS_TOP)]
+        else:
+            lines = [("majorfont", "no games yet")]
+
+        blit_sequence = []
+        for (font, line), row in zip(lines, self.layouts.stats_rows):
+            text = self.text_cache.render(self.texts[font], line, True, BLACK)
+            blit_sequence.append((text, text.get_rect(center=row.center)))
+        self.win.blits(blit_sequence)
+        self.compositor.add(self.layouts.stats_container)
+
 
 class Layouts:
     """Object that holds Rects that organize game layout"""
@@ -349,30 +887,39 @@ class Layouts:
         self.texts = texts
     
         self.past_game_slots, self.past_game_back_arrow = self.create_past_game_layout()
+        # Rects and arrows for stepping through a past game
+        (self.replay_prev_rect, self.replay_next_rect, self.replay_text_rect,
+        self.replay_prev_arrow, self.replay_next_arrow) = self.create_replay_layout()
         # Rects for additional options screen
         self.additional_options_container, self.additional_options = self.create_additional_options_layout()
         # Rects for game history screen
         (self.game_history_container, self.game_history_slots, 
         self.game_history_up_arrow, self.game_history_down_arrow,
         self.game_history_up_arrow_rect, self.game_history_down_arrow_rect) = self.create_game_history_layout()
+        # Rects for the stats screen
+        self.stats_container, self.stats_rows = self.create_stats_layout()
 
-    def create_grid_layout(self, grid):
+    def create_grid_layout(self, grid, size=3, levels=1, rect=None):
         """Setups the Rect for the grid image and creates the underlying Rects for X and O
-        tiles to be placed"""
-        # centers grid image to the top 80% of window
-        center = self.win_rect.centerx, (self.win_rect.height * 0.8) // 2
-        self.grid_rect = grid.get_rect(center=center)  
+        tiles to be placed. The grid has size x size tiles. With levels=2 (ultimate tic-tac-toe)
+        each of those tiles is laid out as a grid of its own by calling this again, then
+        grid_tile_rects has the small tiles board by board and board_rects has the small grids"""
+        if rect is None:
+            # centers grid image to the top 80% of window
+            center = self.win_rect.centerx, (self.win_rect.height * 0.8) // 2
+            rect = grid.get_rect(center=center)
+        self.grid_rect = rect
 
         # creates a list of Rects in the form of a grid that lie on top of the grid_rect
         # the indexes in the list will point to the Rect of a certain tile
         self.grid_tile_rects = []
         left = self.grid_rect.left
         top = self.grid_rect.top
-        left_increment = self.grid_rect.width // 3
-        top_increment = self.grid_rect.height // 3
+        left_increment = self.grid_rect.width // size
+        top_increment = self.grid_rect.height // size
         width, height = left_increment, top_increment
-        for i in range(9):
-            if i != 0 and i % 3 == 0:
+        for i in range(size * size):
+            if i != 0 and i % size == 0:
                 top += top_increment
                 left = self.grid_rect.left
             # tile_rect_collide used so that user can click anywhere in the specific tile and their symbol will be placed
@@ -382,6 +929,16 @@ class Layouts:
             left += left_increment
             self.grid_tile_rects.append((tile_rect_collide, tile_rect_pos))
 
+        if levels > 1:
+            grid_rect, boards = self.grid_rect, self.grid_tile_rects
+            self.board_rects, tiles = [], []
+            for board, _ in boards:
+                # leaves room for the thick lines between the boards
+                self.create_grid_layout(grid, size, levels - 1, scale(board, -0.15))
+                self.board_rects.append(self.grid_rect)
+                tiles += self.grid_tile_rects
+            self.grid_rect, self.grid_tile_rects = grid_rect, tiles
+
     def create_game_info_layout(self, x_turn_tile, o_turn_tile):
         """Creates Rects all components of the bottom 20% of the game screen"""
         # Makes Rects for the X and O that indicate whose turn it is
@@ -437,10 +994,22 @@ class Layouts:
 
         return container, slots, up_arrow, down_arrow, i, j
 
+    def create_stats_layout(self):
+        """Creates the container of the stats screen, the same size as the game history one, and
+        splits it into STATS_ROWS rows of text"""
+        x, y = floor(self.win_rect.width*(4/10)), floor(self.win_rect.height*(2/10))
+        container = self.win_rect.inflate(-x, -y)
+        rows = []
+        for i in range(STATS_ROWS):
+            top = container.top + floor(container.height*(i/STATS_ROWS))
+            bottom = container.top + floor(container.height*((i + 1)/STATS_ROWS))
+            rows.append(pygame.Rect(container.left, top, container.width, bottom - top))
+        return container, rows
+
     def create_additional_options_layout(self):
         """Creates Rects for the additional options screen"""
         options = []
-        option_texts = [self.texts["history"], pygame.Surface((50,50)), pygame.Surface((50,50))]
+        option_texts = [self.texts["history"], self.texts["aioff"], self.texts["stats"]]
         # Rect for white rectangular container surrounding the additional options
         x, y = floor(self.win_rect.width*(1/2)), floor(self.win_rect.height*(1/2))
         container_rect = self.win_rect.inflate(-x, -y)
@@ -478,24 +1047,225 @@ class Layouts:
         ]
         return slots, back_arrow
 
+    def create_replay_layout(self):
+        """Creates Rects for the previous/next move buttons and the move counter of the past game
+        screen. They all go inside the second slot of the past game layout"""
+        slot = self.past_game_slots[1]
+        side = floor(slot.height*(1/2))
+        prev_rect = pygame.Rect(0, 0, side, side)
+        prev_rect.center = slot.left + floor(slot.width*(2/10)), slot.centery
+        next_rect = prev_rect.copy()
+        next_rect.centerx = slot.left + floor(slot.width*(8/10))
+        text_rect = pygame.Rect(prev_rect.right, slot.top, next_rect.left - prev_rect.right, slot.height)
+        # triangles pointing left and right
+        prev_arrow = [prev_rect.midleft, prev_rect.topright, prev_rect.bottomright]
+        next_arrow = [next_rect.midright, next_rect.topleft, next_rect.bottomleft]
+        return prev_rect, next_rect, text_rect, prev_arrow, next_arrow
+
+
+class HitIndex:
+    """Finds the widget under a point without checking every widget. Widgets go into a spatial
+    hash of HIT_CELL_SIZE cells, so a lookup only checks the few widgets in the point's cell.
+    A uniform grid of cells (like the tiles) is a single widget, its cell is found with arithmetic.
+    When widgets overlap, the one added first wins"""
+
+    def __init__(self, area: pygame.Rect, cell_size=HIT_CELL_SIZE):
+        self.area = area
+        self.cell_size = cell_size
+        # (column, row) of a hash cell -> [(rect, name, index, (columns, rows) or None)]
+        self.cells = {}
+
+    def _insert(self, rect, entry):
+        rect = self.area.clip(rect)
+        if not rect.width or not rect.height:
+            return
+        for column in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1):
+            for row in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1):
+                self.cells.setdefault((column, row), []).append(entry)
+
+    def add(self, name, rect, index=None):
+        """Adds a widget. find() returns (name, index) for points inside rect"""
+        self._insert(rect, (pygame.Rect(rect), name, index, None))
+
+    def add_grid(self, name, rect, columns, rows):
+        """Adds a grid of equally sized cells. find() returns (name, row * columns + column)"""
+        self._insert(rect, (pygame.Rect(rect), name, None, (columns, rows)))
+
+    def find(self, pos):
+        """Returns (name, index) of the widget at pos, or (None, None)"""
+        x, y = pos
+        for rect, name, index, grid in self.cells.get((x // self.cell_size, y // self.cell_size), ()):
+            if rect.collidepoint(pos):
+                if grid is not None:
+                    columns, rows = grid
+                    index = (y - rect.top) * rows // rect.height * columns + (x - rect.left) * columns // rect.width
+                return name, index
+        return None, None
+
+
+class AIWorker:
+    """Runs AI moves and hints on a background thread so the event loop never waits for them.
+    Results come back to the event loop as AI_RESULT events"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+        # results of jobs submitted before the last cancel() are thrown away
+        self.generation = 0
+        # players that can stop a search early, like MCTSPlayer. Players are made by the jobs, so
+        # this is added to on the worker thread
+        self.cancellable = []
+        # when True, jobs are dropped. Replays do this since the results come from the recording
+        self.paused = False
+
+    def submit(self, kind, function, *args):
+        """Calls function(*args) on the worker thread and posts its result as an AI_RESULT event
+        with the given kind"""
+        if self.paused:
+            return
+        generation = self.generation
+
+        def job():
+            if generation != self.generation:
+                return  # cancelled before it even started
+            result = function(*args)
+            pygame.event.post(pygame.event.Event(AI_RESULT, kind=kind, result=result, generation=generation))
+
+        self.executor.submit(job)
+
+    def is_current(self, event):
+        return event.generation == self.generation
+
+    def cancel(self):
+        """Drops every pending result and stops running searches"""
+        self.generation += 1
+        for player in self.cancellable:
+            player.cancel()
+
+    def shutdown(self):
+        """Cancels everything and waits for the running job, which ends quickly once its search is
+        cancelled. Afterwards the players can be closed without a job still using them"""
+        self.cancel()
+        self.executor.shutdown(cancel_futures=True)
+
+
+class NetworkClient:
+    """Connection to a ttt_server for playing against someone on another machine. Like AIWorker,
+    a background thread does the waiting and posts every line from the server as a NET_MESSAGE
+    event with the line split into words"""
+
+    def __init__(self, host, port):
+        self.socket = socket.create_connection((host, port), CONNECT_TIMEOUT)
+        # the reader thread blocks until the server sends something, however long that takes
+        self.socket.settimeout(None)
+        # moves are tiny messages that shouldn't wait to be batched
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # 'x' or 'o' while a game is going on
+        self.side = None
+        # True from sending JOIN until the server starts the game or turns it down
+        self.joining = False
+        self.thread = threading.Thread(target=self.read, name="network", daemon=True)
+        self.thread.start()
+
+    def read(self):
+        try:
+            for line in self.socket.makefile("rb"):
+                pygame.event.post(pygame.event.Event(NET_MESSAGE, words=line.decode().split()))
+        except OSError:
+            pass
+        pygame.event.post(pygame.event.Event(NET_MESSAGE, words=["CLOSED"]))
+
+    def join(self, size, k):
+        self.joining = True
+        self.send(f"JOIN {size} {k}")
+
+    def send(self, line):
+        try:
+            self.socket.sendall(f"{line}\n".encode())
+        except OSError:
+            pass  # the reader thread posts CLOSED
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
 
 class TTTFunc:
     """Handles the actual functionality of the game"""
     
-    def __init__(self, visual: TTTVisual):
+    def __init__(self, visual: TTTVisual, rules: TTTGame = None, network: NetworkClient = None):
         # class that controls game ui
         self.visual = visual
-        # game variables
-        self.turn = None
-        self.turn_count = 1
-        self.grid = [None for _ in range(9)]
-        self.game_history = []
+        # headless rules of the game, this class only observes it and forwards changes to the ui
+        self.rules = rules if rules is not None else TTTGame()
+        self.rules.add_observer(self)
+        # when playing over the network, the server is in charge and the rules just follow it
+        self.network = network
+        # ultimate tic-tac-toe has its own AI, highlights and stats
+        state = self.rules.state
+        self.ultimate = state.ultimate
+        # counts for the stats screen, kept up to date as games are recorded so opening it doesn't
+        # count anything. They start from the counts saved with the history log
+        self.stats = GameStats.for_history(self.rules.game_history, state.size, state.k, self.stats_file(),
+                                           self.ultimate)
+        self.rules.add_observer(self.stats)
+        # computer opponents and hints, made when they're first used, see ai_player() and
+        # get_solver(). Only the 3x3 game has the perfect player
+        # AI moves and hints are computed in the background
+        self.worker = AIWorker()
+        self.ai_players = {}
+        self.solver = None
+        if self.ultimate:
+            # MCTS playouts don't know about the forced boards, the ultimate search does
+            levels = ("easy", "hard")
+        else:
+            levels = ("easy", "mcts", "perfect") if state.small else ("easy", "mcts")
+        self.ai_levels = tuple(level for level in AI_LEVELS if level is None or level in levels)
+        self.ai_level = None
+        # tiles that currently show a hint
+        self.hint_tiles = ()
         self.on_screen_game_history = None
-        self.game_ongoing = False
+        # game shown on the past game screen and how many of its moves are shown
+        self.replay_record = None
+        self.replay_step = 0
         # variable to track what screen I am in
         self.cur_screen = START_SCREEN
         # index to scroll through game history
         self.game_history_index = -1
+        # (win info, turn) of the last game_ended() call, None while a game is going on
+        self.game_over_info = None
+        # size from the last VIDEORESIZE event that hasn't been applied yet
+        self.window_size = None
+        # Profiler, only when --profile is given or the overlay has been turned on
+        self.profiler = None
+        # runs the event loop and the timers of the game
+        self.scheduler = Scheduler()
+        # timer that blinks the computer's turn tile while it's thinking, and if the tile is lit
+        self.thinking_timer = None
+        self.thinking_lit = True
+
+        # every screen is drawn as a stack of layers, bottom first. Going back to a screen draws its
+        # layers again from the game's state instead of keeping a copy of the window around
+        # layers whose state changed while another screen was on top of them
+        self.dirty_layers = set()
+        self.layer_drawers = {
+            "start": self.visual.draw_start_screen,
+            "game": self.redraw_game_screen,
+            "options": self.visual.draw_additional_options_screen,
+            "history": self.draw_game_history_layer,
+            "past game": self.draw_past_game_layer,
+            "stats": self.draw_stats_layer,
+        }
+        self.screen_layers = {
+            START_SCREEN: ("start",),
+            GAME_SCREEN: ("game",),
+            ADDITIONAL_OPTIONS_SCREEN: ("game", "options"),
+            GAME_HISTORY_SCREEN: ("game", "options", "history"),
+            PAST_GAME_SCREEN: ("past game",),
+            STATS_SCREEN: ("game", "options", "stats"),
+        }
 
         self.mouse_click_handlers = {
             START_SCREEN: self.start_screen_clicked,
@@ -503,207 +1273,919 @@ class TTTFunc:
             ADDITIONAL_OPTIONS_SCREEN: self.additional_options_screen_clicked,
             GAME_HISTORY_SCREEN: self.game_history_screen_clicked,
             PAST_GAME_SCREEN: self.past_game_screen_clicked,
+            STATS_SCREEN: self.stats_screen_clicked,
         }
 
+    def close(self):
+        """Stops the AI worker, closes the AI players that hold on to something, like the MCTS
+        process pool or the mmap'ed solution table, and saves the stats"""
+        self.worker.shutdown()
+        for player in self.ai_players.values():
+            if hasattr(player, "close"):
+                player.close()
+        if hasattr(self.solver, "close"):
+            self.solver.close()
+        if self.stats_file() is not None:
+            self.stats.save(self.stats_file(), self.rules.game_history)
+
+    def ai_player(self, level):
+        """Returns the player of an AI level, made the first time it's asked for. Only called on the
+        worker thread, see level_move()"""
+        if level not in self.ai_players:
+            if level == "perfect":
+                from ttt_table import TablePlayer
+                solver = self.get_solver()
+                # a MinimaxPlayer plays by itself, the table needs a player that reads it
+                player = solver if callable(solver) else TablePlayer(solver)
+            elif self.ultimate:
+                from ttt_ultimate import UltimatePlayer, ultimate_random_policy
+                player = ultimate_random_policy if level == "easy" else UltimatePlayer()
+            elif level == "easy":
+                player = random_policy
+            else:
+                from ttt_ai import MCTSPlayer
+                player = MCTSPlayer(time_budget=MCTS_TIME_BUDGET, workers=None)
+            if hasattr(player, "cancel"):
+                self.worker.cancellable.append(player)
+            self.ai_players[level] = player
+        return self.ai_players[level]
+
+    def get_solver(self):
+        """Perfect player of the 3x3 game for hints. The mmap'ed solution table is used when it can
+        be opened (it's built first when it's missing), otherwise a minimax search gives the same
+        moves. Only called on the worker thread"""
+        if self.solver is None:
+            from ttt_table import SolutionTable
+            try:
+                self.solver = SolutionTable()
+            except (OSError, ValueError):
+                from ttt_ai import MinimaxPlayer
+                self.solver = MinimaxPlayer()
+                self.solver.warm_up()
+        return self.solver
+
+    def stats_file(self):
+        """Where the stats of a history log are kept between runs, None when the history is only in memory"""
+        path = getattr(self.rules.game_history, "path", None)
+        return stats_path(path) if path is not None else None
+
     def start_game(self):
         """Starts the game"""
-        # randomly decides who goes first
-        self.turn = choice('xo')
-        # a game is now ongoing
-        self.game_ongoing = True
+        self.worker.cancel()
+        if self.network is not None:
+            # the server picks the sides and who goes first, the game starts with its START message.
+            # Asking again while waiting for an opponent would only get an error back
+            if not self.rules.game_ongoing and not self.network.joining:
+                self.network.join(self.rules.state.size, self.rules.state.k)
+                if self.game_layer_on_top():
+                    self.visual.draw_game_screen(None, None)
+            return
+        self.rules.start()
+        self.play_ai_move()
+
+    def is_ai_turn(self):
+        return (self.network is None and self.ai_level is not None and self.rules.game_ongoing
+                and self.rules.turn == AI_TURN)
+
+    def is_remote_turn(self):
+        return self.network is not None and self.rules.turn != self.network.side
+
+    def play_ai_move(self):
+        """If AI mode is on and it's the computer's turn, asks the worker for a move"""
+        if self.is_ai_turn():
+            # the worker gets its own copy of the state and its own rng so nothing is shared between threads
+            rng = random.Random(self.rules.rng.getrandbits(64))
+            self.worker.submit("move", self.level_move, self.ai_level, self.rules.state.copy(), AI_TURN, rng)
+            self.start_thinking()
+
+    def start_thinking(self):
+        """Blinks the computer's turn tile until its move comes in"""
+        self.stop_thinking()
+        self.thinking_lit = True
+        self.thinking_timer = self.scheduler.call_every(THINKING_BLINK_INTERVAL, self.blink_thinking)
+
+    def stop_thinking(self):
+        if self.thinking_timer is not None:
+            self.scheduler.cancel(self.thinking_timer)
+            self.thinking_timer = None
+
+    def blink_thinking(self):
+        # the move was thrown away (new game, AI mode turned off, ...) or it has been played
+        if not self.is_ai_turn():
+            self.stop_thinking()
+            if not self.thinking_lit and self.cur_screen == GAME_SCREEN:
+                self.visual.update_turn_tiles(self.rules.turn if self.rules.game_ongoing else None)
+            return
+        self.thinking_lit = not self.thinking_lit
+        # the turn tiles of another screen's game layer are drawn lit when it's shown again
+        if self.cur_screen == GAME_SCREEN:
+            self.visual.update_turn_tiles(AI_TURN if self.thinking_lit else None)
+
+    def show_hint(self):
+        """Asks the worker for the best moves for whoever's turn it is"""
+        if self.rules.state.small and self.cur_screen == GAME_SCREEN and self.rules.game_ongoing:
+            self.worker.submit("hint", self.best_moves, self.rules.state.copy(), self.rules.turn)
+
+    def level_move(self, level, state, turn, rng):
+        """Worker job of play_ai_move(). The player is looked up here rather than on the event
+        thread, since making it can mean importing the AI or building the solution table"""
+        return self.ai_player(level)(state, turn, rng)
+
+    def best_moves(self, state, turn):
+        """Worker job of show_hint(), opens the solver on the worker thread like level_move()"""
+        return self.get_solver().best_moves(state, turn)
+
+    def ai_result(self, event):
+        """Handles an AI_RESULT event from the worker"""
+        if not self.worker.is_current(event) or self.cur_screen != GAME_SCREEN or not self.rules.game_ongoing:
+            return
+        if event.kind == "move":
+            self.stop_thinking()
+            if self.is_ai_turn() and self.rules.is_legal(event.result):
+                self.rules.play(event.result)
+        elif event.kind == "hint":
+            self.hint_tiles = event.result
+            self.visual.draw_hint(self.hint_tiles, self.rules.turn)
+
+    def network_message(self, event):
+        """Handles a NET_MESSAGE event, see ttt_server for what the messages are"""
+        command, args = event.words[0], event.words[1:]
+        if command in ("START", "ERROR", "CLOSED"):
+            self.network.joining = False
+        if command == "START":
+            self.network.side, first = args
+            self.rules.start(first)
+            self.visual.set_status(f"you are {self.network.side}")
+        elif command == "MOVED":
+            # both sides' moves come from the server, our own ones too once it accepted them
+            self.rules.play(int(args[0]))
+        elif command == "OVER" and args[0] == "left" and self.rules.game_ongoing:
+            self.rules.abandon()
+            if self.game_layer_on_top():
+                self.visual.update_turn_tiles(None)
+            self.visual.set_status("your opponent left, press space for a new game")
+        elif command == "WAIT":
+            self.visual.set_status("waiting for an opponent")
+        elif command == "ERROR":
+            self.visual.set_status(f"server says: {' '.join(args)}")
+        elif command == "CLOSED":
+            self.visual.set_status("disconnected from the server")
+
+    @property
+    def game_history(self):
+        return self.rules.game_history
+
+    def playable_boards(self):
+        """Boards to highlight in ultimate tic-tac-toe"""
+        return self.rules.state.playable_boards() if self.ultimate and self.rules.game_ongoing else ()
+
+    def game_layer_on_top(self):
+        """True when the game screen is showing, so changes to the game can be drawn right away.
+        Otherwise (a network move or a new game while another screen is open) the game layer is
+        marked dirty and drawn again from the game's state by redraw_dirty_layers()"""
+        if self.cur_screen == GAME_SCREEN:
+            return True
+        self.dirty_layers.add("game")
+        return False
+
+    # Observer callbacks of TTTGame. They only draw when the game screen is showing
+    def game_started(self, turn, turn_count):
+        self.hint_tiles = ()
+        self.game_over_info = None
+        if not self.game_layer_on_top():
+            return
         # show game screen on display
-        self.visual.draw_game_screen(self.turn, self.turn_count)
+        self.visual.draw_game_screen(turn, turn_count)
+        if self.ultimate:
+            self.visual.draw_grid((self.rules.state.to_grid(), None, turn_count), self.playable_boards())
+
+    def tile_played(self, index, turn):
+        # hints being computed are for the old grid
+        self.worker.cancel()
+        hint_tiles, self.hint_tiles = self.hint_tiles, ()
+        if not self.game_layer_on_top():
+            return
+        if hint_tiles:
+            self.visual.clear_hint(hint_tiles)
+        if self.ultimate:
+            # a move can win a board and changes which boards are highlighted
+            self.visual.draw_grid((self.rules.state.to_grid(), None, self.rules.turn_count), self.playable_boards())
+        else:
+            self.visual.update_tile(index, turn)  # draw it on display
+
+    def turn_changed(self, turn, turn_count):
+        if self.game_layer_on_top():
+            self.visual.update_turn_count(turn_count)
+            self.visual.update_turn_tiles(turn)  # toggles transparency of two turn tiles
+
+    def game_ended(self, win_info, turn):
+        """Called when a player wins. Draws the line to cross over the winning tiles"""
+        self.game_over_info = win_info, turn
+        if self.game_layer_on_top():
+            self.draw_game_over(win_info, turn)
+
+    def draw_game_over(self, win_info, turn):
+        """Draws the line over the winning tiles and the game over turn widgets"""
+        if self.ultimate:
+            # without the highlights, the grid is already reset but the game is the last record
+            self.visual.draw_grid(self.game_history[-1])
+        self.visual.draw_line(win_info, turn)
+        # update turn count text
+        if win_info == "tie":
+            self.visual.update_turn_count(None, tie=True)
+        else:
+            self.visual.update_turn_count(None, game_over=True)
+        self.visual.update_turn_tiles(None)
+
+    def toggle_profiler_overlay(self):
+        """Shows or hides the profiler overlay, starting the profiler the first time"""
+        if self.profiler is None:
+            self.profiler = Profiler()
+            self.profiler.install(self)
+        self.profiler.overlay = not self.profiler.overlay
+        # draws the overlay, or over what it covered
+        self.redraw()
+
+    def window_resized(self, size):
+        """Called for VIDEORESIZE events. A live resize sends lots of them, so the size is only
+        remembered here and apply_window_size() switches to the last one once per frame"""
+        self.window_size = size
+
+    def apply_window_size(self):
+        if self.window_size is None:
+            return
+        size = max(self.window_size[0], MIN_WIN_SIZE[0]), max(self.window_size[1], MIN_WIN_SIZE[1])
+        self.window_size = None
+        win = pygame.display.get_surface()
+        if win.get_size() != size:
+            win = pygame.display.set_mode(size, RESIZABLE)
+        if win.get_size() != self.visual.win_rect.size:
+            self.visual.resize(win)
+            self.redraw()
+
+    def show_screen(self, screen):
+        """Switches to screen and draws all of its layers"""
+        self.cur_screen = screen
+        self.redraw()
+
+    def redraw(self):
+        """Draws the current screen from scratch, layer by layer"""
+        layers = self.screen_layers[self.cur_screen]
+        self.dirty_layers.difference_update(layers)
+        for layer in layers:
+            self.layer_drawers[layer]()
+
+    def redraw_dirty_layers(self):
+        """Draws the current screen again if one of its layers changed while it was covered, like
+        the game under the options screen. Layers of other screens stay dirty until they're shown,
+        show_screen() draws every layer anyway. Called once per frame"""
+        if self.dirty_layers.intersection(self.screen_layers[self.cur_screen]):
+            self.redraw()
+
+    def draw_game_history_layer(self):
+        self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
+
+    def draw_stats_layer(self):
+        self.visual.draw_stats_screen(self.stats)
+
+    def draw_past_game_layer(self):
+        self.visual.draw_past_game_screen(self.replay_record)
+        if self.replay_step != self.replay_record.turn_count:
+            self.visual.draw_replay_step(self.replay_record, self.replay_step)
+
+    def redraw_game_screen(self):
+        """Draws the game screen as it is for the game being played, or the one that just ended"""
+        if self.rules.game_ongoing:
+            self.visual.draw_game_screen(self.rules.turn, self.rules.turn_count)
+            self.visual.draw_grid((self.rules.state.to_grid(), None, self.rules.turn_count), self.playable_boards())
+            if self.hint_tiles:
+                self.visual.draw_hint(self.hint_tiles, self.rules.turn)
+        elif self.game_over_info is not None:
+            # the rules reset the grid when a game ends, but it's the last record of the history
+            record = self.game_history[-1]
+            self.visual.draw_game_screen(None, record.turn_count)
+            self.visual.draw_grid(record)
+            self.draw_game_over(*self.game_over_info)
+        else:
+            self.visual.draw_game_screen(None, None)
 
     def mouse_clicked(self, pos):
-        """When the mouse is clicked, this function uses current screen to search for the correct
-        checks to do for that screen"""
-        self.mouse_click_handlers[self.cur_screen](pos)
+        """When the mouse is clicked, this function finds the widget that was clicked on the current
+        screen and passes it to the handler of that screen"""
+        widget, index = self.visual.hit_indexes[self.cur_screen].find(pos)
+        self.mouse_click_handlers[self.cur_screen](widget, index)
 
-    def start_screen_clicked(self, pos):
+    def start_screen_clicked(self, widget, index):
         """Handles mouse click on the start screen"""
-        if self.visual.play_button_rect.collidepoint(pos):
-            self.start_game()
+        if widget == "play":
             self.cur_screen = GAME_SCREEN
-    
-    def game_screen_clicked(self, pos):
+            self.start_game()
+
+    def game_screen_clicked(self, widget, index):
         """Handles mouse click on the game screen"""
-        # if there is a game ongoing, check if a tile was clicked
-        if self.game_ongoing:
-            if index := self.is_tile_clicked(pos):
-                index = int(index) 
-                self.grid[index] = self.turn  # update grid
-                self.visual.update_tile(index, self.turn)  # draw it on display
-                # check for game over, if game not over, increment turn count
-                if win_info := self.check_if_game_over():
-                    self.game_over(win_info)
-                    return
-                self.turn_count += 1
-                self.visual.update_turn_count(self.turn_count)
-                # switch turns
-                self.turn = "x" if self.turn != "x" else "o"  # toggle turn X -> O or O -> X
-                self.visual.update_turn_tiles(self.turn)  # toggles transparency of two turn tiles
-                return
+        # if there is a game ongoing, check if an empty tile was clicked
+        # tiles can't be clicked while the computer is thinking
+        if widget == "tile":
+            if (self.rules.game_ongoing and not self.is_ai_turn() and not self.is_remote_turn()
+                    and self.rules.is_legal(index)):
+                if self.network is not None:
+                    self.network.send(f"MOVE {index}")
+                else:
+                    self.rules.play(index)
+                    self.play_ai_move()
 
         # check if the three dots 'more' button was clicked
-        if self.visual.more_button_rect.collidepoint(pos):
+        elif widget == "more":
+            # the computer's move is asked for again when coming back to the game screen
+            self.worker.cancel()
             self.visual.draw_additional_options_screen()
             self.cur_screen = ADDITIONAL_OPTIONS_SCREEN
 
-    def additional_options_screen_clicked(self, pos):
+    def additional_options_screen_clicked(self, widget, index):
         """Handles mouse click on the additional options screen"""
         # Check if user even clicked on the menu, if not, go back to previous screen
-        if self.visual.layouts.additional_options_container.collidepoint(pos):
-            if self.visual.layouts.additional_options[0][1].collidepoint(pos):
+        if widget == "option":
+            if index == 0:
                 self.game_history_index = -1
                 self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
                 self.cur_screen = GAME_HISTORY_SCREEN
-            elif self.visual.layouts.additional_options[1][1].collidepoint(pos):
-                pass  # TODO: ACTUALLY DO SOMETHING HERE
-            elif self.visual.layouts.additional_options[2][1].collidepoint(pos):
-                pass  # TODO: ACTUALLY DO SOMETHING HERE
-        else:
-            self.visual.go_back_to_prev_screen(GAME_SCREEN)
-            self.cur_screen = GAME_SCREEN
-
-    def game_history_screen_clicked(self, pos):
+            elif index == 1:
+                # cycles through the computer opponent difficulties
+                self.ai_level = self.ai_levels[(self.ai_levels.index(self.ai_level) + 1) % len(self.ai_levels)]
+                self.visual.update_additional_option(1, self.visual.texts[f"ai{self.ai_level or 'off'}"])
+            elif index == 2:
+                self.visual.draw_stats_screen(self.stats)
+                self.cur_screen = STATS_SCREEN
+        elif widget is None:
+            self.show_screen(GAME_SCREEN)
+            # AI mode might have been turned on while it was the computer's turn
+            self.play_ai_move()
+
+    def game_history_screen_clicked(self, widget, index):
         """Handles mouse click on the game history screen"""
-        # first check if click was even inside container
-        if self.visual.layouts.game_history_container.collidepoint(pos):
-            # first check if either of the arrows were clicked
-            if self.visual.layouts.game_history_down_arrow_rect.collidepoint(pos):
-                self.game_history_index -= 1
-                self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
-            elif self.visual.layouts.game_history_up_arrow_rect.collidepoint(pos):
-                if self.game_history_index < -1:
-                    self.game_history_index += 1
-                self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
-            else:
-                # go through all slots and see which one it was and get its index
-                for i in range(len(self.visual.layouts.game_history_slots)):
-                    # index will correspond to the correct entry in the list
-                    if self.visual.layouts.game_history_slots[i].collidepoint(pos):
-                        try:
-                            game_data = self.on_screen_game_history[i]
-                        except IndexError:
-                            break
-                        self.visual.draw_past_game_screen(game_data)
-                        self.cur_screen = PAST_GAME_SCREEN
-        else:
-            self.visual.go_back_to_prev_screen(ADDITIONAL_OPTIONS_SCREEN)
-            self.cur_screen = ADDITIONAL_OPTIONS_SCREEN
-
-    def past_game_screen_clicked(self, pos):
+        # the arrows are checked before the slots they are on top of
+        if widget == "down":
+            self.game_history_index -= 1
+            self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
+        elif widget == "up":
+            if self.game_history_index < -1:
+                self.game_history_index += 1
+            self.on_screen_game_history = self.visual.draw_game_history_screen(self.game_history, self.game_history_index)
+        elif widget == "slot":
+            # index will correspond to the correct entry in the list
+            if index < len(self.on_screen_game_history):
+                game_data = self.on_screen_game_history[index]
+                self.replay_record, self.replay_step = game_data, game_data.turn_count
+                self.visual.draw_past_game_screen(game_data)
+                self.cur_screen = PAST_GAME_SCREEN
+        # clicks outside of the container go back
+        elif widget is None:
+            self.show_screen(ADDITIONAL_OPTIONS_SCREEN)
+
+    def stats_screen_clicked(self, widget, index):
+        """Handles mouse click on the stats screen, clicks outside of it go back"""
+        if widget is None:
+            self.show_screen(ADDITIONAL_OPTIONS_SCREEN)
+
+    def past_game_screen_clicked(self, widget, index):
         """Handles mouse click when there is a past game on the screen"""
-        # One check getting a whole function might be a bit overkill, but whatever
         # this is the back button to go back to the game history screen
-        if self.visual.layouts.past_game_slots[0].collidepoint(pos):
-            self.visual.go_back_to_prev_screen(GAME_HISTORY_SCREEN)
-            self.cur_screen = GAME_HISTORY_SCREEN
-
-    def is_tile_clicked(self, pos):
-        """Uses current mouse position and checks if a tile was clicked. Returns index of tile if
-        tile was clicked"""
-        for i in range(9):
-            tile = self.visual.layouts.grid_tile_rects[i][0]
-            if tile.collidepoint(pos):
-                if self.grid[i] is not None:
-                    return False
-                # made into string so tile 0 (top left corner) doesn't evaluate to false in game.mouse_clicked()
-                return str(i)  
-        return False
+        if widget == "back":
+            self.show_screen(GAME_HISTORY_SCREEN)
+        # step backwards or forwards through the moves of the game
+        elif widget == "prev":
+            if self.replay_step > 0:
+                self.replay_step -= 1
+                self.visual.draw_replay_step(self.replay_record, self.replay_step)
+        elif widget == "next":
+            if self.replay_step < self.replay_record.turn_count:
+                self.replay_step += 1
+                self.visual.draw_replay_step(self.replay_record, self.replay_step)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Tic-tac-toe made with pygame")
+    parser.add_argument("--size", type=int, default=3, help="number of tiles on each side of the grid")
+    parser.add_argument("--k", type=int, default=3, help="how many in a row it takes to win")
+    parser.add_argument("--ultimate", action="store_true",
+                        help="ultimate tic-tac-toe, a 3x3 grid of 3x3 boards (--size and --k are ignored)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each phase of startup took")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="time clicks, draws and frames and write the results to PATH on exit (F3 shows them live)")
+    parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                        help="summary with latency histograms, or a trace for chrome://tracing or Perfetto")
+    parser.add_argument("--connect", metavar="HOST[:PORT]",
+                        help="play against someone else through a ttt_server.py (on its default port without PORT)")
+    parser.add_argument("--seed", type=int, help="seed of the game's random choices, random by default")
+    parser.add_argument("--record", metavar="PATH", help="save every input event to PATH so it can be replayed")
+    parser.add_argument("--replay", metavar="PATH", help="replay a file made with --record instead of playing")
+    parser.add_argument("--replay-speed", choices=("max", "realtime"), default="max",
+                        help="replay as fast as possible (and report moves/s) or with the recorded timing")
+    parser.add_argument("--no-render", action="store_true", help="replay without showing a window")
+    parser.add_argument("--history", metavar="PATH",
+                        help="game history log to use, by default there is one per board size in history/")
+    return parser
+
+
+def parse_args(argv=None, parser=None):
+    parser = parser if parser is not None else create_parser()
+    args = parser.parse_args(argv)
+    if args.connect:
+        host, _, port = args.connect.partition(":")
+        if not host or port and not (port.isdigit() and 0 < int(port) < 65536):
+            parser.error(f"--connect takes HOST or HOST:PORT with a port number, not {args.connect}")
+        # the port is None for the server's default port
+        args.connect = host, int(port) if port else None
+    if args.ultimate:
+        if args.connect:
+            parser.error("--ultimate can't be played with --connect, the server only knows the normal game")
+        from ttt_ultimate import DEFAULT_HISTORY_PATH, UltimateState
+        args.size, args.k = UltimateState.size, UltimateState.k
+        if args.history is None:
+            args.history = DEFAULT_HISTORY_PATH
+    if not 1 <= args.k <= args.size:
+        parser.error("--k has to be between 1 and --size")
+    return args
+
+
+class StartupProfiler:
+    """Times the phases of startup for --profile-startup. Each mark() ends the phase that started
+    at the previous mark (or at STARTUP_TIME for the first one)"""
+
+    def __init__(self, start=STARTUP_TIME):
+        self.start = self.last = start
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = ["startup profile:"]
+        lines += [f"  {phase:<22}{seconds * 1000:>8.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"  {'time to first frame':<22}{(self.last - self.start) * 1000:>8.1f} ms")
+        return "\n".join(lines)
+
+
+class Histogram:
+    """Latency histogram with power of two buckets in microseconds. Bucket i counts durations
+    of less than 2^i us (and at least 2^(i-1) us)"""
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.buckets[min(HISTOGRAM_BUCKETS - 1, (ns // 1000).bit_length())] += 1
+        self.count += 1
+        self.total += ns
+        self.max = max(self.max, ns)
+
+    def percentile(self, p):
+        """Upper bound in ms of the bucket holding the p-th percentile"""
+        rank = self.count * p / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** i / 1000, self.max / 1e6)
+        return 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1e6 if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max / 1e6,
+            "total_ms": self.total / 1e6,
+            # upper bound of the bucket in us -> count, without the empty buckets
+            "histogram_us": {2 ** i: count for i, count in enumerate(self.buckets) if count},
+        }
+
+
+class CountingSurface:
+    """Stands in for the window while the Profiler is installed. Calls of blit(), blits() and
+    fill() are counted, everything else goes to the window. The methods of a pygame.Surface are
+    read-only, so they can't be wrapped on the window itself"""
+
+    def __init__(self, surface, profiler):
+        self.surface = surface
+        self.profiler = profiler
+
+    def blit(self, *args, **kwargs):
+        self.profiler.frame_blits += 1
+        return self.surface.blit(*args, **kwargs)
+
+    def blits(self, *args, **kwargs):
+        self.profiler.frame_blits += 1
+        return self.surface.blits(*args, **kwargs)
+
+    def fill(self, *args, **kwargs):
+        self.profiler.frame_blits += 1
+        return self.surface.fill(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.surface, name)
+
+
+class Profiler:
+    """Opt-in instrumentation of the click to screen update path. Times TTTFunc.mouse_clicked and
+    every click handler and layer, every TTTVisual draw method and every display present, and
+    counts the blits and fills on the window per frame. Results can be shown live in an overlay
+    (F3) and saved as JSON histograms or as a Chrome trace"""
+    DRAW_PREFIXES = ("draw_", "update_", "clear_")
+
+    def __init__(self):
+        # name -> Histogram, and frame times
+        self.histograms = {}
+        self.frames = Histogram()
+        self.total_blits = self.max_blits = 0
+        # (name, start ns, duration ns, depth) of the last TRACE_LIMIT timed calls and frames
+        self.trace = deque(maxlen=TRACE_LIMIT)
+        self.depth = 0
+        self.frame_start = None
+        self.frame_blits = 0
+        self.last_frame = None  # (ms, blits) of the last frame, for the overlay
+        self.overlay = False
+        self.visual = None
+
+    def wrap(self, name, function):
+        """Returns function, timed under name"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            self.depth += 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.depth -= 1
+                self.record(name, start, time.perf_counter_ns() - start)
+        return timed
+
+    def record(self, name, start, ns):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(ns)
+        self.trace.append((name, start, ns, self.depth))
+
+    def install(self, game):
+        """Wraps the methods of a TTTFunc and its TTTVisual. Only the instances are changed"""
+        visual = self.visual = game.visual
+        for name in dir(visual):
+            if name.startswith(self.DRAW_PREFIXES) and callable(getattr(visual, name)):
+                setattr(visual, name, self.wrap(name, getattr(visual, name)))
+        visual.compositor.present = self.wrap("present", visual.compositor.present)
+        self.count_blits()
+        game.mouse_clicked = self.wrap("mouse_clicked", game.mouse_clicked)
+        for screen, handler in game.mouse_click_handlers.items():
+            game.mouse_click_handlers[screen] = self.wrap(f"click {screen}", handler)
+        # these hold the methods from before they were wrapped
+        for layer, drawer in game.layer_drawers.items():
+            game.layer_drawers[layer] = self.wrap(f"layer {layer}", drawer)
+        game.profiler = self
+
+    def count_blits(self):
+        """Puts a CountingSurface in front of the window. A resize gives the visual a new window,
+        so this is checked every frame"""
+        if not isinstance(self.visual.win, CountingSurface):
+            self.visual.win = CountingSurface(self.visual.win, self)
+
+    def begin_frame(self):
+        self.count_blits()
+        self.frame_blits = 0
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        """Presents the frame and records it, if anything was drawn"""
+        compositor = self.visual.compositor
+        drawn = bool(compositor.full or compositor.dirty)
+        if drawn and self.overlay:
+            self.draw_overlay()
+        compositor.present()
+        # frames where the profiler was only started halfway through aren't recorded
+        if drawn and self.frame_start is not None:
+            ns = time.perf_counter_ns() - self.frame_start
+            self.frames.add(ns)
+            self.total_blits += self.frame_blits
+            self.max_blits = max(self.max_blits, self.frame_blits)
+            self.trace.append(("frame", self.frame_start, ns, 0))
+            self.last_frame = ns / 1e6, self.frame_blits
+        self.frame_start = None
+
+    def overlay_lines(self):
+        lines = []
+        if self.last_frame is not None:
+            ms, blits = self.last_frame
+            lines.append(f"frame {ms:.2f} ms  {blits} blits  p50 {self.frames.percentile(50):.2f}  "
+                         f"p99 {self.frames.percentile(99):.2f} ms")
+        # where the time went, most first
+        busiest = sorted(self.histograms.items(), key=lambda item: item[1].total, reverse=True)[:8]
+        for name, histogram in busiest:
+            lines.append(f"{name}: {histogram.count}x  mean {histogram.total / histogram.count / 1e6:.3f}  "
+                         f"p99 {histogram.percentile(99):.3f} ms")
+        return lines
+
+    def draw_overlay(self):
+        """Draws the stats in the top left corner. Its blits aren't counted"""
+        font = self.visual.texts["minorfont"]
+        surfaces = [font.render(line, True, WHITE) for line in self.overlay_lines()]
+        if not surfaces:
+            return
+        rect = pygame.Rect(0, 0, max(surface.get_width() for surface in surfaces) + 10,
+                           sum(surface.get_height() for surface in surfaces) + 10)
+        win = self.visual.surface
+        win.fill(BLACK, rect)
+        y = 5
+        for surface in surfaces:
+            win.blit(surface, (5, y))
+            y += surface.get_height()
+        self.visual.compositor.add(rect)
+
+    def summary(self):
+        return {
+            "frames": self.frames.summary(),
+            "blits_per_frame": {"mean": self.total_blits / self.frames.count if self.frames.count else 0.0,
+                                "max": self.max_blits},
+            "calls": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+        }
+
+    def chrome_trace(self):
+        """The timed calls as complete ("X") events of the Trace Event Format, in microseconds"""
+        return {"traceEvents": [
+            {"name": name, "ph": "X", "ts": start / 1000, "dur": ns / 1000, "pid": 1, "tid": 1,
+             "cat": "frame" if name == "frame" else "call"}
+            for name, start, ns, _ in self.trace], "displayTimeUnit": "ms"}
+
+    def save(self, path, trace_format="json"):
+        with open(path, "w") as f:
+            if trace_format == "chrome":
+                json.dump(self.chrome_trace(), f)
+            else:
+                json.dump(self.summary(), f, indent=2)
+
+
+def event_to_entry(event, game):
+    """Returns the JSON object an event is recorded as, or None for events that aren't recorded"""
+    if event.type == MOUSEBUTTONUP:
+        return {"type": "click", "pos": list(event.pos), "button": event.button}
+    elif event.type == KEYUP:
+        return {"type": "key", "key": event.key}
+    elif event.type == VIDEORESIZE:
+        return {"type": "resize", "size": list(event.size)}
+    # AI moves and hints are recorded too, since when they arrive changes what clicks do.
+    # Stale ones are thrown away by the game anyway
+    elif event.type == AI_RESULT and game.worker.is_current(event):
+        result = list(event.result) if event.kind == "hint" else event.result
+        return {"type": "ai", "kind": event.kind, "result": result}
+    return None
+
+
+def entry_to_event(entry, game):
+    """Turns a recorded JSON object back into the event it was made from"""
+    if entry["type"] == "click":
+        return pygame.event.Event(MOUSEBUTTONUP, pos=tuple(entry["pos"]), button=entry["button"])
+    elif entry["type"] == "key":
+        return pygame.event.Event(KEYUP, key=entry["key"])
+    elif entry["type"] == "resize":
+        size = tuple(entry["size"])
+        return pygame.event.Event(VIDEORESIZE, size=size, w=size[0], h=size[1])
+    result = tuple(entry["result"]) if entry["kind"] == "hint" else entry["result"]
+    # it was a current result when it was recorded
+    return pygame.event.Event(AI_RESULT, kind=entry["kind"], result=result, generation=game.worker.generation)
+
+
+class InputRecorder:
+    """Writes the input of a session to a file for --replay, one JSON object per line. The first
+    line has the rng seed and board size, every other line is an event with its time in ms since
+    the recording started"""
+
+    def __init__(self, path, seed, size, k, ultimate=False):
+        # line buffered so a crash doesn't lose the events that led to it
+        self.file = open(path, "w", buffering=1)
+        self.start = ticks()
+        self.write({"version": RECORDING_VERSION, "seed": seed, "size": size, "k": k, "ultimate": ultimate,
+                    "window": list(pygame.display.get_surface().get_size())})
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + "\n")
+
+    def record(self, event, game):
+        entry = event_to_entry(event, game)
+        if entry is not None:
+            entry["t"] = ticks() - self.start
+            self.write(entry)
+
+    def close(self):
+        self.file.close()
+
+
+class MoveCounter:
+    """Observer of TTTGame that counts the moves played, for replay throughput"""
+
+    def __init__(self):
+        self.moves = 0
+
+    def tile_played(self, index, turn):
+        self.moves += 1
+
+
+def replay(path, realtime=False, render=True):
+    """Feeds a file made with --record through handle_event(), like the events of a live game.
+    AI moves and hints come from the file, so the replay doesn't depend on how long searches take.
+    Returns (events, moves played, seconds)"""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        entries = [json.loads(line) for line in f]
+    if header.get("version") != RECORDING_VERSION:
+        raise ValueError(f"{path} is not a version {RECORDING_VERSION} recording")
+
+    if not render:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+    pygame.font.init()
+    win = pygame.display.set_mode(header["window"], RESIZABLE)
+    pygame.display.set_caption("TIC-TAC-TOE (replay)")
+    ultimate = header.get("ultimate", False)
+    visual = TTTVisual(win, create_texts(), header["size"], header["k"], ultimate)
+    # history stays in memory, a replay shouldn't add games to the log
+    state = None
+    if ultimate:
+        from ttt_ultimate import UltimateState
+        state = UltimateState()
+    game = TTTFunc(visual, TTTGame(random.Random(header["seed"]), header["size"], header["k"], state=state))
+    game.worker.paused = True
+    counter = MoveCounter()
+    game.rules.add_observer(counter)
+
+    visual.draw_start_screen()
+    visual.compositor.present()
+    start = time.perf_counter()
+    for entry in entries:
+        if realtime:
+            # keeps the window responsive until the event is due, live input is ignored
+            while (remaining := start + entry["t"] / 1000 - time.perf_counter()) > 0:
+                if any(event.type == QUIT for event in pygame.event.get()):
+                    return len(entries), counter.moves, time.perf_counter() - start
+                pygame.time.wait(min(10, int(remaining * 1000) + 1))
+        handle_event(game, entry_to_event(entry, game))
+        game.apply_window_size()
+        game.redraw_dirty_layers()
+        visual.compositor.present()
+    seconds = time.perf_counter() - start
+    game.close()
+    return len(entries), counter.moves, seconds
 
-    def check_if_game_over(self):
-        """Goes through grid and checks all 8 possibilities to check if player won the game.
-        Returns index of the tile at the middle of the winning row/col/dgnl and the index of the correct line
-        direction to use according TTTVisual.o_lines and TTTVisual.x_lines"""
-        # all the rows
-        if self.turn == self.grid[0] == self.grid[1] == self.grid[2]:
-            return 1, 1
-        elif self.turn == self.grid[3] == self.grid[4] == self.grid[5]:
-            return 4, 1
-        elif self.turn == self.grid[6] == self.grid[7] == self.grid[8]:
-            return 7, 1
-
-        # all the columns
-        if self.turn == self.grid[0] == self.grid[3] == self.grid[6]:
-            return 3, 0
-        elif self.turn == self.grid[1] == self.grid[4] == self.grid[7]:
-            return 4, 0
-        elif self.turn == self.grid[2] == self.grid[5] == self.grid[8]:
-            return 5, 0
-
-        # two diagonals
-        if self.turn == self.grid[0] == self.grid[4] == self.grid[8]:
-            return 4, 3
-        elif self.turn == self.grid[2] == self.grid[4] == self.grid[6]:
-            return 4, 2
-
-        if self.turn_count == 9:
-            return "tie"
-        else:
-            return False
-
-    def game_over(self, win_info):
-        """Called when a player wins. Draws the line to cross over the winning tiles and ends game"""
-        self.game_ongoing = False
-        # draws line to cross over winning tiles
-        self.visual.draw_line(win_info, self.turn)
-        # save current game into history as well as the winner and turn count, then reset grid
-        if win_info != "tie":
-            self.game_history.append((self.grid, self.turn, self.turn_count))
-        else:
-            self.game_history.append((self.grid, "tie", self.turn_count))
-        self.grid = [None for x in range(9)]
-        # reset game variables
-        self.turn = None
-        # update turn count text
-        if win_info == "tie":
-            self.visual.update_turn_count(None, tie=True)
-        else:
-            self.visual.update_turn_count(None, game_over=True)
-        self.turn_count = 1
-        self.visual.update_turn_tiles(self.turn)
-        
 
 def main():
-    pygame.init()
-    win = pygame.display.set_mode(WIN_SIZE)
+    parser = create_parser()
+    args = parse_args(parser=parser)
+    if args.replay:
+        events, moves, seconds = replay(args.replay, args.replay_speed == "realtime", not args.no_render)
+        print(f"replayed {events} events and {moves} moves in {seconds:.3f}s: "
+              f"{events / seconds:,.0f} events/s, {moves / seconds:,.0f} moves/s")
+        return
+    startup = StartupProfiler()
+    startup.mark("imports")
+    # on Windows the window would otherwise be blurrily upscaled on high-DPI displays
+    os.environ.setdefault("SDL_WINDOWS_DPI_AWARENESS", "permonitorv2")
+    # only what the game uses, pygame.init() would also start the mixer and joystick subsystems
+    pygame.display.init()
+    pygame.font.init()
+    startup.mark("pygame init")
+    win = pygame.display.set_mode(WIN_SIZE, RESIZABLE)
     pygame.display.set_caption("TIC-TAC-TOE")
+    startup.mark("window")
     # fonts for the game
     texts = create_texts()
-    visual = TTTVisual(win, texts)
-    game = TTTFunc(visual)
+    startup.mark("fonts")
+    visual = TTTVisual(win, texts, args.size, args.k, args.ultimate)
+    startup.mark("assets and layouts")
+    try:
+        history = HistoryStore(args.history, args.size, args.k)
+    except ValueError as error:
+        # a log of another board size or an old version, the message says what to do about it
+        parser.error(str(error))
+    startup.mark("history")
+    # seeded so a --record file can reproduce every random choice
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+    network = None
+    if args.connect:
+        from ttt_server import DEFAULT_PORT
+        host, port = args.connect
+        port = port if port is not None else DEFAULT_PORT
+        try:
+            network = NetworkClient(host, port)
+        except OSError as error:
+            # nobody listening, an unknown host, no network...
+            parser.error(f"can't connect to {host}:{port}: {error}")
+    state = None
+    if args.ultimate:
+        from ttt_ultimate import UltimateState
+        state = UltimateState()
+    game = TTTFunc(visual, TTTGame(random.Random(seed), args.size, args.k, history, state), network)
+    startup.mark("rules and AI")
 
     visual.draw_start_screen()
+    visual.compositor.present()
+    startup.mark("first frame")
+    if args.profile_startup:
+        print(startup.report())
+    recorder = InputRecorder(args.record, seed, args.size, args.k, args.ultimate) if args.record else None
+    if args.profile:
+        Profiler().install(game)
+    scheduler = game.scheduler
     running = True
     while running:
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-            # check if tile is clicked
-            elif event.type == MOUSEBUTTONUP:
-                if event.button == 1:
-                    pos = event.pos
-                    game.mouse_clicked(pos)
-            elif event.type == KEYUP:
-                if event.key == K_SPACE:
-                    game.start_game()
+        events = scheduler.next_events()
+        if game.profiler is not None:
+            game.profiler.begin_frame()
+        for event in events:
+            if recorder is not None:
+                recorder.record(event, game)
+            running = handle_event(game, event)
+            if not running:
+                break
+        scheduler.run_due()
+        game.apply_window_size()
+        game.redraw_dirty_layers()
+        if game.profiler is not None:
+            game.profiler.end_frame()
+        else:
+            visual.compositor.present()
+    if args.profile:
+        game.profiler.save(args.profile, args.profile_format)
+    game.close()
+    history.close()
+    if network is not None:
+        network.close()
+    if recorder is not None:
+        recorder.close()
+
+
+def handle_event(game, event):
+    """Passes one pygame event to the game. Returns False when the game should quit"""
+    if event.type == QUIT:
+        return False
+    # check if tile is clicked
+    elif event.type == MOUSEBUTTONUP:
+        if event.button == 1:
+            pos = event.pos
+            game.mouse_clicked(pos)
+    elif event.type == KEYUP:
+        if event.key == K_SPACE:
+            game.start_game()
+        elif event.key == K_h:
+            game.show_hint()
+        elif event.key == K_F3:
+            game.toggle_profiler_overlay()
+    elif event.type == VIDEORESIZE:
+        game.window_resized(event.size)
+    elif event.type == AI_RESULT:
+        game.ai_result(event)
+    elif event.type == NET_MESSAGE:
+        game.network_message(event)
+    return True
+
+
+class LazyTexts(dict):
+    """Dictionary of the game's Font objects and text Surfaces. A text is only rendered the first
+    time it is looked up, so startup doesn't pay for labels of screens that haven't been opened"""
+
+    def __init__(self, fonts, labels):
+        super().__init__(fonts)
+        # key -> (key of the font to render with, text)
+        self.labels = labels
+
+    def __missing__(self, key):
+        font_key, text = self.labels[key]
+        surface = self[font_key].render(text, True, BLACK)
+        self[key] = surface
+        return surface
 
 
 def create_texts():
-    """Renders text that is going to be used in the game and stores in dictionary, as well as the Font objects themselves"""
+    """Sets up the text that is going to be used in the game in a dictionary, as well as the Font objects themselves"""
     # major font = 5% of window height | minor font = 3% of window height
     maj_font = load_font("arial", floor(WIN_HEIGHT*0.06))
     min_font = load_font("arial", floor(WIN_HEIGHT*0.03))
-    texts = {
-        "majorfont": maj_font,
-        "minorfont": min_font,
-        "currentturn": min_font.render("Current turn", True, BLACK),
-        "gamewonin?turns": min_font.render("Game won in \u2193 turns", True, BLACK),
-        "tiegame": maj_font.render("Tie Game", True, BLACK),
-        "history": maj_font.render("History", True, BLACK),
-        "play": maj_font.render("PLAY", True, BLACK),
-    }
+    texts = LazyTexts({"majorfont": maj_font, "minorfont": min_font}, {
+        "currentturn": ("minorfont", "Current turn"),
+        "gamewonin?turns": ("minorfont", "Game won in \u2193 turns"),
+        "tiegame": ("majorfont", "Tie Game"),
+        "history": ("majorfont", "History"),
+        "aioff": ("majorfont", "VS AI: off"),
+        "aieasy": ("majorfont", "VS AI: easy"),
+        "aimcts": ("majorfont", "VS AI: MCTS"),
+        "aiperfect": ("majorfont", "VS AI: perfect"),
+        "aihard": ("majorfont", "VS AI: hard"),
+        "stats": ("majorfont", "Stats"),
+        "play": ("majorfont", "PLAY"),
+    })
     return texts
 
 
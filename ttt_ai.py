@@ -0,0 +1,329 @@
+"""Computer opponents. Like ttt_core, nothing in here imports pygame"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import math
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+from ttt_core import EMPTY_TILES, FULL_BOARD, LINE_OF_BOARD, TTTState, random_policy
+
+
+def _build_symmetries():
+    """Returns the 8 symmetries of the grid (4 rotations, each one also mirrored) as tuples
+    where symmetry[i] is the tile that tile i is moved to"""
+    identity = tuple(range(9))
+    rotate = tuple(3 * (i % 3) + 2 - i // 3 for i in range(9))  # 90 degrees clockwise
+    mirror = tuple(3 * (i // 3) + 2 - i % 3 for i in range(9))  # left <-> right
+    symmetries = []
+    current = identity
+    for _ in range(4):
+        symmetries.append(current)
+        symmetries.append(tuple(mirror[current[i]] for i in range(9)))
+        current = tuple(rotate[current[i]] for i in range(9))
+    return tuple(symmetries)
+
+SYMMETRIES = _build_symmetries()
+# SYMMETRY_TABLES[s][board] is board with every bit moved according to SYMMETRIES[s]
+SYMMETRY_TABLES = tuple(
+    tuple(sum(1 << symmetry[i] for i in range(9) if board >> i & 1) for board in range(FULL_BOARD + 1))
+    for symmetry in SYMMETRIES
+)
+POPCOUNT = tuple(bin(board).count("1") for board in range(FULL_BOARD + 1))
+# center first, then corners, then edges. Good moves first means more alpha-beta cutoffs
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+# flags for entries of the transposition table
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def canonical_key(me, opp):
+    """Returns the same key for all 8 symmetric versions of a position. me is the board of
+    the side to move and opp the board of the other side"""
+    return min(table[me] << 9 | table[opp] for table in SYMMETRY_TABLES)
+
+
+class MinimaxPlayer:
+    """Perfect player using alpha-beta negamax. Positions are stored in a transposition table
+    under their canonical key, so symmetric positions share one entry.
+
+    Scores are from the point of view of the side to move: a win is worth 10 minus the number
+    of tiles filled when it happens, so quicker wins (and slower losses) are preferred"""
+
+    def __init__(self):
+        self.table = {}
+
+    def warm_up(self):
+        """Solves the whole game from the empty grid. After this, every reply is just table lookups"""
+        self.search(0, 0, -10, 10)
+
+    def search(self, me, opp, alpha, beta):
+        """Negamax value of the position for the side to move (the opponent just played)"""
+        occupied = me | opp
+        if LINE_OF_BOARD[opp] >= 0:
+            return POPCOUNT[occupied] - 10
+        if occupied == FULL_BOARD:
+            return 0
+
+        key = canonical_key(me, opp)
+        entry = self.table.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        original_alpha = alpha
+        best = -10
+        for index in MOVE_ORDER:
+            if occupied >> index & 1:
+                continue
+            value = -self.search(opp, me | 1 << index, -beta, -alpha)
+            if value > best:
+                best = value
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best <= original_alpha:
+            self.table[key] = best, UPPER
+        elif best >= beta:
+            self.table[key] = best, LOWER
+        else:
+            self.table[key] = best, EXACT
+        return best
+
+    def scores(self, state, turn):
+        """Returns a dict of tile index -> exact score of playing there for turn"""
+        me, opp = (state.x_board, state.o_board) if turn == "x" else (state.o_board, state.x_board)
+        return {index: -self.search(opp, me | 1 << index, -10, 10)
+                for index in EMPTY_TILES[me | opp]}
+
+    def best_moves(self, state, turn):
+        """Returns all the tile indexes that have the best score for turn"""
+        scores = self.scores(state, turn)
+        best = max(scores.values())
+        return [index for index, score in scores.items() if score == best]
+
+    def choose_move(self, state, turn, rng=None):
+        """Returns the tile index to play. With a rng, picks randomly between equally good moves"""
+        moves = self.best_moves(state, turn)
+        return rng.choice(moves) if rng is not None else moves[0]
+
+    # so it can be used as a policy in ttt_core.simulate()
+    __call__ = choose_move
+
+
+class MCTSNode:
+    """Node of the Monte Carlo search tree. wins are counted for player, the one who played move"""
+    __slots__ = ("move", "player", "parent", "children", "untried", "wins", "visits", "result")
+
+    def __init__(self, move, player, parent):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = []
+        self.wins = 0.0
+        self.visits = 0
+        # 'x', 'o' or 'tie' if the game is over after move
+        self.result = None
+
+
+def _other(turn):
+    return "o" if turn == "x" else "x"
+
+
+def _free_neighbours(state):
+    """Free tiles next to (diagonally too) a tile that has been played on, sorted"""
+    size = state.size
+    occupied = state.x_board | state.o_board
+    tiles = set()
+    for index in state.moves:
+        row, col = divmod(index, size)
+        for r in range(max(0, row - 1), min(size, row + 2)):
+            for c in range(max(0, col - 1), min(size, col + 2)):
+                if not occupied >> (r * size + c) & 1:
+                    tiles.add(r * size + c)
+    return sorted(tiles)
+
+
+def heuristic_policy(state, turn, rng):
+    """Policy for any board size that wins when it can, otherwise blocks the opponent's win,
+    otherwise plays next to the symbols already on the board (in the middle of an empty one).
+    A win always goes through a tile next to one that's taken, so only those are tried"""
+    candidates = _free_neighbours(state)
+    if not candidates:
+        return state.n_tiles // 2
+    for player in (turn, _other(turn)):
+        for index in candidates:
+            state.play(index, player)
+            won = state.last_move_win(player) is not None
+            state.undo()
+            if won:
+                return index
+    return rng.choice(candidates)
+
+
+def _rollout(state, turn, rng):
+    """Plays random moves until the game ends, then takes them all back. Returns the winner or 'tie'"""
+    played = 0
+    winner = "tie"
+    while not state.is_full():
+        state.play(random_policy(state, turn, rng), turn)
+        played += 1
+        if state.last_move_win(turn) is not None:
+            winner = turn
+            break
+        turn = _other(turn)
+    for _ in range(played):
+        state.undo()
+    return winner
+
+
+def mcts_search(state, turn, playouts=None, time_budget=None, seed=None, exploration=1.4, stop=None):
+    """Runs UCT from a position where it's turn's move, until the playout or time budget runs out
+    or the stop Event is set. state is played on and then restored.
+    Returns ({move: (wins, visits)} for the root moves, playouts done)"""
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    root = MCTSNode(None, _other(turn), None)
+    root.untried = list(state.empty_tiles())
+    done = 0
+
+    while (playouts is None or done < playouts) and (deadline is None or time.perf_counter() < deadline):
+        if stop is not None and stop.is_set():
+            break
+        node = root
+        depth = 0
+        # selection
+        while node.result is None and not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            node = max(node.children, key=lambda child: child.wins / child.visits +
+                       exploration * math.sqrt(log_visits / child.visits))
+            state.play(node.move, node.player)
+            depth += 1
+        # expansion
+        if node.result is None and node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            child = MCTSNode(move, _other(node.player), node)
+            state.play(move, child.player)
+            depth += 1
+            if state.last_move_win(child.player) is not None:
+                child.result = child.player
+            elif state.is_full():
+                child.result = "tie"
+            else:
+                child.untried = list(state.empty_tiles())
+            node.children.append(child)
+            node = child
+        # simulation
+        winner = node.result if node.result is not None else _rollout(state, _other(node.player), rng)
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1
+            elif winner == "tie":
+                node.wins += 0.5
+            node = node.parent
+        for _ in range(depth):
+            state.undo()
+        done += 1
+
+    return {child.move: (child.wins, child.visits) for child in root.children}, done
+
+
+# seconds between checks of MCTSPlayer.stop while waiting for the pool
+CANCEL_POLL_INTERVAL = 0.02
+
+
+def _mcts_worker(size, k, x_board, o_board, moves, turn, playouts, time_budget, seed, exploration):
+    """Entry point of the pool processes. Rebuilds the state, since that's cheaper to send than pickling it"""
+    state = TTTState(size, k)
+    state.x_board, state.o_board, state.moves = x_board, o_board, moves
+    return mcts_search(state, turn, playouts, time_budget, seed, exploration)
+
+
+class MCTSPlayer:
+    """Monte Carlo tree search player for any board size. With more than one worker, every
+    worker searches its own tree from the same root in a process pool and the root statistics
+    are merged (root parallelization). With one worker the search runs in this process.
+    At least one of playouts or time_budget (in seconds) has to be given, both are per move"""
+
+    def __init__(self, playouts=None, time_budget=None, workers=1, exploration=1.4):
+        if playouts is None and time_budget is None:
+            raise ValueError("MCTSPlayer needs a playout or time budget")
+        self.playouts = playouts
+        self.time_budget = time_budget
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.exploration = exploration
+        self.pool = None
+        # playouts done during the last search, for benchmarks
+        self.last_playouts = 0
+        # set from another thread to end the current search early, see cancel()
+        self.stop = threading.Event()
+
+    def search(self, state, turn, rng=None):
+        """Returns the merged root statistics {move: (wins, visits)}"""
+        rng = rng if rng is not None else random.Random()
+        self.stop.clear()
+        if self.workers <= 1:
+            stats, self.last_playouts = mcts_search(state.copy(), turn, self.playouts, self.time_budget,
+                                                    rng.getrandbits(64), self.exploration, self.stop)
+            return stats
+
+        if self.pool is None:
+            # spawn rather than fork, forking copies the SDL window and audio state of the UI process
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        playouts = -(-self.playouts // self.workers) if self.playouts is not None else None
+        pending = {self.pool.submit(_mcts_worker, state.size, state.k, state.x_board, state.o_board,
+                                    state.moves.copy(), turn, playouts, self.time_budget,
+                                    rng.getrandbits(64), self.exploration)
+                   for _ in range(self.workers)}
+        merged = {}
+        self.last_playouts = 0
+        while pending:
+            if self.stop.is_set():
+                # the processes can't see the Event, so drop whatever they haven't started and stop
+                # waiting for the rest. Searches already running still finish in the background
+                for future in pending:
+                    future.cancel()
+                break
+            done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                stats, playouts_done = future.result()
+                self.last_playouts += playouts_done
+                for move, (wins, visits) in stats.items():
+                    total_wins, total_visits = merged.get(move, (0.0, 0))
+                    merged[move] = total_wins + wins, total_visits + visits
+        return merged
+
+    def choose_move(self, state, turn, rng=None):
+        """Returns the most visited move"""
+        stats = self.search(state, turn, rng)
+        if not stats:
+            # budget ran out before a single playout
+            return (rng or random).choice(state.empty_tiles())
+        return max(stats, key=lambda move: stats[move][1])
+
+    # so it can be used as a policy in ttt_core.simulate()
+    __call__ = choose_move
+
+    def cancel(self):
+        """Ends a search running on another thread as soon as possible. With a pool, the search
+        returns what has finished so far within CANCEL_POLL_INTERVAL, but the worker processes
+        keep running until their own budget is used up"""
+        self.stop.set()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
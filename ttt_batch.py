@@ -0,0 +1,164 @@
+"""Vectorized win/tie evaluation of many grids at once with NumPy, for analytics and
+generating training data. Nothing in here imports pygame"""
+import numpy as np
+
+from ttt_core import DIRECTIONS, FULL_BOARD, LINE_OF_BOARD, O_WON, RecordFormat, TIE, WIN_LINES, X_WON
+
+# winner code for grids where the game is still going on (TIE, X_WON and O_WON come from ttt_core)
+ONGOING = 3
+# values of a tile in the (N, 9) int8 format
+EMPTY, X_TILE, O_TILE = 0, 1, 2
+
+POW3 = 3 ** np.arange(9, dtype=np.int32)
+
+_LINE_OF_BOARD = np.array(LINE_OF_BOARD, dtype=np.int8)
+# centers and directions of WIN_LINES, with an extra -1 at the end so line -1 maps to -1
+_CENTERS = np.array([center for center, _ in WIN_LINES] + [-1], dtype=np.int8)
+_DIRECTIONS = np.array([direction for _, direction in WIN_LINES] + [-1], dtype=np.int8)
+
+
+def _build_base3_tables():
+    """Winner and winning line for all 3^9 grids, indexed by their base 3 number. When both
+    players have a line (which can't happen in a real game) X is reported"""
+    digits = (np.arange(3 ** 9)[:, None] // POW3) % 3
+    weights = 1 << np.arange(9)
+    x_boards = ((digits == X_TILE) * weights).sum(axis=1)
+    o_boards = ((digits == O_TILE) * weights).sum(axis=1)
+    winners, lines = evaluate_bitboards(x_boards, o_boards)[:2]
+    return winners, lines
+
+
+def evaluate_bitboards(x_boards, o_boards):
+    """Evaluates packed bitboards (same format as TTTState.x_board/o_board). Both arguments are
+    integer arrays of the same shape.
+
+    Returns (winner, line, center, direction) arrays. winner is X_WON, O_WON, TIE or ONGOING,
+    line is the index in WIN_MASKS (-1 if nobody won) and (center, direction) is the same
+    pair TTTVisual.draw_line takes (-1 if nobody won)"""
+    x_boards = np.asarray(x_boards, dtype=np.intp)
+    o_boards = np.asarray(o_boards, dtype=np.intp)
+    x_lines = _LINE_OF_BOARD[x_boards]
+    o_lines = _LINE_OF_BOARD[o_boards]
+
+    x_won = x_lines >= 0
+    o_won = ~x_won & (o_lines >= 0)
+    winners = np.full(x_boards.shape, ONGOING, dtype=np.int8)
+    winners[(x_boards | o_boards) == FULL_BOARD] = TIE
+    winners[o_won] = O_WON
+    winners[x_won] = X_WON
+    lines = np.where(x_won, x_lines, np.where(o_won, o_lines, -1)).astype(np.int8)
+    return winners, lines, _CENTERS[lines], _DIRECTIONS[lines]
+
+
+_BASE3_WINNERS, _BASE3_LINES = _build_base3_tables()
+
+
+def evaluate_grids(grids):
+    """Evaluates an (N, 9) int8 array of grids where each tile is EMPTY, X_TILE or O_TILE.
+    Returns the same (winner, line, center, direction) arrays as evaluate_bitboards()"""
+    grids = np.asarray(grids, dtype=np.int8)
+    # every grid becomes its base 3 number, then it's a single table lookup per grid
+    indexes = grids.astype(np.int32) @ POW3
+    lines = _BASE3_LINES[indexes]
+    return _BASE3_WINNERS[indexes], lines, _CENTERS[lines], _DIRECTIONS[lines]
+
+
+def grids_from_history(game_history):
+    """Converts (grid, winner, turn_count) history entries into an (N, 9) int8 array"""
+    codes = {None: EMPTY, "x": X_TILE, "o": O_TILE}
+    return np.array([[codes[tile] for tile in grid] for grid, _, _ in game_history], dtype=np.int8).reshape(-1, 9)
+
+
+def decode_records(data, size=3):
+    """Unpacks records packed with ttt_core.RecordFormat (GameRecords.data, or the records of a
+    history log) all at once. Returns (winners, o_first, turn_counts, moves) arrays, winners
+    being TIE, X_WON or O_WON and moves an (N, size * size) array of the tiles in the order they
+    were played, 0 past the turn count"""
+    record_format = RecordFormat(size)
+    n_tiles = size * size
+    bits_per_move = record_format.bits_per_move
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(-1, record_format.size)
+    winners = rows[:, 0] & 0b11
+    o_first = (rows[:, 0] & 0b100).astype(bool)
+    turn_counts = rows[:, 1].astype(np.intp)
+    if record_format.count_bytes == 2:
+        turn_counts |= rows[:, 2].astype(np.intp) << 8
+    # the moves are bits_per_move bit numbers one after the other, lowest bits first
+    bits = np.unpackbits(rows[:, 1 + record_format.count_bytes:], axis=1, bitorder="little")
+    bits = bits[:, :n_tiles * bits_per_move].reshape(-1, n_tiles, bits_per_move)
+    moves = bits.astype(np.intp) @ (1 << np.arange(bits_per_move))
+    return winners, o_first, turn_counts, moves
+
+
+def _last_move_lines(moves, turn_counts, size, k):
+    """Vectorized TTTState.last_move_win() for games that were won, looking along the four
+    directions through the last move. Returns (center, direction) arrays"""
+    games = np.arange(len(moves))
+    n_tiles = size * size
+    played = np.arange(n_tiles)
+    # the winner's tiles are the ones played with the same parity as the last move, everything
+    # else goes into an extra column that's dropped
+    winners_tiles = (played < turn_counts[:, None]) & (played % 2 == (turn_counts[:, None] - 1) % 2)
+    owned = np.zeros((len(moves), n_tiles + 1), dtype=bool)
+    owned[games[:, None], np.where(winners_tiles, moves, n_tiles)] = True
+    last = moves[games, turn_counts - 1]
+    row, col = last // size, last % size
+
+    centers = np.full(len(moves), -1, dtype=np.intp)
+    directions = np.full(len(moves), -1, dtype=np.int8)
+    found = np.zeros(len(moves), dtype=bool)
+    for direction, (row_step, col_step) in enumerate(DIRECTIONS):
+        runs = []
+        for sign in (-1, 1):
+            run = np.zeros(len(moves), dtype=np.intp)
+            going = np.ones(len(moves), dtype=bool)
+            for step in range(1, k):
+                r, c = row + sign * step * row_step, col + sign * step * col_step
+                inside = (r >= 0) & (r < size) & (c >= 0) & (c < size)
+                going &= inside & owned[games, np.where(inside, r * size + c, n_tiles)]
+                run += going
+            runs.append(run)
+        back, forward = runs
+        hit = ~found & (back + forward + 1 >= k)
+        # same middle tile as last_move_win(), see ttt_core.line_ends()
+        middle = np.maximum(-back, np.minimum(-((k - 1) // 2), forward - (k - 1))) + (k - 1) // 2
+        centers[hit] = ((row + row_step * middle) * size + col + col_step * middle)[hit]
+        directions[hit] = direction
+        found |= hit
+    return centers, directions
+
+
+def summarize_records(data, size=3, k=3):
+    """Counts for ttt_stats.GameStats from packed records, see decode_records(). Returns a dict with
+    "results" (games per TIE, X_WON, O_WON), "turns" (sum of the turn counts), "lines" ({(center,
+    direction): games won along that line}) and "openings" (an (size * size, 3) array of how the
+    player who moved first did when they opened on each tile: won, tie, lost)"""
+    n_tiles = size * size
+    winners, o_first, turn_counts, moves = decode_records(data, size)
+    summary = {
+        "results": np.bincount(winners, minlength=3)[:3],
+        "turns": int(turn_counts.sum()),
+    }
+
+    first_won = winners == np.where(o_first, O_WON, X_WON)
+    outcomes = np.where(first_won, 0, np.where(winners == TIE, 1, 2))
+    summary["openings"] = np.bincount(moves[:, 0] * 3 + outcomes, minlength=n_tiles * 3).reshape(n_tiles, 3)
+
+    won = winners != TIE
+    if size == k == 3:
+        # the 3x3 game has its table, x's and o's boards are all it needs
+        played = np.arange(n_tiles)
+        valid = played < turn_counts[:, None]
+        by_first = valid & (played % 2 == 0)
+        by_second = valid & (played % 2 == 1)
+        first_boards = np.where(by_first, 1 << moves, 0).sum(axis=1)
+        second_boards = np.where(by_second, 1 << moves, 0).sum(axis=1)
+        x_boards = np.where(o_first, second_boards, first_boards)[won]
+        o_boards = np.where(o_first, first_boards, second_boards)[won]
+        _, _, centers, directions = evaluate_bitboards(x_boards, o_boards)
+    else:
+        centers, directions = _last_move_lines(moves[won], turn_counts[won], size, k)
+    keys, counts = np.unique(centers.astype(np.intp) * len(DIRECTIONS) + directions, return_counts=True)
+    summary["lines"] = {(int(key) // len(DIRECTIONS), int(key) % len(DIRECTIONS)): int(count)
+                        for key, count in zip(keys, counts)}
+    return summary
@@ -0,0 +1,457 @@
+"""Rules of tic-tac-toe without any pygame. The pygame front end in tic_tac_toe.py
+observes TTTGame, and simulate() can play huge amounts of games on a headless box"""
+from array import array
+import random
+
+# Win masks for the bitboards in TTTState, bit i is tile i of the grid
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100,               # diagonals
+)
+# (index of the middle tile, line direction) for every mask in WIN_MASKS. Direction is the
+# index of the line to use in TTTVisual.x_lines and TTTVisual.o_lines
+WIN_LINES = (
+    (1, 1), (4, 1), (7, 1),
+    (3, 0), (4, 0), (5, 0),
+    (4, 3), (4, 2),
+)
+FULL_BOARD = 0b111111111
+
+
+def _build_line_table():
+    """For every possible 9 bit board, stores the index of the first win mask it completes or -1"""
+    table = []
+    for board in range(FULL_BOARD + 1):
+        for i, mask in enumerate(WIN_MASKS):
+            if board & mask == mask:
+                table.append(i)
+                break
+        else:
+            table.append(-1)
+    return tuple(table)
+
+# LINE_OF_BOARD[board] is the same as looping through WIN_MASKS, but it's one lookup
+LINE_OF_BOARD = _build_line_table()
+# EMPTY_TILES[occupied] is a tuple of the free tile indexes when occupied is x_board | o_board
+EMPTY_TILES = tuple(tuple(i for i in range(9) if not occupied >> i & 1) for occupied in range(FULL_BOARD + 1))
+
+# (row step, column step) of the four line directions. The index of a direction is the index of
+# its line in TTTVisual.x_lines and TTTVisual.o_lines, same as in WIN_LINES
+DIRECTIONS = ((1, 0), (0, 1), (1, -1), (1, 1))
+
+
+def line_ends(center, direction, size=3, k=3):
+    """Returns the first and last tile of the k in a row given by (middle tile, direction) like
+    in win info. With an even k there's no middle tile, the one just before the middle is used,
+    so a line drawn over the run has to go from end to end rather than around center"""
+    row_step, col_step = DIRECTIONS[direction]
+    row, col = divmod(center, size)
+    before, after = (k - 1) // 2, k // 2
+    return ((row - row_step * before) * size + col - col_step * before,
+            (row + row_step * after) * size + col + col_step * after)
+
+# Outcomes of a game, as stored by simulate() and in game records
+TIE, X_WON, O_WON = 0, 1, 2
+WINNER_CODES = {"tie": TIE, "x": X_WON, "o": O_WON}
+WINNERS = {code: winner for winner, code in WINNER_CODES.items()}
+
+
+class TTTState:
+    """Game state of a single size x size grid, kept as two integer bitboards (one for X and one for O).
+    Bit i of a board is set when that player has a symbol on tile i, tile i being at row i // size
+    and column i % size. A player wins with k of their symbols in a row"""
+    __slots__ = ("x_board", "o_board", "moves", "size", "k", "n_tiles", "full_board", "small")
+    # True for a ttt_ultimate.UltimateState, so front ends can tell without importing that module
+    ultimate = False
+
+    def __init__(self, size=3, k=3):
+        if not 1 <= k <= size:
+            raise ValueError(f"k has to be between 1 and the board size, got k={k} for size {size}")
+        self.size, self.k = size, k
+        self.n_tiles = size * size
+        self.full_board = (1 << self.n_tiles) - 1
+        # the normal 3x3 game uses the precomputed tables
+        self.small = size == 3 and k == 3
+        self.x_board = 0
+        self.o_board = 0
+        # stack of played tile indexes, used for undoing moves
+        self.moves = []
+
+    @property
+    def turn_count(self):
+        return len(self.moves)
+
+    def is_empty(self, index):
+        """Returns True if nobody has played on the tile"""
+        return not (self.x_board | self.o_board) >> index & 1
+
+    def is_legal(self, index):
+        return 0 <= index < self.n_tiles and self.is_empty(index)
+
+    def empty_tiles(self):
+        """Returns a tuple with the indexes of all the free tiles"""
+        occupied = self.x_board | self.o_board
+        if self.small:
+            return EMPTY_TILES[occupied]
+        return tuple(i for i in range(self.n_tiles) if not occupied >> i & 1)
+
+    def play(self, index, turn):
+        """Puts turn's symbol on the tile at index"""
+        if turn == "x":
+            self.x_board |= 1 << index
+        else:
+            self.o_board |= 1 << index
+        self.moves.append(index)
+
+    def undo(self):
+        """Takes back the last move. Returns the index of the tile that was cleared"""
+        index = self.moves.pop()
+        # clear the bit on both boards, only one of them has it set anyway
+        mask = ~(1 << index)
+        self.x_board &= mask
+        self.o_board &= mask
+        return index
+
+    def winning_line(self, turn):
+        """3x3 only. Returns the index in WIN_MASKS of the line turn has completed, or None"""
+        line = LINE_OF_BOARD[self.x_board if turn == "x" else self.o_board]
+        return line if line >= 0 else None
+
+    def last_move_win(self, turn):
+        """Checks if the last move, played by turn, made k in a row. Only the up to 4*(k-1) tiles
+        in a line with the last move are looked at. Returns (index of the middle tile of the
+        k in a row, line direction) like WIN_LINES, or None. See line_ends() for even k"""
+        board = self.x_board if turn == "x" else self.o_board
+        if self.small:
+            line = LINE_OF_BOARD[board]
+            return WIN_LINES[line] if line >= 0 else None
+        if not self.moves:
+            return None
+
+        size, k = self.size, self.k
+        row, col = divmod(self.moves[-1], size)
+        for direction, (row_step, col_step) in enumerate(DIRECTIONS):
+            # count symbols going backwards, then forwards from the last move
+            back = 0
+            r, c = row - row_step, col - col_step
+            while back < k - 1 and 0 <= r < size and 0 <= c < size and board >> (r * size + c) & 1:
+                back += 1
+                r, c = r - row_step, c - col_step
+            forward = 0
+            r, c = row + row_step, col + col_step
+            while forward < k - 1 and 0 <= r < size and 0 <= c < size and board >> (r * size + c) & 1:
+                forward += 1
+                r, c = r + row_step, c + col_step
+
+            if back + forward + 1 >= k:
+                # pick k tiles of the run, as centered on the last move as the run allows
+                start = max(-back, min(-((k - 1) // 2), forward - (k - 1)))
+                middle = start + (k - 1) // 2
+                return (row + row_step * middle) * size + col + col_step * middle, direction
+        return None
+
+    def is_full(self):
+        return (self.x_board | self.o_board) == self.full_board
+
+    def get(self, index):
+        """Returns 'x', 'o' or None for the tile at index"""
+        if self.x_board >> index & 1:
+            return "x"
+        elif self.o_board >> index & 1:
+            return "o"
+        return None
+
+    def to_grid(self):
+        """Returns the state as a list of 'x'/'o'/None per tile, the format used in game history"""
+        return [self.get(i) for i in range(self.n_tiles)]
+
+    def copy(self):
+        state = TTTState(self.size, self.k)
+        state.x_board, state.o_board = self.x_board, self.o_board
+        state.moves = self.moves.copy()
+        return state
+
+    def reset(self):
+        self.x_board = self.o_board = 0
+        self.moves.clear()
+
+
+class GameRecord:
+    """One finished game, kept as the order the tiles were played in. Unpacks like the
+    (grid, winner, turn_count) tuples the history screens use, so grid = record.grid"""
+    __slots__ = ("moves", "first", "winner", "size")
+
+    def __init__(self, moves, first, winner, size=3):
+        self.moves = tuple(moves)
+        # who played moves[0], 'x' or 'o'
+        self.first = first
+        # 'x', 'o' or 'tie'
+        self.winner = winner
+        self.size = size
+
+    @property
+    def turn_count(self):
+        return len(self.moves)
+
+    @property
+    def grid(self):
+        return self.grid_at(len(self.moves))
+
+    def grid_at(self, step):
+        """Returns the grid as a list of 'x'/'o'/None after the first step moves were played"""
+        grid = [None] * (self.size * self.size)
+        second = "o" if self.first == "x" else "x"
+        for i, index in enumerate(self.moves[:step]):
+            grid[index] = second if i & 1 else self.first
+        return grid
+
+    def __iter__(self):
+        yield self.grid
+        yield self.winner
+        yield self.turn_count
+
+    def __eq__(self, other):
+        return (isinstance(other, GameRecord) and (self.moves, self.first, self.winner, self.size) ==
+                (other.moves, other.first, other.winner, other.size))
+
+    def __repr__(self):
+        return f"GameRecord({self.moves}, {self.first!r}, {self.winner!r}, size={self.size})"
+
+
+class RecordFormat:
+    """Packs a GameRecord into a fixed amount of bytes for a given board size:
+
+        1 byte     winner (TIE, X_WON or O_WON) in bits 0-1, 1 in bit 2 if o went first
+        1-2 bytes  turn count (2 only when the board has more than 255 tiles)
+        n bytes    every move as a tile index, bits_per_move bits each
+
+    The normal 3x3 game takes 7 bytes per record"""
+
+    def __init__(self, size=3):
+        self.board_size = size
+        n_tiles = size * size
+        self.count_bytes = 1 if n_tiles <= 255 else 2
+        self.bits_per_move = max(1, (n_tiles - 1).bit_length())
+        self.move_bytes = (n_tiles * self.bits_per_move + 7) // 8
+        self.size = 1 + self.count_bytes + self.move_bytes
+
+    def pack(self, record):
+        flags = WINNER_CODES[record.winner] | (record.first == "o") << 2
+        moves = 0
+        for i, index in enumerate(record.moves):
+            moves |= index << (i * self.bits_per_move)
+        return (bytes((flags,)) + len(record.moves).to_bytes(self.count_bytes, "little") +
+                moves.to_bytes(self.move_bytes, "little"))
+
+    def unpack(self, buffer, offset=0):
+        flags = buffer[offset]
+        start = offset + 1
+        turn_count = int.from_bytes(buffer[start:start + self.count_bytes], "little")
+        start += self.count_bytes
+        moves = int.from_bytes(buffer[start:start + self.move_bytes], "little")
+        mask = (1 << self.bits_per_move) - 1
+        return GameRecord([moves >> (i * self.bits_per_move) & mask for i in range(turn_count)],
+                          "o" if flags & 0b100 else "x", WINNERS[flags & 0b11], self.board_size)
+
+
+class GameRecords:
+    """In-memory game history. Every game is packed with RecordFormat into one shared bytearray,
+    and GameRecord objects are only made for the entries that get looked at"""
+
+    def __init__(self, size=3):
+        self.format = RecordFormat(size)
+        self.data = bytearray()
+
+    def __len__(self):
+        return len(self.data) // self.format.size
+
+    def append(self, record):
+        self.data += self.format.pack(record)
+
+    def __getitem__(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("game history index out of range")
+        return self.format.unpack(self.data, index * self.format.size)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def packed(self, start=0, stop=None):
+        """Returns the records from start to stop as they're packed, for ttt_batch.decode_records()"""
+        stop = len(self) if stop is None else stop
+        return bytes(self.data[start * self.format.size:stop * self.format.size])
+
+
+class TTTGame:
+    """The rules of one game at a time plus the history of finished games.
+
+    Front ends register an observer with add_observer(). Observers can implement any of:
+        game_started(turn, turn_count)
+        tile_played(index, turn)
+        turn_changed(turn, turn_count)
+        game_recorded(record, win_info)    the GameRecord that was just added to the history
+        game_ended(win_info, turn)
+    """
+
+    def __init__(self, rng=None, size=3, k=3, history=None, state=None):
+        # anything with TTTState's methods works, like a ttt_ultimate.UltimateState
+        self.state = state if state is not None else TTTState(size, k)
+        self.turn = None
+        self.game_ongoing = False
+        # GameRecords of every finished game. Anything with append(), len() and indexing
+        # works, like a ttt_history.HistoryStore
+        self.game_history = history if history is not None else GameRecords(self.state.size)
+        # who played the first move of the current game
+        self.first_turn = None
+        self.rng = rng if rng is not None else random.Random()
+        self.observers = []
+
+    @property
+    def turn_count(self):
+        """Number of the turn being played, starting at 1. The state counts the moves already made"""
+        return self.state.turn_count + 1
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def _notify(self, event, *args):
+        for observer in self.observers:
+            callback = getattr(observer, event, None)
+            if callback is not None:
+                callback(*args)
+
+    def start(self, turn=None):
+        """Starts a new game. If turn is None, randomly decides who goes first"""
+        self.state.reset()
+        self.turn = turn if turn is not None else self.rng.choice("xo")
+        self.first_turn = self.turn
+        self.game_ongoing = True
+        self._notify("game_started", self.turn, self.turn_count)
+
+    def is_legal(self, index):
+        return self.game_ongoing and self.state.is_legal(index)
+
+    def play(self, index):
+        """Plays the current turn on the tile at index. Returns the win info of
+        check_if_game_over() if the move ended the game, otherwise False"""
+        self.state.play(index, self.turn)
+        self._notify("tile_played", index, self.turn)
+        if win_info := self.check_if_game_over():
+            self.game_over(win_info)
+            return win_info
+        # switch turns
+        self.turn = "x" if self.turn != "x" else "o"  # toggle turn X -> O or O -> X
+        self._notify("turn_changed", self.turn, self.turn_count)
+        return False
+
+    def check_if_game_over(self):
+        """Checks if the player who just moved made k in a row through their last move.
+        Returns index of the tile at the middle of the winning row/col/dgnl and the index of the correct line
+        direction to use according TTTVisual.o_lines and TTTVisual.x_lines"""
+        win_info = self.state.last_move_win(self.turn)
+        if win_info is not None:
+            return win_info
+
+        if self.state.is_full():
+            return "tie"
+        else:
+            return False
+
+    def abandon(self):
+        """Ends the game without a result, like when the other player of a network game leaves.
+        It isn't saved into history"""
+        self.game_ongoing = False
+        self.turn = None
+
+    def game_over(self, win_info):
+        """Ends the game and saves it into history as well as the winner and turn count"""
+        self.game_ongoing = False
+        winner = self.turn if win_info != "tie" else "tie"
+        record = GameRecord(self.state.moves, self.first_turn, winner, self.state.size)
+        self.game_history.append(record)
+        self._notify("game_recorded", record, win_info)
+        self._notify("game_ended", win_info, self.turn)
+        # reset game variables
+        self.state.reset()
+        self.turn = None
+
+
+def random_policy(state, turn, rng):
+    """Policy that plays on any free tile"""
+    if state.small:
+        return rng.choice(EMPTY_TILES[state.x_board | state.o_board])
+    # on big boards, guessing is a lot cheaper than listing every free tile
+    occupied = state.x_board | state.o_board
+    for _ in range(8):
+        index = rng.randrange(state.n_tiles)
+        if not occupied >> index & 1:
+            return index
+    return rng.choice(state.empty_tiles())
+
+
+def pack_result(winner, turn_count):
+    """Packs an outcome (TIE, X_WON or O_WON) and the turn count into a single byte"""
+    return turn_count << 2 | winner
+
+
+def unpack_result(result):
+    """Opposite of pack_result(). Returns (outcome, turn_count)"""
+    return result & 0b11, result >> 2
+
+
+def simulate(n_games, policy_x=random_policy, policy_o=random_policy, seed=None, first="x", size=3, k=3):
+    """Plays n_games games between the two policies and returns one pack_result() value per game,
+    in a bytearray (or an array of unsigned shorts when the board is too big for a turn count to
+    fit in 6 bits). A policy is called as policy(state, turn, rng) and must return the index of a
+    free tile. The same seed always gives the same results"""
+    rng = random.Random(seed)
+    state = TTTState(size, k)
+    results = bytearray(n_games) if state.n_tiles < 64 else array("H", bytes(2 * n_games))
+    line_of_board = LINE_OF_BOARD
+    small = state.small
+    second = "o" if first == "x" else "x"
+    first_policy = policy_x if first == "x" else policy_o
+    second_policy = policy_o if first == "x" else policy_x
+    first_outcome = X_WON if first == "x" else O_WON
+    second_outcome = O_WON if first == "x" else X_WON
+
+    for game in range(n_games):
+        state.reset()
+        outcome = TIE
+        # at most one move per tile, first player plays on the even ones
+        for move in range(state.n_tiles):
+            if move & 1:
+                turn, policy, won = second, second_policy, second_outcome
+            else:
+                turn, policy, won = first, first_policy, first_outcome
+            state.play(policy(state, turn, rng), turn)
+            if small:
+                if line_of_board[state.x_board if turn == "x" else state.o_board] >= 0:
+                    outcome = won
+                    break
+            elif state.last_move_win(turn) is not None:
+                outcome = won
+                break
+        results[game] = len(state.moves) << 2 | outcome
+    return results
+
+
+def tally(results):
+    """Counts the outcomes of simulate() results. Returns a dict with the amount of X wins,
+    O wins and ties as well as the mean turn count"""
+    counts = [0, 0, 0]
+    turns = 0
+    for result in results:
+        counts[result & 0b11] += 1
+        turns += result >> 2
+    return {
+        "x": counts[X_WON],
+        "o": counts[O_WON],
+        "tie": counts[TIE],
+        "mean_turn_count": turns / len(results) if results else 0.0,
+    }
@@ -0,0 +1,109 @@
+"""Game history kept on disk as an append-only log of fixed-size records. Nothing in here imports pygame.
+
+A log starts with a header, then has one record per finished game:
+
+    header: magic, version, board size, k, record size
+    record: a GameRecord packed with ttt_core.RecordFormat (winner, who went first, every move)
+
+Every record has the same size, so record i starts at HEADER.size + i * record_size and the
+offset index is just that multiplication. Reads go through an mmap of the file, so only the
+pages that are actually looked at are ever loaded"""
+import mmap
+import os
+import struct
+
+from ttt_core import RecordFormat
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+
+MAGIC = b"TTTH"
+# version 1 logs only had the final grid, they can't be replayed so they aren't read anymore
+VERSION = 2
+HEADER = struct.Struct("<4sHHHH")  # magic, version, size, k, record size
+
+
+def default_history_path(size=3, k=3, directory=DEFAULT_HISTORY_DIR):
+    """Every board configuration gets its own log, since the record size depends on it"""
+    return os.path.join(directory, f"{size}x{size}_k{k}.tttlog")
+
+
+class HistoryStore:
+    """List-like game history backed by a log file. Supports append(), len() and indexing
+    (negative indexes too) with GameRecords, just like ttt_core.GameRecords"""
+
+    def __init__(self, path=None, size=3, k=3):
+        self.path = path if path is not None else default_history_path(size, k)
+        self.size, self.k = size, k
+        self.format = RecordFormat(size)
+        self.record_size = self.format.size
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.path, "a+b")
+        file_size = self.file.seek(0, os.SEEK_END)
+        if file_size == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, size, k, self.record_size))
+            self.file.flush()
+            file_size = HEADER.size
+        else:
+            self.file.seek(0)
+            magic, version, log_size, log_k, record_size = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                self.file.close()
+                raise ValueError(f"{self.path} is not a version {VERSION} history log, move it out of the way")
+            if (log_size, log_k, record_size) != (size, k, self.record_size):
+                self.file.close()
+                raise ValueError(f"{self.path} holds {log_size}x{log_size} k={log_k} games, not {size}x{size} k={k}")
+
+        self.count = (file_size - HEADER.size) // self.record_size
+        # a crash in the middle of an append leaves part of a record behind, drop it
+        if HEADER.size + self.count * self.record_size != file_size:
+            self.file.truncate(HEADER.size + self.count * self.record_size)
+        self.map = None
+        self.mapped_count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, record):
+        """Writes a GameRecord to the end of the log"""
+        self.file.write(self.format.pack(record))
+        self.file.flush()
+        self.count += 1
+
+    def _remap(self):
+        """Maps the whole file again, needed after appending since an mmap can't grow"""
+        if self.map is not None:
+            self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mapped_count = self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("game history index out of range")
+        if index >= self.mapped_count:
+            self._remap()
+        return self.format.unpack(self.map, HEADER.size + index * self.record_size)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def packed(self, start=0, stop=None):
+        """Returns the records from start to stop as they're packed, for ttt_batch.decode_records()"""
+        stop = self.count if stop is None else stop
+        if stop <= start:
+            # with an empty log nothing has been mapped yet
+            return b""
+        if stop > self.mapped_count:
+            self._remap()
+        return self.map[HEADER.size + start * self.record_size:HEADER.size + stop * self.record_size]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
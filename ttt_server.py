@@ -0,0 +1,188 @@
+"""Multiplayer server. Players connect over TCP, ask for a game with JOIN and are paired with the
+next player who asked for the same board. Nothing in here imports pygame.
+
+    python ttt_server.py [--host 127.0.0.1] [--port 8765]
+
+The protocol is one ASCII line per message:
+
+    client -> server
+        JOIN <size> <k>             wait for an opponent
+        MOVE <tile index>           play a move, only on your turn
+    server -> client
+        WAIT                        nobody to play against yet
+        START <your side> <first>   the game started, first is the side that moves first
+        MOVED <tile index>          a move was played by whoever's turn it was, the mover gets it
+                                    back too, as the ack of their MOVE
+        OVER <x|o|tie|left>         the game is over, left means the opponent disconnected
+        ERROR <reason>
+
+After OVER the same connection can JOIN again. A match is only a TTTState (two integer
+bitboards and the move list), whose turn it is and its two players, so one process can host
+a lot of them at once"""
+import argparse
+import asyncio
+import random
+
+from ttt_core import TTTState
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# biggest board that can be asked for
+MAX_SIZE = 19
+# a connection that doesn't read what it's sent is dropped once this much is waiting for it
+MAX_WRITE_BUFFER = 64 * 1024
+# and so is one that sends a line longer than this
+MAX_LINE = 64
+
+
+class Player(asyncio.Protocol):
+    """One connection. A plain Protocol instead of asyncio streams, since a coroutine and a
+    StreamReader per connection cost a lot more per message. side is 'x' or 'o' while it's in a match"""
+    __slots__ = ("server", "transport", "buffer", "match", "side", "waiting_for")
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        # start of a line whose end hasn't arrived yet
+        self.buffer = b""
+        self.match = None
+        self.side = None
+        # (size, k) of the board it's waiting an opponent for
+        self.waiting_for = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        *lines, self.buffer = (self.buffer + data).split(b"\n")
+        for line in lines:
+            self.server.dispatch(self, line)
+        if len(self.buffer) > MAX_LINE or self.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.server.leave(self)
+
+    def send(self, line: bytes):
+        self.transport.write(line)
+
+
+class Match:
+    __slots__ = ("state", "turn", "x", "o")
+
+    def __init__(self, state, turn, x, o):
+        self.state = state
+        self.turn = turn
+        self.x, self.o = x, o
+
+
+class TTTServer:
+    """Pairs up players and referees their matches with the headless rules in ttt_core"""
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        # (size, k) -> the Player waiting for an opponent on that board
+        self.waiting = {}
+        # for reports
+        self.matches = 0
+        self.games_played = 0
+        self.moves_played = 0
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Starts listening, returns the asyncio Server"""
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: Player(self), host, port, backlog=4096)
+
+    def dispatch(self, player, line):
+        parts = line.split()
+        try:
+            if parts[0] == b"MOVE" and len(parts) == 2:
+                self.move(player, int(parts[1]))
+            elif parts[0] == b"JOIN" and len(parts) == 3:
+                self.join(player, int(parts[1]), int(parts[2]))
+            else:
+                player.send(b"ERROR unknown command\n")
+        except (IndexError, ValueError):
+            player.send(b"ERROR bad message\n")
+
+    def join(self, player, size, k):
+        if player.match is not None or player.waiting_for is not None:
+            player.send(b"ERROR already in a game\n")
+            return
+        if not 1 <= k <= size <= MAX_SIZE:
+            player.send(b"ERROR bad board size\n")
+            return
+        opponent = self.waiting.pop((size, k), None)
+        if opponent is None:
+            self.waiting[size, k] = player
+            player.waiting_for = size, k
+            player.send(b"WAIT\n")
+            return
+
+        opponent.waiting_for = None
+        first = self.rng.choice("xo")
+        match = Match(TTTState(size, k), first, opponent, player)
+        for side, member in (("x", opponent), ("o", player)):
+            member.match, member.side = match, side
+            member.send(f"START {side} {first}\n".encode())
+        self.matches += 1
+
+    def move(self, player, index):
+        match = player.match
+        if match is None or match.turn != player.side:
+            player.send(b"ERROR not your turn\n")
+            return
+        state = match.state
+        if not 0 <= index < state.n_tiles or not state.is_empty(index):
+            player.send(b"ERROR illegal move\n")
+            return
+
+        state.play(index, match.turn)
+        self.moves_played += 1
+        line = f"MOVED {index}\n".encode()
+        match.x.send(line)
+        match.o.send(line)
+        if state.last_move_win(match.turn) is not None:
+            self.end(match, match.turn)
+        elif state.is_full():
+            self.end(match, "tie")
+        else:
+            match.turn = "o" if match.turn == "x" else "x"
+
+    def end(self, match, result):
+        line = f"OVER {result}\n".encode()
+        for member in (match.x, match.o):
+            member.send(line)
+            member.match = member.side = None
+        self.matches -= 1
+        self.games_played += 1
+
+    def leave(self, player):
+        """Called when a connection closes. Its opponent wins"""
+        if player.waiting_for is not None and self.waiting.get(player.waiting_for) is player:
+            del self.waiting[player.waiting_for]
+        if player.match is not None:
+            self.end(player.match, "left")
+
+
+async def serve(host, port):
+    server = TTTServer()
+    listener = await server.start(host, port)
+    print(f"serving on {', '.join(str(sock.getsockname()) for sock in listener.sockets)}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tic-tac-toe multiplayer server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Statistics of the game history for the stats screen. Nothing in here imports pygame.
+
+GameStats keeps running counts that every finished game is added to, so showing them never
+goes through the history. The counts are saved next to a history log with save(), and the next
+start only counts the games that were added to the log after that"""
+import json
+import os
+
+from ttt_batch import summarize_records
+from ttt_core import O_WON, TIE, WINNER_CODES, X_WON
+
+# games decoded at a time when catching up, so a big log doesn't need all of its moves in memory
+CATCH_UP_CHUNK = 1 << 16
+# names of the line directions in ttt_core.DIRECTIONS
+DIRECTION_NAMES = ("column", "row", "/ diagonal", "\\ diagonal")
+
+
+def stats_path(history_path):
+    """Where the counts of a history log are saved"""
+    return f"{history_path}.stats"
+
+
+def tile_name(index, size=3):
+    row, col = divmod(index, size)
+    return f"row {row + 1} col {col + 1}"
+
+
+def ultimate_tile_name(index):
+    board, cell = divmod(index, 9)
+    return f"board {board // 3 + 1},{board % 3 + 1} tile {cell // 3 + 1},{cell % 3 + 1}"
+
+
+def line_name(center, direction, size=3, k=3):
+    """Names a winning line by its (center tile, direction), like in win info"""
+    row, col = divmod(center, size)
+    if direction == 0:
+        name = f"column {col + 1}"
+    elif direction == 1:
+        name = f"row {row + 1}"
+    else:
+        name = DIRECTION_NAMES[direction]
+    # on bigger boards there are many lines along the same row, the center tells them apart
+    if k < size:
+        name += f" at {row + 1},{col + 1}"
+    return name
+
+
+class GameStats:
+    """Win rates, turn counts, winning lines and opening moves of every game in a history. It's a
+    TTTGame observer, so new games are counted as they're recorded. With ultimate, the games are
+    ultimate tic-tac-toe and the lines are lines of boards"""
+
+    def __init__(self, size=3, k=3, ultimate=False):
+        self.size, self.k = size, k
+        self.ultimate = ultimate
+        self.games = 0
+        # games per TIE, X_WON and O_WON
+        self.results = [0, 0, 0]
+        self.turns = 0
+        # (center, direction) -> games won along that line
+        self.lines = {}
+        # tile index -> [won, tie, lost] of the player who opened the game on that tile
+        self.openings = [[0, 0, 0] for _ in range(size * size)]
+
+    @classmethod
+    def for_history(cls, history, size=3, k=3, path=None, ultimate=False):
+        """Counts every game in history. With a path, starts from the counts saved there
+        when they're still for the same log"""
+        stats = cls.load(path, history, size, k, ultimate) if path is not None else None
+        if stats is None:
+            stats = cls(size, k, ultimate)
+        stats.catch_up(history)
+        return stats
+
+    def game_recorded(self, record, win_info):
+        """Adds one game. Called by TTTGame when a game ends"""
+        self.games += 1
+        self.results[WINNER_CODES[record.winner]] += 1
+        self.turns += record.turn_count
+        if win_info != "tie":
+            line = tuple(win_info)
+            self.lines[line] = self.lines.get(line, 0) + 1
+        if record.moves:
+            outcome = 1 if record.winner == "tie" else 0 if record.winner == record.first else 2
+            self.openings[record.moves[0]][outcome] += 1
+
+    def catch_up(self, history):
+        """Counts the games of history after the ones that are already counted, with NumPy"""
+        if self.ultimate:
+            # the vectorized line search only knows k in a row, these games are replayed one by one.
+            # Imported here so the normal game's stats don't load the ultimate engine
+            from ttt_ultimate import win_info_of
+            for index in range(self.games, len(history)):
+                record = history[index]
+                self.game_recorded(record, win_info_of(record))
+            return
+        for start in range(self.games, len(history), CATCH_UP_CHUNK):
+            summary = summarize_records(history.packed(start, min(start + CATCH_UP_CHUNK, len(history))),
+                                        self.size, self.k)
+            self.games += int(summary["results"].sum())
+            self.results = [total + int(count) for total, count in zip(self.results, summary["results"])]
+            self.turns += summary["turns"]
+            for line, count in summary["lines"].items():
+                self.lines[line] = self.lines.get(line, 0) + count
+            for counts, new in zip(self.openings, summary["openings"].tolist()):
+                counts[:] = [total + count for total, count in zip(counts, new)]
+
+    def save(self, path, history):
+        """Writes the counts to path. The last counted record goes with them, so load() can tell
+        if the log was replaced since"""
+        data = {
+            "size": self.size, "k": self.k, "ultimate": self.ultimate, "games": self.games,
+            "last": history.packed(self.games - 1, self.games).hex() if self.games else "",
+            "results": self.results, "turns": self.turns,
+            "lines": [[center, direction, count] for (center, direction), count in self.lines.items()],
+            "openings": self.openings,
+        }
+        # the counts can always be made again from the log, losing them isn't a problem
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    @classmethod
+    def load(cls, path, history, size=3, k=3, ultimate=False):
+        """Returns the GameStats saved at path, or None if there aren't any for this history"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            games = data["games"]
+            if ((data["size"], data["k"], data.get("ultimate", False)) != (size, k, ultimate) or
+                    games > len(history) or (games and history.packed(games - 1, games).hex() != data["last"])):
+                return None
+            stats = cls(size, k, ultimate)
+            stats.games, stats.results, stats.turns = games, data["results"], data["turns"]
+            stats.lines = {(center, direction): count for center, direction, count in data["lines"]}
+            stats.openings = data["openings"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return stats
+
+    def win_rates(self):
+        """Returns (x, o, tie) as fractions of all games"""
+        games = max(1, self.games)
+        return self.results[X_WON] / games, self.results[O_WON] / games, self.results[TIE] / games
+
+    def mean_turn_count(self):
+        return self.turns / self.games if self.games else 0.0
+
+    def top_lines(self, n=3):
+        """Returns the n lines most games were won along as [(name, games)]"""
+        lines = sorted(self.lines.items(), key=lambda item: item[1], reverse=True)[:n]
+        if self.ultimate:
+            return [(f"boards {line_name(center, direction)}", count) for (center, direction), count in lines]
+        return [(line_name(center, direction, self.size, self.k), count) for (center, direction), count in lines]
+
+    def top_openings(self, n=3):
+        """Returns the n opening tiles the first player won most often from as
+        [(name, win rate, tie rate, games)]"""
+        openings = []
+        for index, (won, tie, lost) in enumerate(self.openings):
+            games = won + tie + lost
+            if games:
+                name = ultimate_tile_name(index) if self.ultimate else tile_name(index, self.size)
+                openings.append((name, won / games, tie / games, games))
+        openings.sort(key=lambda opening: (opening[1], opening[3]), reverse=True)
+        return openings[:n]
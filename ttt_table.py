@@ -0,0 +1,141 @@
+"""Precomputed solution of every reachable position, stored in a small binary file that
+is mmap'ed at runtime. Build it with:
+
+    python ttt_table.py [path]
+
+Every process that opens the table shares the same read-only page-cached pages, and a lookup
+is two table reads and one struct unpack. Nothing in here imports pygame"""
+import mmap
+import os
+import struct
+import sys
+
+from ttt_ai import MinimaxPlayer, POPCOUNT
+from ttt_core import EMPTY_TILES, FULL_BOARD, LINE_OF_BOARD, TTTState
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ttt_solutions.bin")
+
+MAGIC = b"TTTS"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")  # magic, version, record size
+# value for the side to move (1 win, 0 draw, -1 loss), moves left with perfect play, bitmask of best moves
+RECORD = struct.Struct("<bBH")
+UNREACHABLE = -128
+# the board index is base 3 (0 empty, 1 x, 2 o) times 2, plus 1 when it's o's turn
+N_RECORDS = 3 ** 9 * 2
+
+# BASE3[board] is the base 3 value of a bitboard where every set bit counts as 1
+BASE3 = tuple(sum(3 ** i for i in range(9) if board >> i & 1) for board in range(FULL_BOARD + 1))
+
+
+def board_index(x_board, o_board, turn):
+    """Index of the record for a position. O(1), just two table lookups"""
+    return (BASE3[x_board] + 2 * BASE3[o_board]) * 2 + (turn == "o")
+
+
+def _solve_position(player, me, opp):
+    """Returns (value, distance, best move mask) of a position for the side to move"""
+    occupied = me | opp
+    n = POPCOUNT[occupied]
+    if LINE_OF_BOARD[opp] >= 0:
+        return -1, 0, 0
+    if occupied == FULL_BOARD:
+        return 0, 0, 0
+
+    scores = {index: -player.search(opp, me | 1 << index, -10, 10) for index in EMPTY_TILES[occupied]}
+    best = max(scores.values())
+    best_mask = 0
+    for index, score in scores.items():
+        if score == best:
+            best_mask |= 1 << index
+    # see MinimaxPlayer for how the scores are built
+    if best > 0:
+        return 1, 10 - best - n, best_mask
+    elif best < 0:
+        return -1, 10 + best - n, best_mask
+    return 0, 9 - n, best_mask
+
+
+def build_table(path=DEFAULT_TABLE_PATH):
+    """Enumerates every position reachable from an empty grid (with either player going first)
+    and writes the solution table to path. Returns the amount of reachable positions"""
+    player = MinimaxPlayer()
+    player.warm_up()
+    data = bytearray(HEADER.pack(MAGIC, VERSION, RECORD.size) + RECORD.pack(UNREACHABLE, 0, 0) * N_RECORDS)
+
+    seen = set()
+    stack = [(0, 0, "x"), (0, 0, "o")]
+    while stack:
+        x_board, o_board, turn = stack.pop()
+        index = board_index(x_board, o_board, turn)
+        if index in seen:
+            continue
+        seen.add(index)
+        me, opp = (x_board, o_board) if turn == "x" else (o_board, x_board)
+        RECORD.pack_into(data, HEADER.size + index * RECORD.size, *_solve_position(player, me, opp))
+        # game over positions have no children
+        if LINE_OF_BOARD[opp] >= 0 or (x_board | o_board) == FULL_BOARD:
+            continue
+        for tile in EMPTY_TILES[x_board | o_board]:
+            if turn == "x":
+                stack.append((x_board | 1 << tile, o_board, "o"))
+            else:
+                stack.append((x_board, o_board | 1 << tile, "x"))
+
+    # write to a temporary file first so other processes never map a half written table
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(seen)
+
+
+class SolutionTable:
+    """Read-only view of a table made by build_table()"""
+
+    def __init__(self, path=DEFAULT_TABLE_PATH, build_if_missing=True):
+        if build_if_missing and not os.path.exists(path):
+            build_table(path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a version {VERSION} solution table, rebuild it")
+
+    def lookup(self, state: TTTState, turn):
+        """Returns (value, distance, best move mask) for turn to move in state.
+        value is 1 for a win, 0 for a draw and -1 for a loss"""
+        value, distance, best_mask = RECORD.unpack_from(
+            self.map, HEADER.size + board_index(state.x_board, state.o_board, turn) * RECORD.size)
+        if value == UNREACHABLE:
+            raise KeyError("position can't be reached in a real game")
+        return value, distance, best_mask
+
+    def best_moves(self, state, turn):
+        """Returns a tuple of the best tile indexes to play"""
+        # the tiles that are set in the mask are the empty tiles of its complement
+        return EMPTY_TILES[FULL_BOARD ^ self.lookup(state, turn)[2]]
+
+    def close(self):
+        self.map.close()
+
+
+class TablePlayer:
+    """Perfect player that only reads moves out of a SolutionTable"""
+
+    def __init__(self, table: SolutionTable):
+        self.table = table
+
+    def choose_move(self, state, turn, rng=None):
+        """Returns the tile index to play. With a rng, picks randomly between equally good moves"""
+        moves = self.table.best_moves(state, turn)
+        return rng.choice(moves) if rng is not None else moves[0]
+
+    # so it can be used as a policy in ttt_core.simulate()
+    __call__ = choose_move
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_TABLE_PATH
+    print(f"wrote {build_table(path)} positions to {path}")
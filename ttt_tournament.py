@@ -0,0 +1,203 @@
+"""Round-robin tournaments between computer players, played on a process pool. Nothing in here
+imports pygame.
+
+    python ttt_tournament.py [--players random heuristic minimax mcts] [--boards 3:3 5:4]
+                             [--games 100] [--workers N] [--seed 0] [--history-dir DIR]
+
+On every board, every player plays --games games as x against every other player, so each
+pairing is played from both sides. Who moves first is decided by the game like in the pygame
+front end. The games of a pairing are split into chunks that each get a seed from --seed, so the
+same seed gives the same games no matter how many workers there are. MCTS players use a playout
+budget instead of a time budget for the same reason.
+
+Finished games come back as packed GameRecords and are appended, in order, to a history per
+board (logs in --history-dir when it's given). Win/draw/loss rates and mean turn counts are
+computed from those records"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+import time
+
+from ttt_ai import MCTSPlayer, MinimaxPlayer, heuristic_policy
+from ttt_core import GameRecords, TTTGame, random_policy
+from ttt_history import HistoryStore, default_history_path
+
+PLAYER_NAMES = ("random", "heuristic", "minimax", "mcts")
+# players that only know the 3x3 game, they're left out on other boards
+SMALL_ONLY = ("minimax",)
+# games played by a pool process at a time
+DEFAULT_CHUNK = 25
+
+# players made in this process, by (name, playouts)
+_players = {}
+
+
+def make_player(name, playouts):
+    """Returns a policy(state, turn, rng) for one of PLAYER_NAMES"""
+    if name == "random":
+        return random_policy
+    elif name == "heuristic":
+        return heuristic_policy
+    elif name == "minimax":
+        player = MinimaxPlayer()
+        player.warm_up()
+        return player
+    elif name == "mcts":
+        return MCTSPlayer(playouts=playouts, workers=1)
+    raise ValueError(f"unknown player {name!r}, pick from {', '.join(PLAYER_NAMES)}")
+
+
+def _player(name, playouts):
+    """make_player(), but every pool process only makes (and warms up) a player once"""
+    key = name, playouts
+    if key not in _players:
+        _players[key] = make_player(name, playouts)
+    return _players[key]
+
+
+def play_games(job):
+    """Entry point of the pool processes. job is (size, k, x player, o player, games, seed, playouts).
+    Returns the games' records packed with RecordFormat, since that's a lot cheaper to send back
+    than GameRecord objects"""
+    size, k, x_name, o_name, n_games, seed, playouts = job
+    rng = random.Random(seed)
+    players = {"x": _player(x_name, playouts), "o": _player(o_name, playouts)}
+    records = GameRecords(size)
+    rules = TTTGame(rng, size, k, records)
+    for _ in range(n_games):
+        rules.start()
+        while rules.game_ongoing:
+            rules.play(players[rules.turn](rules.state, rules.turn, rng))
+    return bytes(records.data)
+
+
+def create_jobs(players, size, k, games, chunk, playouts, rng):
+    """Every ordered pair of different players, split into chunks of at most chunk games"""
+    jobs = []
+    for x_name in players:
+        for o_name in players:
+            if x_name == o_name:
+                continue
+            for start in range(0, games, chunk):
+                jobs.append((size, k, x_name, o_name, min(chunk, games - start), rng.getrandbits(64), playouts))
+    return jobs
+
+
+class Standings:
+    """Results of one board from every player's point of view"""
+
+    def __init__(self, players):
+        self.players = players
+        # player -> [wins, draws, losses, turns played in their games]
+        self.totals = {name: [0, 0, 0, 0] for name in players}
+        # (player, opponent) -> [wins, draws, losses] of player
+        self.pairings = {}
+        self.games = 0
+
+    def add(self, record, x_name, o_name):
+        self.games += 1
+        if record.winner == "tie":
+            results = ((x_name, o_name, 1), (o_name, x_name, 1))
+        else:
+            winner, loser = (x_name, o_name) if record.winner == "x" else (o_name, x_name)
+            results = ((winner, loser, 0), (loser, winner, 2))
+        for name, opponent, result in results:
+            self.totals[name][result] += 1
+            self.totals[name][3] += record.turn_count
+            self.pairings.setdefault((name, opponent), [0, 0, 0])[result] += 1
+
+    def report(self):
+        """Returns the standings as printable lines, best win rate first"""
+        lines = [f"  {'player':<12}{'games':>8}{'win':>8}{'draw':>8}{'loss':>8}{'turns':>8}"]
+        by_win_rate = sorted(self.players, key=lambda name: self.totals[name][0] / max(1, sum(self.totals[name][:3])),
+                             reverse=True)
+        for name in by_win_rate:
+            wins, draws, losses, turns = self.totals[name]
+            games = max(1, wins + draws + losses)
+            lines.append(f"  {name:<12}{wins + draws + losses:>8}{wins / games:>8.1%}{draws / games:>8.1%}"
+                         f"{losses / games:>8.1%}{turns / games:>8.2f}")
+
+        lines.append("  win/draw/loss % of the row player against the column player")
+        lines.append(f"  {'':<12}" + "".join(f"{name:>15}" for name in self.players))
+        for name in self.players:
+            cells = []
+            for opponent in self.players:
+                wins, draws, losses = self.pairings.get((name, opponent), (0, 0, 0))
+                games = wins + draws + losses
+                cells.append(f"{wins * 100 // games}/{draws * 100 // games}/{losses * 100 // games}"
+                             if games else "-")
+            lines.append(f"  {name:<12}" + "".join(f"{cell:>15}" for cell in cells))
+        return lines
+
+
+def run_board(pool, players, size, k, args, rng):
+    """Plays one board's tournament. Returns (Standings, history, seconds)"""
+    jobs = create_jobs(players, size, k, args.games, args.chunk, args.playouts, rng)
+    if args.history_dir is not None:
+        history = HistoryStore(default_history_path(size, k, args.history_dir), size, k)
+    else:
+        history = GameRecords(size)
+    standings = Standings(players)
+    record_format = GameRecords(size).format
+
+    start = time.perf_counter()
+    # map() hands back results in job order while later jobs are still being played, so the
+    # history always ends up in the same order
+    results = pool.map(play_games, jobs) if pool is not None else map(play_games, jobs)
+    for job, data in zip(jobs, results):
+        x_name, o_name = job[2], job[3]
+        for offset in range(0, len(data), record_format.size):
+            record = record_format.unpack(data, offset)
+            history.append(record)
+            standings.add(record, x_name, o_name)
+    return standings, history, time.perf_counter() - start
+
+
+def parse_board(text):
+    """'size:k' or just 'size', which means k = min(size, 5)"""
+    size, _, k = text.partition(":")
+    size = int(size)
+    return size, int(k) if k else min(size, 5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournaments between computer players")
+    parser.add_argument("--players", nargs="+", default=list(PLAYER_NAMES), choices=PLAYER_NAMES)
+    parser.add_argument("--boards", nargs="+", type=parse_board, default=[(3, 3)], metavar="SIZE[:K]",
+                        help="boards to play on, like 3:3 7:5")
+    parser.add_argument("--games", type=int, default=100, help="games of every player as x against every other player")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="pool processes, 1 plays in this process")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="games per job sent to the pool")
+    parser.add_argument("--playouts", type=int, default=200, help="playouts per move of the MCTS player")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history-dir", help="also append the games to history logs in this directory")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    total_games = total_seconds = 0
+    try:
+        for size, k in args.boards:
+            players = [name for name in args.players if size == k == 3 or name not in SMALL_ONLY]
+            if len(players) < 2:
+                print(f"{size}x{size} k={k}: skipped, needs at least two players that can play it")
+                continue
+            standings, history, seconds = run_board(pool, players, size, k, args, rng)
+            if isinstance(history, HistoryStore):
+                history.close()
+            total_games += standings.games
+            total_seconds += seconds
+            print(f"{size}x{size} k={k}: {standings.games} games in {seconds:.2f}s, "
+                  f"{standings.games / seconds:,.0f} games/s")
+            print("\n".join(standings.report()))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if total_seconds:
+        print(f"{total_games} games in {total_seconds:.2f}s on {args.workers} workers, "
+              f"{total_games / total_seconds:,.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
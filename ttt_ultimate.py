@@ -0,0 +1,372 @@
+"""Ultimate tic-tac-toe: a 3x3 grid of 3x3 boards. Like ttt_core, nothing in here imports pygame.
+
+Tile i is cell i % 9 of board i // 9, and boards and cells are both numbered like the tiles of
+the normal game. Playing on cell c sends the opponent to board c, unless that board is already
+won or full, then they can play on any open board. Winning a board claims it on the meta-board
+and three claimed boards in a row win the game. When every board is closed without that, it's a tie.
+
+UltimateState keeps every board as a 9 bit bitboard per player plus 9 bit meta-boards, so a move,
+the legal moves and the win checks are all a few integer operations and lookups in the 3x3 tables
+of ttt_core. It has the same interface as TTTState, so TTTGame, GameRecord and the history logs
+work with it unchanged"""
+import os
+import random
+import threading
+import time
+
+from ttt_core import EMPTY_TILES, FULL_BOARD, LINE_OF_BOARD, WIN_LINES, WIN_MASKS
+from ttt_history import DEFAULT_HISTORY_DIR
+
+# tiles of the whole grid and the TTTState-like size of it
+N_TILES = 81
+SIZE = 9
+DEFAULT_HISTORY_PATH = os.path.join(DEFAULT_HISTORY_DIR, "ultimate.tttlog")
+# time the search gets per move
+DEFAULT_TIME_BUDGET = 0.1
+
+# how much every board (or cell) is worth to hold: center, then corners, then edges
+SQUARE_WEIGHTS = (3, 2, 3, 2, 4, 2, 3, 2, 3)
+# evaluation scores, a won game is worth more than any evaluation can add up to
+WIN_SCORE = 1_000_000
+BOARD_SCORE = 100
+META_THREAT_SCORE = 300
+CELL_THREAT_SCORE = 12
+# (board, cell) of every tile
+BOARD_OF = tuple(index // 9 for index in range(N_TILES))
+CELL_OF = tuple(index % 9 for index in range(N_TILES))
+# TWO_OF_LINE[board] has the masks of the lines board has exactly two of
+TWO_OF_LINE = tuple(tuple(mask for mask in WIN_MASKS if bin(board & mask).count("1") == 2)
+                    for board in range(FULL_BOARD + 1))
+
+# flags for entries of the transposition table, like in ttt_ai
+EXACT, LOWER, UPPER = 0, 1, 2
+_zobrist_rng = random.Random(81)
+# ZOBRIST[side][tile] for x (0) and o (1), and FORCED_KEYS[forced board + 1]
+ZOBRIST = tuple(tuple(_zobrist_rng.getrandbits(64) for _ in range(N_TILES)) for _ in range(2))
+FORCED_KEYS = tuple(_zobrist_rng.getrandbits(64) for _ in range(10))
+
+
+class UltimateState:
+    """Game state of ultimate tic-tac-toe. x_boards[b] and o_boards[b] are the bitboards of board b,
+    meta_x and meta_o have bit b set when that player won board b, closed has it set when board b
+    can't be played on anymore (won or full) and forced is the board the next move has to go on,
+    -1 when it can go on any open board"""
+    __slots__ = ("x_boards", "o_boards", "meta_x", "meta_o", "closed", "forced", "moves", "undo_stack")
+    size, k, n_tiles = SIZE, 3, N_TILES
+    # it doesn't use the 3x3 solution table, the AI and hints check this
+    small = False
+    ultimate = True
+
+    def __init__(self):
+        self.x_boards = [0] * 9
+        self.o_boards = [0] * 9
+        self.meta_x = self.meta_o = self.closed = 0
+        self.forced = -1
+        self.moves = []
+        # (forced, closed, meta_x, meta_o) from before every move
+        self.undo_stack = []
+
+    @property
+    def turn_count(self):
+        return len(self.moves)
+
+    def is_empty(self, index):
+        board, cell = BOARD_OF[index], CELL_OF[index]
+        return not (self.x_boards[board] | self.o_boards[board]) >> cell & 1
+
+    def is_legal(self, index):
+        """Returns True if the next move can go on the tile at index"""
+        if not 0 <= index < N_TILES:
+            return False
+        board = BOARD_OF[index]
+        if self.closed >> board & 1 or self.forced not in (-1, board):
+            return False
+        return not (self.x_boards[board] | self.o_boards[board]) >> CELL_OF[index] & 1
+
+    def playable_boards(self):
+        """Returns the boards the next move can go on"""
+        return (self.forced,) if self.forced >= 0 else EMPTY_TILES[self.closed]
+
+    def empty_tiles(self):
+        """Returns a tuple of the tiles the next move can go on. The other empty tiles can't be played"""
+        x_boards, o_boards = self.x_boards, self.o_boards
+        return tuple(board * 9 + cell for board in self.playable_boards()
+                     for cell in EMPTY_TILES[x_boards[board] | o_boards[board]])
+
+    def play(self, index, turn):
+        """Puts turn's symbol on the tile at index"""
+        board, cell = BOARD_OF[index], CELL_OF[index]
+        self.undo_stack.append((self.forced, self.closed, self.meta_x, self.meta_o))
+        if turn == "x":
+            mine = self.x_boards[board] = self.x_boards[board] | 1 << cell
+            if LINE_OF_BOARD[mine] >= 0:
+                self.meta_x |= 1 << board
+                self.closed |= 1 << board
+        else:
+            mine = self.o_boards[board] = self.o_boards[board] | 1 << cell
+            if LINE_OF_BOARD[mine] >= 0:
+                self.meta_o |= 1 << board
+                self.closed |= 1 << board
+        if self.x_boards[board] | self.o_boards[board] == FULL_BOARD:
+            self.closed |= 1 << board
+        self.forced = -1 if self.closed >> cell & 1 else cell
+        self.moves.append(index)
+
+    def undo(self):
+        """Takes back the last move. Returns the index of the tile that was cleared"""
+        index = self.moves.pop()
+        self.forced, self.closed, self.meta_x, self.meta_o = self.undo_stack.pop()
+        mask = ~(1 << CELL_OF[index])
+        self.x_boards[BOARD_OF[index]] &= mask
+        self.o_boards[BOARD_OF[index]] &= mask
+        return index
+
+    def last_move_win(self, turn):
+        """Checks if turn has three boards in a row. Returns (middle board, line direction) of
+        the line on the meta-board like WIN_LINES, or None"""
+        line = LINE_OF_BOARD[self.meta_x if turn == "x" else self.meta_o]
+        return WIN_LINES[line] if line >= 0 else None
+
+    def is_full(self):
+        """True when no board can be played on anymore"""
+        return self.closed == FULL_BOARD
+
+    def get(self, index):
+        board, cell = BOARD_OF[index], CELL_OF[index]
+        if self.x_boards[board] >> cell & 1:
+            return "x"
+        elif self.o_boards[board] >> cell & 1:
+            return "o"
+        return None
+
+    def to_grid(self):
+        return [self.get(i) for i in range(N_TILES)]
+
+    def copy(self):
+        state = UltimateState()
+        state.x_boards, state.o_boards = self.x_boards.copy(), self.o_boards.copy()
+        state.meta_x, state.meta_o, state.closed, state.forced = self.meta_x, self.meta_o, self.closed, self.forced
+        state.moves, state.undo_stack = self.moves.copy(), self.undo_stack.copy()
+        return state
+
+    def reset(self):
+        self.x_boards = [0] * 9
+        self.o_boards = [0] * 9
+        self.meta_x = self.meta_o = self.closed = 0
+        self.forced = -1
+        self.moves.clear()
+        self.undo_stack.clear()
+
+
+def board_winners(grid):
+    """Returns 'x', 'o' or None for every board of an 81 tile grid (like GameRecord.grid)"""
+    winners = []
+    for board in range(9):
+        tiles = grid[board * 9:board * 9 + 9]
+        x_board = sum(1 << cell for cell, tile in enumerate(tiles) if tile == "x")
+        o_board = sum(1 << cell for cell, tile in enumerate(tiles) if tile == "o")
+        winners.append("x" if LINE_OF_BOARD[x_board] >= 0 else "o" if LINE_OF_BOARD[o_board] >= 0 else None)
+    return winners
+
+
+def win_info_of(record):
+    """Replays a finished GameRecord and returns its win info like TTTGame gives it, the line of
+    boards or 'tie'"""
+    if record.winner == "tie":
+        return "tie"
+    state = UltimateState()
+    second = "o" if record.first == "x" else "x"
+    for i, index in enumerate(record.moves):
+        state.play(index, second if i & 1 else record.first)
+    return state.last_move_win(record.winner)
+
+
+def ultimate_random_policy(state, turn, rng):
+    """Policy that plays any legal move"""
+    return rng.choice(state.empty_tiles())
+
+
+def evaluate(me, opp, meta_me, meta_opp, closed):
+    """Score of a position that isn't over for the side to move. me and opp are the bitboards of
+    the boards. Won boards and two in a row on the meta-board count the most, then two in a row
+    with the third cell free inside the open boards"""
+    score = 0
+    for board in range(9):
+        bit = 1 << board
+        if meta_me & bit:
+            score += BOARD_SCORE * SQUARE_WEIGHTS[board]
+        elif meta_opp & bit:
+            score -= BOARD_SCORE * SQUARE_WEIGHTS[board]
+        elif not closed & bit:
+            mine, theirs = me[board], opp[board]
+            threats = 0
+            for mask in TWO_OF_LINE[mine]:
+                if not theirs & mask:
+                    threats += 1
+            for mask in TWO_OF_LINE[theirs]:
+                if not mine & mask:
+                    threats -= 1
+            score += threats * CELL_THREAT_SCORE * SQUARE_WEIGHTS[board]
+    # lines of boards with two claimed and the third still open
+    for mask in TWO_OF_LINE[meta_me]:
+        if not (meta_opp | closed) & mask & ~meta_me:
+            score += META_THREAT_SCORE
+    for mask in TWO_OF_LINE[meta_opp]:
+        if not (meta_me | closed) & mask & ~meta_opp:
+            score -= META_THREAT_SCORE
+    return score
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+class UltimatePlayer:
+    """Alpha-beta negamax with iterative deepening. Every search gets time_budget seconds and
+    plays the best move of the deepest search that finished. Positions are kept in a transposition
+    table under Zobrist keys, and its best move is searched first at the next depth. The search
+    works on its own copies of the bitboards, playing and taking back moves inline"""
+
+    def __init__(self, time_budget=DEFAULT_TIME_BUDGET, max_depth=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth if max_depth is not None else N_TILES
+        self.table = {}
+        self.deadline = None
+        self.nodes = 0
+        # depth the last search finished and nodes it looked at, for benchmarks
+        self.last_depth = 0
+        self.last_nodes = 0
+        # set from another thread to end the current search early, see cancel()
+        self.stop = threading.Event()
+
+    def choose_move(self, state, turn, rng=None):
+        """Returns the tile index to play. rng isn't used, the search is deterministic for a given depth"""
+        self.stop.clear()
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes = 0
+        # the table is only kept for one search, positions from earlier moves rarely come up again
+        self.table = {}
+        side = 0 if turn == "x" else 1
+        if side == 0:
+            me, opp, meta_me, meta_opp = state.x_boards.copy(), state.o_boards.copy(), state.meta_x, state.meta_o
+        else:
+            me, opp, meta_me, meta_opp = state.o_boards.copy(), state.x_boards.copy(), state.meta_o, state.meta_x
+        key = 0
+        for i, index in enumerate(state.moves):
+            # the last move was the opponent's, and the ones before alternate
+            key ^= ZOBRIST[(len(state.moves) - 1 - i) & 1 ^ side ^ 1][index]
+
+        moves = state.empty_tiles()
+        best = moves[0]
+        self.last_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                best = self.search_root(me, opp, meta_me, meta_opp, state.closed, state.forced,
+                                        depth, key, side, best)
+            except _OutOfTime:
+                break
+            self.last_depth = depth
+            if depth >= N_TILES - len(state.moves):
+                break  # searched to the end of the game
+        self.last_nodes = self.nodes
+        return best
+
+    # so it can be used as a policy like the players in ttt_ai
+    __call__ = choose_move
+
+    def cancel(self):
+        """Ends a search running on another thread as soon as possible"""
+        self.stop.set()
+
+    def search_root(self, me, opp, meta_me, meta_opp, closed, forced, depth, key, side, first):
+        """Searches every move to depth, first one first. Returns the best one"""
+        alpha, best = -WIN_SCORE * 2, first
+        for index in self.ordered_moves(me, opp, closed, forced, first):
+            value = -self.play_and_search(me, opp, meta_me, meta_opp, closed, index, depth - 1,
+                                          -WIN_SCORE * 2, -alpha, key, side)
+            if value > alpha:
+                alpha, best = value, index
+        return best
+
+    def play_and_search(self, me, opp, meta_me, meta_opp, closed, index, depth, alpha, beta, key, side):
+        """Plays index for me, searches the position from the opponent's side and takes the move back"""
+        board, cell = BOARD_OF[index], CELL_OF[index]
+        old = me[board]
+        mine = me[board] = old | 1 << cell
+        if LINE_OF_BOARD[mine] >= 0:
+            meta_me |= 1 << board
+            closed |= 1 << board
+        elif mine | opp[board] == FULL_BOARD:
+            closed |= 1 << board
+        forced = -1 if closed >> cell & 1 else cell
+        try:
+            return self.negamax(opp, me, meta_opp, meta_me, closed, forced, depth, alpha, beta,
+                                key ^ ZOBRIST[side][index], side ^ 1)
+        finally:
+            me[board] = old
+
+    def negamax(self, me, opp, meta_me, meta_opp, closed, forced, depth, alpha, beta, key, side):
+        """Value of the position for the side to move (me), the opponent just moved"""
+        self.nodes += 1
+        if not self.nodes & 511 and (time.perf_counter() > self.deadline or self.stop.is_set()):
+            raise _OutOfTime
+        if LINE_OF_BOARD[meta_opp] >= 0:
+            # losing later is better than losing now
+            return -WIN_SCORE - depth
+        if closed == FULL_BOARD:
+            return 0
+        if depth == 0:
+            return evaluate(me, opp, meta_me, meta_opp, closed)
+
+        table_key = key ^ FORCED_KEYS[forced + 1]
+        entry = self.table.get(table_key)
+        best_move = None
+        if entry is not None:
+            entry_depth, value, flag, best_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        original_alpha = alpha
+        best = -WIN_SCORE * 2
+        for index in self.ordered_moves(me, opp, closed, forced, best_move):
+            value = -self.play_and_search(me, opp, meta_me, meta_opp, closed, index, depth - 1,
+                                          -beta, -alpha, key, side)
+            if value > best:
+                best, best_move = value, index
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table[table_key] = depth, best, flag, best_move
+        return best
+
+    @staticmethod
+    def ordered_moves(me, opp, closed, forced, first):
+        """Legal moves, first (when it's legal) then the ones that win a board, then the rest.
+        Moves that let the opponent play on any board go last"""
+        winning, normal, freeing = [], [], []
+        has_first = False
+        for board in ((forced,) if forced >= 0 else EMPTY_TILES[closed]):
+            mine = me[board]
+            for cell in EMPTY_TILES[mine | opp[board]]:
+                index = board * 9 + cell
+                if index == first:
+                    has_first = True
+                elif LINE_OF_BOARD[mine | 1 << cell] >= 0:
+                    winning.append(index)
+                elif closed >> cell & 1:
+                    freeing.append(index)
+                else:
+                    normal.append(index)
+        if has_first:
+            winning.insert(0, first)
+        return winning + normal + freeing